@@ -3,15 +3,7 @@
 # Contexto: Ferramenta de Validação para a Seção 6 do Artigo.
 
 import streamlit as st
-import requests
-import json
-import random
-import traceback
 import os
-import time
-import re
-import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 
 # --- Configurações de Ambiente ---
@@ -19,8 +11,12 @@ import plotly.graph_objects as go
 os.environ['FOR_DISABLE_CONSOLE_CTRL_HANDLER'] = '1'
 
 # --- Imports da Lógica de Negócio ---
-from utils.thesis_recommend import thesis_recommendation_engine
-from utils.db_utils import get_publications_by_professor_id
+from utils.thesis_recommend import warm_up
+from utils import result_cache
+from utils.profile_texts import get_profile_texts, profile_texts_version
+from utils.llm_utils import (
+    format_areas_display, llm_extract_cnpq_areas, stream_summarize_profile, prefetch_profile_texts
+)
 
 # --- Configuração da Página ---
 st.set_page_config(
@@ -354,174 +350,48 @@ if 'last_weights' not in st.session_state: st.session_state.last_weights = {}
 # Armazena a estrutura hierárquica extraída pelo LLM
 if 'student_area_struct' not in st.session_state: st.session_state.student_area_struct = {}
 if 'inferred_areas' not in st.session_state: st.session_state.inferred_areas = {} # Cache de inferência
+if 'results_page' not in st.session_state: st.session_state.results_page = None # Última página do ranking (permite buscar a próxima)
+if 'results_shown' not in st.session_state: st.session_state.results_shown = 5
+if 'last_query' not in st.session_state: st.session_state.last_query = ""
+# Resumos/explicações dos cards visíveis sendo gerados em paralelo: {'key': ..., 'jobs': {id: {...}}}
+if 'llm_prefetch' not in st.session_state: st.session_state.llm_prefetch = {}
+
+# Quantidade de candidatos montados por página do ranking (folga para ocultar alguns sem nova busca)
+RESULTS_PAGE_SIZE = 20
+
+# --- OTIMIZAÇÃO: Aquecimento do motor ---
+# Carrega spaCy e o índice de áreas em segundo plano, uma vez por processo,
+# enquanto o usuário ainda está digitando a primeira busca.
+@st.cache_resource(show_spinner=False)
+def start_engine_warm_up():
+    return warm_up(background=True)
+
+start_engine_warm_up()
 
 # --- OTIMIZAÇÃO: Caching das Funções Pesadas ---
-# O Streamlit não recalculará isso se os parâmetros não mudarem.
-# 'ttl=3600' mantém o cache por 1 hora.
-@st.cache_data(ttl=3600, show_spinner=False)
+# Buscas e publicações ficam no cache compartilhado (utils.result_cache, arquivo ao lado do banco):
+# vale para todas as réplicas da interface, sobrevive a reinícios e, após uma carga
+# (python -m utils.lattes_ingest), os resultados antigos deixam de ser usados.
+# Mudar só os pesos (ou a ordem das palavras da proposta) não acerta este cache, mas
+# acerta o cache de candidatos do motor: apenas a pontuação é refeita.
 def cached_recommendation_engine(query, weights, student_area_struct, lookback_years):
     # Passamos a estrutura de área do aluno para o backend e a janela temporal
-    return thesis_recommendation_engine(query, False, weights, student_area_struct, lookback_years)
+    return result_cache.recommendation_page(query, weights, student_area_struct, lookback_years, top_k=RESULTS_PAGE_SIZE)
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def cached_get_publications(prof_id, limit):
     """ Wrapper com cache para busca de publicações no banco. """
-    return get_publications_by_professor_id(prof_id, limit)
+    return result_cache.publications(prof_id, limit)
+
+# 'ttl=3600' mantém o cache por 1 hora. 'texts_version' (versão da tabela perfil_llm) entra na chave.
+@st.cache_data(ttl=3600, show_spinner=False)
+def cached_profile_texts(prof_ids, texts_version):
+    """ Resumos/áreas pré-calculados (python -m utils.profile_texts build) dos professores em 'prof_ids'. """
+    return get_profile_texts(prof_ids)
 
 # --------------------------------------------------------------------------- #
-#                   INTEGRAÇÃO COM LLMS (OLLAMA / GEMINI)                     #
+#                          FORMATAÇÃO DE ÁREAS                                #
 # --------------------------------------------------------------------------- #
 
-def call_ollama(prompt, model="mistral"):
-    url = "http://localhost:11434/api/generate"
-    payload = {"model": model, "prompt": prompt, "stream": False, "options": {"temperature": 0.3}} # Temp baixa para JSON
-    try:
-        response = requests.post(url, json=payload)
-        response.raise_for_status()
-        return response.json().get("response", "")
-    except Exception as e:
-        return f"Erro ao conectar com Ollama: {e}"
-
-def call_gemini(prompt, api_key, model="gemini-2.5-flash"):
-    """ Chamada REST simples para Gemini com Fallback automático """
-    if not api_key: return "Chave de API não configurada."
-    
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-    try:
-        response = requests.post(url, headers={'Content-Type': 'application/json'}, json={"contents": [{"parts": [{"text": prompt}]}]})
-        if response.status_code == 200:
-            # Parse seguro da resposta Gemini
-            try:
-                return response.json()['candidates'][0]['content']['parts'][0]['text']
-            except (KeyError, IndexError):
-                return "Erro: Resposta vazia da API Gemini."
-        elif response.status_code == 404 and model == "gemini-2.5-flash":
-            # FALLBACK: Se o 2.5 Flash der 404, tenta o modelo estável 'gemini-pro' automaticamente
-            return call_gemini(prompt, api_key, model="gemini-pro")
-        else:
-            return f"Erro na API Gemini ({model}): {response.status_code} - {response.text}"
-    except Exception as e:
-        return f"Erro de conexão: {e}"
-
-def llm_extract_cnpq_areas(user_text, provider, model_name, api_key=None):
-    """
-    Extrai a hierarquia CNPq (GA, A, SA, E) do texto do aluno para fidelidade matemática à Tese.
-    """
-    if provider == "Simulação (sem IA)":
-        return {"grande_area": "Ciências Exatas", "area": user_text.split()[0]}
-    
-    sys_prompt = f"""
-    Analise o interesse de pesquisa: '{user_text}'.
-    Mapeie para a Tabela de Áreas do Conhecimento do CNPq (Brasil).
-    Retorne APENAS um JSON estrito (sem markdown) no formato:
-    {{
-        "grande_area": "Ex: Ciências Exatas e da Terra",
-        "area": "Ex: Ciência da Computação",
-        "sub_area": "Ex: Metodologia e Técnicas da Computação",
-        "especialidade": "Ex: Engenharia de Software"
-    }}
-    Se não souber, tente aproximar o máximo possível.
-    """
-    
-    resp = ""
-    if provider == "Local (Ollama)": resp = call_ollama(sys_prompt, model_name)
-    elif provider == "Nuvem (Gemini)": resp = call_gemini(sys_prompt, api_key)
-    
-    # Tentativa de parser simples do JSON
-    try:
-        # Limpa markdown ```json ... ``` se o modelo retornar
-        clean_resp = resp.replace("```json", "").replace("```", "").strip()
-        return json.loads(clean_resp)
-    except:
-        return {}
-
-def llm_infer_area_from_pubs(prof_name, pubs_list, provider, model_name, api_key=None):
-    """
-    Infere as Áreas de Conhecimento a partir das publicações (para resolver dados faltantes).
-    """
-    if not pubs_list: return "Sem dados de publicação para inferir."
-    
-    pubs_text = "\n".join(pubs_list[:5]) # Usa as 5 primeiras
-    
-    sys_prompt = f"""
-    Com base nos títulos das publicações abaixo do professor {prof_name}, infira as Áreas de Conhecimento (CNPq).
-    Publicações:
-    {pubs_text}
-    
-    Retorne uma lista formatada e separada por vírgulas.
-    Exemplo: Ciência da Computação, Engenharia de Software, Machine Learning.
-    Seja conciso.
-    """
-    
-    if provider == "Local (Ollama)": return call_ollama(sys_prompt, model_name)
-    elif provider == "Nuvem (Gemini)": return call_gemini(sys_prompt, api_key)
-    return "Simulação: Área inferida por IA com base em publicações."
-
-def llm_explain_recommendation(prof_name, score, user_query, provider, model_name, api_key=None):
-    """ Gera explicação personalizada """
-    if provider == "Simulação (sem IA)":
-        random.seed(prof_name + user_query) # Determinístico
-        return random.choice([
-            f"A trajetória de **{prof_name}** tem forte sinergia com '{user_query}' (Score: {score:.2f}).",
-            f"Indicadores de produção e orientação destacam **{prof_name}** para este tema.",
-            f"Com base nas métricas da tese, **{prof_name}** é uma recomendação sólida ({score:.2f})."
-        ])
-    
-    prompt = f"Explique em 1 frase por que o professor '{prof_name}' é bom para '{user_query}' (Score {score:.1f})."
-    if provider == "Local (Ollama)": return call_ollama(prompt, model_name)
-    elif provider == "Nuvem (Gemini)": return call_gemini(prompt, api_key)
-    return ""
-
-def format_areas_display(raw_areas):
-    """
-    Limpa a string bruta do banco, remove duplicatas, conserta capitalização 
-    e remove underlines. Retorna uma lista limpa.
-    """
-    if not raw_areas or "Inferido" in raw_areas:
-        return "Área não cadastrada formalmente."
-    
-    # Divide as cadeias de hierarquia
-    chains = raw_areas.split(' | ')
-    clean_terms = set()
-    
-    for chain in chains:
-        parts = chain.split('#')
-        for p in parts:
-            p = p.strip()
-            if p and p != '-' and p.lower() != 'não informado':
-                # Remove underlines e ajusta Capitalização (Title Case)
-                cleaned_term = p.replace('_', ' ').title()
-                
-                # Ajuste fino para preposições em pt-BR (da, de, do, e)
-                cleaned_term = re.sub(r'\b(Da|De|Do|E|Em|Para)\b', lambda m: m.group(0).lower(), cleaned_term)
-                
-                clean_terms.add(cleaned_term)
-    
-    # Ordena alfabeticamente
-    sorted_terms = sorted(list(clean_terms))
-    return ", ".join(sorted_terms)
-
-def llm_summarize_profile(prof_name, raw_areas_text, provider, model_name, api_key=None):
-    """
-    Usa LLM para criar um resumo profissional legível a partir da sopa de palavras-chave.
-    """
-    if provider == "Simulação (sem IA)":
-        return None # Retorna None para usar a lista formatada padrão
-        
-    prompt = f"""
-    Aja como um redator acadêmico. Com base nas seguintes áreas de conhecimento cruas do Currículo Lattes:
-    "{raw_areas_text}"
-    
-    Escreva um resumo de 1 parágrafo (máximo 2 linhas) descrevendo o perfil de pesquisa do professor {prof_name}.
-    Comece com "Pesquisador(a) com ênfase em..." ou "Especialista em...".
-    Não use markdown, não use listas, apenas texto corrido e fluido em português.
-    Corrija formatações estranhas (ex: tire underlines).
-    """
-    
-    if provider == "Local (Ollama)": return call_ollama(prompt, model_name)
-    elif provider == "Nuvem (Gemini)": return call_gemini(prompt, api_key)
-    return None
-
 def parse_cnpq_hierarchy(raw_areas):
     """
     Extrai a hierarquia CNPq mais relevante da string bruta para exibição estruturada.
@@ -583,6 +453,56 @@ def toggle_blacklist(prof):
         st.session_state.current_results = [p for p in st.session_state.current_results if p['id'] != pid]
         st.toast("Ocultado.", icon="🚫")
 
+def prefetch_visible_profiles(provider, model_name, api_key):
+    """
+    Dispara em paralelo o resumo e a explicação dos cards visíveis que ainda não foram pedidos,
+    para que abrir qualquer card seja instantâneo. Trocar de provedor/modelo ou de busca recomeça.
+    """
+    key = (provider, model_name, st.session_state.last_query)
+    if st.session_state.llm_prefetch.get('key') != key:
+        st.session_state.llm_prefetch = {'key': key, 'jobs': {}}
+    jobs = st.session_state.llm_prefetch['jobs']
+    pending = [p for p in st.session_state.current_results[:st.session_state.results_shown] if p['id'] not in jobs]
+    if pending:
+        # Resumos já pré-calculados no banco não são pedidos de novo ao LLM
+        precomputed = cached_profile_texts(tuple(p['id'] for p in pending), profile_texts_version())
+        with_summary = {pid for pid, texts in precomputed.items() if texts['resumo']}
+        jobs.update(prefetch_profile_texts(pending, st.session_state.last_query, provider, model_name, api_key,
+                                           format_areas_display, skip_summary=with_summary))
+
+def prefetched_job(prof_id, kind):
+    """ Future do resumo ('summary') ou da explicação ('explanation') já disparado, ou None. """
+    return st.session_state.llm_prefetch.get('jobs', {}).get(prof_id, {}).get(kind)
+
+def _show_explanation(future):
+    if not future.done():
+        st.caption("💡 Gerando explicação...")
+    elif future.exception() is None and future.result():
+        st.caption(f"💡 {future.result()}")
+
+def _poll_explanation(prof_id):
+    """ Legenda que se redesenha sozinha (a cada segundo) enquanto a explicação é gerada. """
+    future = prefetched_job(prof_id, 'explanation')
+    if future is None: return
+    _show_explanation(future)
+    # Concluída a última explicação pendente, uma execução completa desliga os fragmentos com temporizador
+    jobs = st.session_state.llm_prefetch.get('jobs', {}).values()
+    if future.done() and all(job['explanation'].done() for job in jobs if job.get('explanation') is not None):
+        st.rerun()
+
+# Com st.fragment, só a legenda é redesenhada; e só enquanto a explicação está pendente
+if hasattr(st, 'fragment'):
+    _poll_explanation = st.fragment(run_every=1.0)(_poll_explanation)
+
+def render_explanation(prof_id):
+    """ Legenda com a explicação da recomendação, assim que a geração em paralelo terminar. """
+    future = prefetched_job(prof_id, 'explanation')
+    if future is None: return
+    if future.done() or not hasattr(st, 'fragment'):
+        _show_explanation(future)
+    else:
+        _poll_explanation(prof_id)
+
 # --------------------------------------------------------------------------- #
 #       BARRA LATERAL (CONFIGURAÇÕES DO MODELO)                               #
 # --------------------------------------------------------------------------- #
@@ -699,13 +619,34 @@ if st.session_state.view_mode == "single_view" and st.session_state.selected_pro
     # Limpando os dados brutos primeiro
     raw_areas_db = info.get('raw_hierarchy', '')
     clean_list_text = format_areas_display(raw_areas_db)
+
+    # Textos pré-calculados pelo job offline (python -m utils.profile_texts build)
+    precomputed = cached_profile_texts((p['id'],), profile_texts_version()).get(p['id'], {})
+    if not raw_areas_db and precomputed.get('areas_inferidas'):
+        clean_list_text = f"Inferido por IA a partir das publicações: {precomputed['areas_inferidas']}"
     
     # Tentando gerar resumo com IA (se o provedor não for Simulação) usando session_state para não re-gerar a cada clique
     cache_key = f"summary_{p['id']}"
+    if cache_key not in st.session_state and llm_provider != "Simulação (sem IA)" and precomputed.get('resumo'):
+        st.session_state[cache_key] = precomputed['resumo']
     if cache_key not in st.session_state:
-        with st.spinner("Gerando resumo do perfil acadêmico..."):
-            summary = llm_summarize_profile(p['nome'], clean_list_text, llm_provider, ollama_model, api_key)
-            st.session_state[cache_key] = summary
+        # Normalmente já foi disparado (em paralelo) quando o card apareceu na lista de resultados.
+        # Se ainda estiver só na fila, é cancelado e o resumo é gerado aqui em streaming.
+        future = prefetched_job(p['id'], 'summary')
+        if future is not None and not future.cancel():
+            with st.spinner("Gerando resumo do perfil acadêmico..."):
+                summary = future.result() if future.exception() is None else None
+        else:
+            summary = None
+            stream = stream_summarize_profile(p['nome'], clean_list_text, llm_provider, ollama_model, api_key)
+            if stream is not None:
+                # Os pedaços aparecem à medida que o modelo gera; depois o texto vai para o quadro do perfil
+                placeholder = st.empty()
+                with placeholder.container(border=True):
+                    st.caption("🧠 Gerando resumo do perfil acadêmico...")
+                    summary = st.write_stream(stream)
+                placeholder.empty()
+        st.session_state[cache_key] = summary
 
     # Decide o que mostrar: O resumo da IA ou a lista limpa
     display_text = st.session_state[cache_key] if st.session_state[cache_key] else clean_list_text
@@ -915,6 +856,9 @@ else:
                 # Filtra blacklist
                 valid_results = [r for r in results if r['id'] not in st.session_state.blacklist]
                 st.session_state.current_results = valid_results
+                st.session_state.results_page = results
+                st.session_state.results_shown = 5
+                st.session_state.last_query = prompt
                 status.update(label="Busca Completa!", state="complete", expanded=False)
             except Exception as e:
                 st.error(f"Erro no cálculo: {e}")
@@ -928,7 +872,10 @@ else:
         # Encontra o maior score ATUAL para normalizar a barra de progresso (evita barra cheia sempre)        
         max_score = max([p['hybrid_score'] for p in st.session_state.current_results]) if st.session_state.current_results else 1.0
 
-        for prof in st.session_state.current_results[:5]: # Top 5 resultados
+        # Resumos e explicações dos cards visíveis são gerados em paralelo, em segundo plano
+        prefetch_visible_profiles(llm_provider, ollama_model, api_key)
+
+        for prof in st.session_state.current_results[:st.session_state.results_shown]: # Top 5 resultados (+ páginas carregadas)
             is_fav = prof['id'] in st.session_state.favorites
             
             # Card Container
@@ -946,6 +893,7 @@ else:
                     resumo = (f"Area:{det.get('raw_area',0):.2f} | Exp:{det.get('raw_exp',0):.2f} | Prod:{det.get('raw_prod',0):.2f} | "
                               f"Efi:{det.get('raw_efi',0):.2f}")
                     st.markdown(f"<div class='score-container'> <span class='metric-label'>📊 Métricas: {resumo}</span> --> <strong>Pontuação: {prof['hybrid_score']:.2f}</strong></div> ", unsafe_allow_html=True)
+                    render_explanation(prof['id'])
 
                 with col_actions:
                     # Botões Verticais
@@ -962,5 +910,18 @@ else:
                         toggle_blacklist(prof)
                         st.rerun()
 
+        # Paginação: mostra mais 5; se acabarem os já montados, pede a próxima página ao ranking
+        page = st.session_state.results_page
+        has_more_page = page is not None and getattr(page, 'has_more', False)
+        if len(st.session_state.current_results) > st.session_state.results_shown or has_more_page:
+            if st.button("⬇️ Carregar mais resultados", use_container_width=True):
+                st.session_state.results_shown += 5
+                while has_more_page and len(st.session_state.current_results) < st.session_state.results_shown:
+                    page = page.next_page()
+                    st.session_state.current_results += [r for r in page if r['id'] not in st.session_state.blacklist]
+                    has_more_page = page.has_more
+                st.session_state.results_page = page
+                st.rerun()
+
     elif not st.session_state.current_results and st.session_state.refined_query:
         st.info("Nenhum resultado encontrado para os critérios atuais.")
\ No newline at end of file
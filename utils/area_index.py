@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# area_index.py - Índice invertido (termo -> id_pessoa) sobre as áreas dos PPGs
+# Substitui a cadeia de 'LOWER(areaX) LIKE %termo%' do filtro de área por uniões de listas.
+
+import os
+import re
+import statistics
+import threading
+from collections import OrderedDict
+from utils.db_utils import get_db_path, pooled_connection
+from utils.instrumentation import count
+
+# LOWER() e LIKE do SQLite só tratam caixa de caracteres ASCII; o modo de compatibilidade
+# reproduz isso para devolver exatamente os mesmos candidatos da consulta original.
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+# Termos distintos guardados no cache da busca por substring (LRU)
+SUBSTRING_CACHE_SIZE = 1024
+_PUNCTUATION = re.compile(r'[^\w]+')
+
+
+def normalize_term(token):
+    """
+    Forma comparável de um termo, igual para os tokens das áreas e para os lemas da busca:
+    minúsculas, sem pontuação, sem plural ('s') e sem a vogal final de gênero/número
+    ('Elétricos' -> 'elétric', 'químico' -> 'químic'), que o lematizador nem sempre uniformiza.
+    """
+    term = _PUNCTUATION.sub('', token.lower())
+    if len(term) > 3 and term.endswith('s'): term = term[:-1]
+    if len(term) > 3 and term[-1] in 'aoe': term = term[:-1]
+    return term
+
+
+class AreaIndex(object):
+    """
+    Listas invertidas construídas a partir de ppg.area1/area2/area3 (via pessoa_ppg).
+    - postings: token normalizado (normalize_term) -> ids (busca por termo)
+    - raw_postings: token em minúsculas ASCII -> ids (busca por substring, semântica do LIKE)
+    """
+
+    def __init__(self, rows):
+        self.postings = {}
+        self.raw_postings = {}
+        self.all_ids = set()
+        self.areas = set()
+        self._substring_cache = OrderedDict()
+        self._substring_lock = threading.Lock()
+
+        for id_pessoa, *areas in rows:
+            for area in areas:
+                if area is None: continue
+                # LIKE '%%' casa qualquer área não nula
+                self.all_ids.add(id_pessoa)
+                self.areas.add(str(area))
+                for token in str(area).split():
+                    # 'Físico-Química' entra inteiro e também por partes ('físico', 'química')
+                    for part in {token, *re.findall(r'\w+', token)}:
+                        term = normalize_term(part)
+                        if term: self.postings.setdefault(term, set()).add(id_pessoa)
+                    self.raw_postings.setdefault(token.translate(_ASCII_LOWER), set()).add(id_pessoa)
+
+    def _substring_ids(self, term):
+        # Termos não têm espaços, logo '%termo%' só pode casar dentro de um único token
+        with self._substring_lock:
+            ids = self._substring_cache.get(term)
+            if ids is not None:
+                self._substring_cache.move_to_end(term)
+                return ids
+        ids = set()
+        for token, posting in self.raw_postings.items():
+            if term in token: ids |= posting
+        with self._substring_lock:
+            self._substring_cache[term] = ids
+            while len(self._substring_cache) > SUBSTRING_CACHE_SIZE:
+                self._substring_cache.popitem(last=False)
+        return ids
+
+    def lookup(self, terms, substring=False):
+        """ União das listas de cada termo. 'substring=True' mantém a semântica do LIKE original. """
+        result = set()
+        for term in terms:
+            if substring:
+                term = term.lower()
+                result |= self.all_ids if not term else self._substring_ids(term)
+            else:
+                term = normalize_term(term)
+                if term: result |= self.postings.get(term, set())
+        return result
+
+    def typical_candidates(self, stop_words=()):
+        """
+        Mediana do número de candidatos que o filtro devolve para o nome de cada área de PPG
+        (sem 'stop_words', como os lemas da busca): tamanho típico do conjunto de candidatos.
+        """
+        sizes = []
+        for area in self.areas:
+            ids = self.lookup([w for w in area.split() if w.lower() not in stop_words])
+            if ids: sizes.append(len(ids))
+        return statistics.median(sizes) if sizes else None
+
+
+_index = None
+_index_key = None
+_index_lock = threading.Lock()
+
+
+def get_area_index():
+    """
+    Retorna o índice do processo, construindo-o na primeira chamada
+    e reconstruindo-o quando o arquivo do banco é alterado.
+    """
+    global _index, _index_key
+    path = get_db_path()
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _index is not None and _index_key == key:
+        count('cache_hit_area_index')
+        return _index
+
+    with _index_lock:
+        if _index is None or _index_key != key:
+            with pooled_connection() as conn:
+                rows = conn.execute(
+                    "SELECT p.id_pessoa, ppg.area1, ppg.area2, ppg.area3 "
+                    "FROM ppg INNER JOIN pessoa_ppg p ON ppg.id = p.id_ppg"
+                ).fetchall()
+            _index = AreaIndex(rows)
+            _index_key = key
+            count('cache_miss_area_index')
+            count('sql_rows_area_index', len(rows))
+    return _index
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# benchmark.py - Medição reprodutível do motor de recomendação
+# Roda um conjunto fixo de propostas (QUERY_CORPUS) contra o banco em uso e reporta latência
+# p50/p95/p99 de cada etapa do pipeline e da busca completa, além da vazão (buscas/s) com
+# 1 ou mais threads simultâneas. Com um banco sintético do mesmo tamanho (utils.synthetic_db),
+# os números são comparáveis entre versões do código e entre máquinas.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.benchmark --db data/sintetico_10k.db --repeat 5 --concurrency 1 4
+#   python -m utils.benchmark --json bench.json        # banco padrão (data/base_recomendacao.db)
+#
+# O cache de candidatos do motor fica desligado por padrão, para que toda busca medida passe por
+# todas as etapas; com --candidate-cache, as buscas repetidas só refazem a pontuação e os acertos
+# aparecem separados no relatório (latência em 'cached', fora dos percentis das etapas).
+
+import argparse
+import json
+import os
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.instrumentation import collect
+
+STAGES = ('lemmatize', 'areas', 'birch', 'kmeans', 'ranking')
+PERCENTILES = (50, 95, 99)
+
+# Propostas fixas: cobrem as áreas do banco sintético e fazem sentido também no banco real.
+# Cada uma cita o nome de uma área de PPG, para passar do filtro de área às demais etapas.
+QUERY_CORPUS = (
+    ("Aprendizado de máquina e redes neurais para detecção de fraudes em sistemas de computação",
+     {'grande_area': 'Ciências Exatas e da Terra', 'area': 'Ciência da Computação'}),
+    ("Otimização de algoritmos em grafos para redes de computação em nuvem",
+     {'grande_area': 'Ciências Exatas e da Terra', 'area': 'Ciência da Computação', 'sub_area': 'Teoria da Computação'}),
+    ("Segurança de software e análise de dados com inteligência artificial",
+     {'grande_area': 'Ciências Exatas e da Terra', 'area': 'Ciência da Computação'}),
+    ("Visão computacional e aprendizado profundo aplicados à agronomia de precisão", {}),
+    ("Equações diferenciais e modelos de probabilidade em matemática aplicada",
+     {'grande_area': 'Ciências Exatas e da Terra', 'area': 'Matemática'}),
+    ("Síntese de compostos orgânicos e catálise em química verde",
+     {'grande_area': 'Ciências Exatas e da Terra', 'area': 'Química', 'sub_area': 'Química Orgânica'}),
+    ("Espectroscopia de polímeros e eletroquímica em química de materiais", {'area': 'Química'}),
+    ("Física de partículas, campo quântico e cosmologia", {'grande_area': 'Ciências Exatas e da Terra', 'area': 'Física'}),
+    ("Controle de conversores de potência em sistemas de energia elétrica",
+     {'grande_area': 'Engenharias', 'area': 'Engenharia Elétrica'}),
+    ("Processamento de sinal e antenas para telecomunicações", {'grande_area': 'Engenharias', 'area': 'Engenharia Elétrica'}),
+    ("Estruturas de concreto e fundações em solo para engenharia civil",
+     {'grande_area': 'Engenharias', 'area': 'Engenharia Civil', 'sub_area': 'Estruturas'}),
+    ("Drenagem urbana, hidráulica e sustentabilidade", {'area': 'Engenharia Civil'}),
+    ("Conservação da biodiversidade e ecologia de florestas tropicais",
+     {'grande_area': 'Ciências Biológicas', 'area': 'Ecologia'}),
+    ("Ecologia de habitats aquáticos: mudanças do clima e população de espécies", {'area': 'Ecologia'}),
+    ("Epidemiologia e vigilância de doenças transmissíveis na saúde coletiva",
+     {'grande_area': 'Ciências da Saúde', 'area': 'Saúde Coletiva', 'sub_area': 'Epidemiologia'}),
+    ("Cobertura de vacina e mortalidade infantil na atenção primária à saúde", {'area': 'Saúde Coletiva'}),
+    ("Formação de professores e currículo na educação básica",
+     {'grande_area': 'Ciências Humanas', 'area': 'Educação'}),
+    ("Avaliação do ensino na educação pública e políticas de inclusão", {'area': 'Educação'}),
+    ("Estratégia, inovação e governança em empresas de tecnologia",
+     {'grande_area': 'Ciências Sociais Aplicadas', 'area': 'Administração'}),
+    ("Finanças, mercado e desempenho na administração pública", {'area': 'Administração'}),
+    ("Produtividade do cultivo de soja com irrigação e adubação do solo",
+     {'grande_area': 'Ciências Agrárias', 'area': 'Agronomia'}),
+    ("Manejo de pragas e fertilidade do solo na colheita", {'area': 'Agronomia'}),
+    ("Análise do discurso e tradução de narrativas na literatura brasileira",
+     {'grande_area': 'Linguística, Letras e Artes', 'area': 'Letras'}),
+    ("Linguística aplicada à leitura, gramática e ensino de linguagem", {'area': 'Letras'}),
+)
+
+
+def _percentiles(values):
+    if not values: return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+
+
+def _run_query(engine, text, area_struct, weights, lookback_years, top_k):
+    """ Executa uma busca e devolve o trace dela (durações por etapa e contadores, ver utils.instrumentation). """
+    with collect() as traces:
+        engine.recommend(text, weights, area_struct, lookback_years, top_k=top_k)
+    return traces[-1]
+
+
+def run_benchmark(queries=QUERY_CORPUS, repeat=3, concurrency=(1,), weights=None, lookback_years=4, top_k=20,
+                  candidate_cache=False):
+    """
+    Executa 'queries' (pares (texto, área do aluno)) 'repeat' vezes para cada nível de 'concurrency'.
+    Retorna um dict com latências por etapa (segundos) e vazão por nível de concorrência.
+    Com candidate_cache=False (padrão), o motor medido não guarda candidatos entre buscas.
+    """
+    from utils.db_utils import get_db_path
+    from utils.thesis_recommend import CANDIDATE_CACHE_SIZE, RecommendationEngine, get_engine, warm_up
+
+    # Motor próprio (mesmo spaCy do compartilhado), para não medir nem poluir o cache de candidatos dele
+    engine = RecommendationEngine(get_engine().nlp, CANDIDATE_CACHE_SIZE if candidate_cache else 0)
+    # Aquecimento fora da medição: spaCy, índice de áreas, modelos salvos e caches do SQLite
+    warm_up(background=False)
+    for text, area_struct in queries:
+        engine.recommend(text, weights, area_struct, lookback_years, top_k=top_k)
+
+    report = {
+        'db': os.path.abspath(get_db_path()),
+        'queries': len(queries), 'repeat': repeat, 'top_k': top_k, 'lookback_years': lookback_years,
+        'candidate_cache': candidate_cache,
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'runs': [],
+    }
+    for threads in concurrency:
+        jobs = [q for _ in range(repeat) for q in queries]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            outcomes = list(executor.map(
+                lambda q: _run_query(engine, q[0], q[1], weights, lookback_years, top_k), jobs
+            ))
+        elapsed = time.perf_counter() - start
+
+        # Buscas que acertaram o cache de candidatos pulam áreas, Birch e KMeans: ficam fora dos percentis das etapas
+        hits = [t for t in outcomes if t['counters'].get('cache_hit_candidates')]
+        misses = [t for t in outcomes if not t['counters'].get('cache_hit_candidates')]
+        stages = {}
+        for stage in STAGES + ('total',):
+            values = [t['spans'][stage] for t in misses if stage in t['spans']]
+            stages[stage] = dict(_percentiles(values), count=len(values))
+        cached = [t['spans']['total'] for t in hits if 'total' in t['spans']]
+        counters = sorted({name for t in outcomes for name in t['counters']})
+        report['runs'].append({
+            'concurrency': threads,
+            'searches': len(jobs),
+            'seconds': elapsed,
+            'throughput': len(jobs) / elapsed if elapsed else None,
+            'empty_results': sum(1 for t in outcomes if not t['counters'].get('results')),
+            'errors': sum(1 for t in outcomes if t['error']),
+            'stages': stages,
+            'candidate_cache_hits': len(hits),
+            'cached': dict(_percentiles(cached), count=len(cached)),
+            # Média por busca (candidatos que sobrevivem a cada filtro, linhas lidas, acertos de cache)
+            'counters': {name: sum(t['counters'].get(name, 0) for t in outcomes) / len(outcomes) for name in counters},
+        })
+    return report
+
+
+def format_report(report):
+    lines = [f"Banco: {report['db']} | {report['queries']} propostas x {report['repeat']} repetições | "
+             f"top_k={report['top_k']} | cache de candidatos {'ligado' if report.get('candidate_cache') else 'desligado'} | "
+             f"{report['machine']['cpus']} CPUs"]
+    for run in report['runs']:
+        lines.append("")
+        lines.append(f"Concorrência {run['concurrency']}: {run['searches']} buscas em {run['seconds']:.2f}s "
+                     f"= {run['throughput']:.2f} buscas/s ({run['empty_results']} sem resultado, {run['errors']} erro(s))")
+        lines.append(f"  {'etapa':<10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'n':>6}")
+        for stage, values in run['stages'].items():
+            if not values['count']: continue
+            lines.append(f"  {stage:<10} " + ' '.join(f"{values[f'p{p}'] * 1000:>10.1f}" for p in PERCENTILES)
+                         + f" {values['count']:>6}")
+        if run['cached']['count']:
+            values = run['cached']
+            lines.append(f"  {'cached':<10} " + ' '.join(f"{values[f'p{p}'] * 1000:>10.1f}" for p in PERCENTILES)
+                         + f" {values['count']:>6}   (acertos do cache de candidatos: só a pontuação)")
+        for name, mean in run['counters'].items():
+            lines.append(f"  {name:<28} média {mean:>10.1f}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do motor de recomendação (latência por etapa e vazão).")
+    parser.add_argument('--db', default=None, help="Banco a medir (padrão: RECOMENDAPROF_DB ou data/base_recomendacao.db).")
+    parser.add_argument('--repeat', type=int, default=3, help="Repetições do conjunto de propostas.")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1], help="Threads simultâneas (ex.: 1 4 8).")
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--lookback-years', type=int, default=4)
+    parser.add_argument('--candidate-cache', action='store_true',
+                        help="Mantém o cache de candidatos do motor (buscas repetidas só refazem a pontuação).")
+    parser.add_argument('--json', default=None, help="Grava o relatório completo neste arquivo (comparação entre versões).")
+    args = parser.parse_args()
+
+    if args.db:
+        from utils.db_utils import DB_PATH_ENV
+        os.environ[DB_PATH_ENV] = args.db
+
+    report = run_benchmark(QUERY_CORPUS, args.repeat, tuple(args.concurrency),
+                           lookback_years=args.lookback_years, top_k=args.top_k, candidate_cache=args.candidate_cache)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nRelatório salvo em {args.json}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# db_indexes.py - Índices do esquema SQLite usados pelo motor e verificação dos planos de consulta
+# O banco é distribuído pronto (base_recomendacao.db) e não traz índices: toda consulta
+# por candidato virava varredura completa. Aqui ficam a migração e o "conselheiro" de índices.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.db_indexes migrate   -> cria os índices e roda ANALYZE
+#   python -m utils.db_indexes check     -> EXPLAIN QUERY PLAN de cada consulta do motor
+
+import argparse
+import datetime
+import sys
+from utils.db_utils import get_db_connection, SQL_PUBLICATIONS_COUNT, SQL_PUBLICATIONS_LIST
+
+# (nome, tabela, colunas). Colunas extras no fim tornam o índice "cobridor" da consulta.
+INDEXES = (
+    ('idx_publicacao_pessoa_ano', 'publicacao', ('id_pessoa', 'ano')),
+    ('idx_orientacao_pessoa_natureza_ano', 'orientacao', ('id_pessoa', 'natureza', 'ano')),
+    ('idx_palavra_chave_pessoa_ano', 'palavra_chave', ('id_pessoa', 'ano', 'palavra')),
+    ('idx_area_conhecimento_pessoa', 'area_conhecimento', ('id_pessoa',)),
+    ('idx_pessoa_ppg_pessoa_ppg', 'pessoa_ppg', ('id_pessoa', 'id_ppg')),
+    ('idx_dataset_pessoa', 'dataset', ('id_pessoa',)),
+    ('idx_pessoa_id', 'pessoa', ('id',)),
+    ('idx_ppg_id', 'ppg', ('id',)),
+)
+
+# Consultas que leem a tabela inteira por natureza (executadas uma vez, fora do caminho da busca)
+EXPECTED_FULL_SCANS = {'area_index_build', 'dataset_all', 'keywords_all'}
+
+
+def _table_columns(conn, table):
+    return {row[1]: row for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _is_rowid_alias(columns, column):
+    """ 'INTEGER PRIMARY KEY' já é o rowid: um índice extra só ocuparia espaço. """
+    info = columns.get(column)
+    return info is not None and info[5] == 1 and str(info[2]).upper() == 'INTEGER' and \
+        sum(1 for c in columns.values() if c[5]) == 1
+
+
+def migrate(conn=None):
+    """ Cria os índices que faltam e atualiza as estatísticas do planejador. Retorna os nomes criados. """
+    own_conn = conn is None
+    if own_conn: conn = get_db_connection()
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        created = []
+        for name, table, columns in INDEXES:
+            table_cols = _table_columns(conn, table)
+            if not table_cols:
+                print(f"Tabela '{table}' inexistente: índice {name} ignorado.")
+                continue
+            missing = [c for c in columns if c not in table_cols]
+            if missing:
+                print(f"Colunas {missing} ausentes em '{table}': índice {name} ignorado.")
+                continue
+            if len(columns) == 1 and _is_rowid_alias(table_cols, columns[0]): continue
+            if name in existing: continue
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)})")
+            created.append(name)
+        conn.execute("ANALYZE")
+        conn.commit()
+        return created
+    finally:
+        if own_conn: conn.close()
+
+
+def engine_queries(sample_ids='1, 2, 3'):
+    """ (nome, sql, parâmetros) de cada consulta emitida pelo motor e pela tela de detalhes. """
+    from utils.thesis_recommend import (
+        Ranking, SQL_DATASET_ALL, SQL_DATASET_ROWS, SQL_DATASET_HEADER, SQL_KEYWORDS, SQL_KEYWORDS_ALL, SQL_NAMES
+    )
+    from utils.professor_metrics import ranking_metrics_sql
+
+    current_year = datetime.datetime.now().year
+    start_year_recent = current_year - 4
+    return [
+        ('area_index_build', "SELECT p.id_pessoa, ppg.area1, ppg.area2, ppg.area3 "
+                             "FROM ppg INNER JOIN pessoa_ppg p ON ppg.id = p.id_ppg", ()),
+        ('dataset_all', SQL_DATASET_ALL, ()),
+        ('dataset_rows', SQL_DATASET_ROWS.format(ids=sample_ids), ()),
+        ('dataset_header', SQL_DATASET_HEADER, ()),
+        ('keywords', SQL_KEYWORDS.format(ids=sample_ids), ()),
+        ('keywords_all', SQL_KEYWORDS_ALL, ()),
+        ('names', SQL_NAMES.format(ids=sample_ids), ()),
+        ('ranking_legacy', Ranking('')._rankingSql(sample_ids, current_year, start_year_recent), ()),
+        ('ranking_metrics', ranking_metrics_sql(sample_ids, current_year, start_year_recent), ()),
+        ('publications_count', SQL_PUBLICATIONS_COUNT, (1,)),
+        ('publications_list', SQL_PUBLICATIONS_LIST + " LIMIT 10", (1,)),
+    ]
+
+
+def _is_full_scan(detail):
+    # 'SCAN tabela' sem índice; 'SCAN ... USING COVERING INDEX' ainda lê o índice todo, mas não a tabela,
+    # e 'SCAN (subquery-N)' percorre só o resultado já filtrado de uma subconsulta
+    return detail.startswith('SCAN ') and not detail.startswith('SCAN (') \
+        and 'USING' not in detail and 'CONSTANT ROW' not in detail
+
+
+def check(conn=None):
+    """
+    Roda EXPLAIN QUERY PLAN em cada consulta do motor e imprime o plano.
+    Retorna a lista de (consulta, passo) com varreduras completas inesperadas.
+    """
+    own_conn = conn is None
+    if own_conn: conn = get_db_connection()
+    problems = []
+    try:
+        for name, sql, params in engine_queries():
+            try:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            except Exception as e:
+                print(f"\n[{name}] não verificada: {e}")
+                continue
+            print(f"\n[{name}]")
+            for row in plan:
+                detail = row[3]
+                flag = ''
+                if _is_full_scan(detail):
+                    if name in EXPECTED_FULL_SCANS:
+                        flag = '  (varredura esperada)'
+                    else:
+                        flag = '  <-- VARREDURA COMPLETA'
+                        problems.append((name, detail))
+                print(f"  {detail}{flag}")
+    finally:
+        if own_conn: conn.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Índices do banco e verificação dos planos de consulta do motor.")
+    parser.add_argument('command', choices=['migrate', 'check'])
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        created = migrate()
+        print(f"{len(created)} índice(s) criado(s): {', '.join(created) or '-'}. ANALYZE concluído.")
+        return
+
+    problems = check()
+    print()
+    if problems:
+        print(f"{len(problems)} varredura(s) completa(s) inesperada(s). Rode 'python -m utils.db_indexes migrate'.")
+        sys.exit(1)
+    print("Nenhuma varredura completa inesperada.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,77 +1,175 @@
 # db_utils.py - Adaptado para encontrar o banco na pasta data/ ou raiz
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
+from urllib.parse import quote
 
 # Define o caminho relativo para a pasta data/ dentro do projeto
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # Tenta primeiro na pasta data/, depois na raiz
 DB_PATH_DATA = os.path.join(BASE_DIR, '../data', 'base_recomendacao.db')
 DB_PATH_ROOT = os.path.join(BASE_DIR, '../base_recomendacao.db')
+# Caminho alternativo (ex.: banco sintético de benchmark, python -m utils.synthetic_db)
+DB_PATH_ENV = 'RECOMENDAPROF_DB'
 
-def get_db_connection():
+# Ajustes das conexões somente leitura do pool (valores em bytes / KiB negativos, ver docs do SQLite)
+READ_PRAGMAS = (
+    "PRAGMA query_only = ON",
+    "PRAGMA mmap_size = 268435456",   # 256 MB mapeados em memória
+    "PRAGMA cache_size = -65536",     # 64 MB de cache de páginas por conexão
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",     # Aguarda escritores (ex.: refresh de métricas) em vez de falhar
+)
+
+# Consultas de publicações (também auditadas por utils.db_indexes)
+SQL_PUBLICATIONS_COUNT = "SELECT COUNT(*) as count FROM publicacao WHERE id_pessoa = ?"
+SQL_PUBLICATIONS_LIST = "SELECT titulo FROM publicacao WHERE id_pessoa = ? ORDER BY ano DESC"
+
+# Versão dos dados: incrementada a cada carga que altera o banco (utils.lattes_ingest).
+# Caches de resultados incluem a versão na chave e deixam de valer após uma carga.
+DATA_VERSION_TABLE = 'versao_dados'
+
+_resolved_path = None
+_local = threading.local()
+
+def get_db_path():
     """
-    Cria e retorna uma conexão com o banco SQLite.
-    Verifica se o arquivo existe na pasta 'data/' ou na raiz.
+    Retorna o caminho do banco SQLite: o da variável RECOMENDAPROF_DB, se definida, ou
+    o arquivo da pasta 'data/' ou da raiz (resolvido uma vez e reaproveitado).
     """
-    final_path = None
-    
+    global _resolved_path
+    override = os.environ.get(DB_PATH_ENV)
+    if override:
+        if not os.path.exists(override):
+            raise FileNotFoundError(f"Banco de dados definido em {DB_PATH_ENV} não encontrado: {override}")
+        return override
+
+    if _resolved_path is not None and os.path.exists(_resolved_path):
+        return _resolved_path
+
     if os.path.exists(DB_PATH_DATA):
-        final_path = DB_PATH_DATA
+        _resolved_path = DB_PATH_DATA
     elif os.path.exists(DB_PATH_ROOT):
-        final_path = DB_PATH_ROOT
+        _resolved_path = DB_PATH_ROOT
     else:
         raise FileNotFoundError(
             f"Banco de dados não encontrado.\n"
             f"Esperado em: {DB_PATH_DATA} ou {DB_PATH_ROOT}\n"
             "Certifique-se de extrair o arquivo 'base_recomendacao.db'."
         )
+    return _resolved_path
+
+def get_db_connection():
+    """
+    Cria e retorna uma conexão (leitura e escrita) com o banco SQLite.
+    Para consultas do motor, prefira pooled_connection().
+    """
+    final_path = get_db_path()
     
     conn = sqlite3.connect(final_path)
     # Permite acessar colunas pelo nome (row['nome'])
     conn.row_factory = sqlite3.Row 
     return conn
 
+def _open_read_only(path):
+    uri = f"file:{quote(os.path.abspath(path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
+    conn.row_factory = sqlite3.Row
+    for pragma in READ_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@contextmanager
+def pooled_connection():
+    """
+    Empresta a conexão somente leitura da thread atual (aberta uma vez por thread).
+    Não feche a conexão recebida. Se o arquivo do banco for substituído, ela é reaberta.
+    """
+    path = get_db_path()
+    stat = os.stat(path)
+    key = (path, stat.st_dev, stat.st_ino)
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.key != key:
+        if conn is not None: conn.close()
+        conn = _open_read_only(path)
+        _local.conn, _local.key = conn, key
+    try:
+        yield conn
+    except sqlite3.Error:
+        # Conexão em estado incerto: descarta para a próxima chamada abrir outra
+        _local.conn = None
+        conn.close()
+        raise
+
+def reset_connection_pool():
+    """ Fecha a conexão da thread atual e esquece o caminho resolvido. """
+    global _resolved_path
+    conn = getattr(_local, 'conn', None)
+    if conn is not None: conn.close()
+    _local.conn = None
+    _resolved_path = None
+
+def get_data_version():
+    """ Versão atual dos dados (0 se o banco nunca passou por uma carga incremental). """
+    try:
+        with pooled_connection() as conn:
+            row = conn.execute(f"SELECT versao FROM {DATA_VERSION_TABLE} WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row else 0
+
+def bump_data_version(conn):
+    """ Incrementa a versão dos dados na transação de 'conn' (sem commit). Retorna a nova versão. """
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE} "
+        "(id INTEGER PRIMARY KEY CHECK (id = 1), versao INTEGER NOT NULL, atualizado_em TEXT NOT NULL)"
+    )
+    conn.execute(
+        f"INSERT INTO {DATA_VERSION_TABLE} (id, versao, atualizado_em) VALUES (1, 1, datetime('now')) "
+        "ON CONFLICT(id) DO UPDATE SET versao = versao + 1, atualizado_em = datetime('now')"
+    )
+    return conn.execute(f"SELECT versao FROM {DATA_VERSION_TABLE} WHERE id = 1").fetchone()[0]
+
 def get_publications_by_professor_id(professor_identifier, limit=10):
     """
     Busca publicações compatível com SQLite.
     Aceita ID (int) ou Nome (str).
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        with pooled_connection() as conn:
+            cur = conn.cursor()
         
-        prof_id_int = None
+            prof_id_int = None
         
-        # 1. Resolução de ID (Nome -> Int)
-        if str(professor_identifier).isdigit():
-            prof_id_int = int(professor_identifier)
-        else:
-            # Limpeza do nome (slug -> nome real aproximado)
-            clean_name = str(professor_identifier).replace("_", " ").replace("legacy ", "").strip()
-            cur.execute("SELECT id FROM pessoa WHERE nome LIKE ? LIMIT 1", (f"%{clean_name}%",))
-            result = cur.fetchone()
-            if result:
-                prof_id_int = result['id']
+            # 1. Resolução de ID (Nome -> Int)
+            if str(professor_identifier).isdigit():
+                prof_id_int = int(professor_identifier)
             else:
-                return [], 0
+                # Limpeza do nome (slug -> nome real aproximado)
+                clean_name = str(professor_identifier).replace("_", " ").replace("legacy ", "").strip()
+                cur.execute("SELECT id FROM pessoa WHERE nome LIKE ? LIMIT 1", (f"%{clean_name}%",))
+                result = cur.fetchone()
+                if result:
+                    prof_id_int = result['id']
+                else:
+                    return [], 0
 
-        if prof_id_int is None: return [], 0
+            if prof_id_int is None: return [], 0
 
-        # 2. Busca de Publicações
-        cur.execute("SELECT COUNT(*) as count FROM publicacao WHERE id_pessoa = ?", (prof_id_int,))
-        total_count = cur.fetchone()['count']
+            # 2. Busca de Publicações
+            cur.execute(SQL_PUBLICATIONS_COUNT, (prof_id_int,))
+            total_count = cur.fetchone()['count']
 
-        sql = "SELECT titulo FROM publicacao WHERE id_pessoa = ? ORDER BY ano DESC"
-        if limit: sql += f" LIMIT {limit}"
+            sql = SQL_PUBLICATIONS_LIST
+            if limit: sql += f" LIMIT {limit}"
             
-        cur.execute(sql, (prof_id_int,))
-        publications = [item['titulo'] for item in cur.fetchall()]
+            cur.execute(sql, (prof_id_int,))
+            publications = [item['titulo'] for item in cur.fetchall()]
         
-        return publications, total_count
+            return publications, total_count
 
     except Exception as e:
         print(f"Erro no DB Utils: {e}")
-        return [], 0
-    finally:
-        if conn: conn.close()
\ No newline at end of file
+        return [], 0
\ No newline at end of file
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+# instrumentation.py - Medição leve do pipeline (durações por etapa e contadores por chamada)
+# Cada busca abre um "trace" (trace('recommend')); dentro dele, span('areas') mede uma etapa e
+# count('candidates_areas', n) soma contadores (candidatos, linhas de SQL, acertos de cache).
+# Ao fim do trace, o registro vai para os sinks: o agregador em memória (exportado no formato
+# texto do Prometheus) e, com RECOMENDAPROF_TRACE_FILE definido, um arquivo JSON-lines.
+# Fora de um trace, span() e count() não fazem nada.
+#
+# Uso (a partir da raiz do projeto):
+#   RECOMENDAPROF_TRACE_FILE=traces.jsonl streamlit run streamlit_app.py
+#   python -m utils.instrumentation summary traces.jsonl
+#   python -m utils.instrumentation prometheus traces.jsonl -o metrics.prom
+
+import argparse
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_FILE_ENV = 'RECOMENDAPROF_TRACE_FILE'
+METRIC_PREFIX = 'recomendaprof'
+# Limites (segundos) dos buckets do histograma de duração
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current = contextvars.ContextVar('recomendaprof_trace', default=None)
+_collector = contextvars.ContextVar('recomendaprof_collector', default=None)
+
+
+class Trace(object):
+    """ Medições de uma chamada: duração de cada etapa (segundos), contadores e erro, se houver. """
+
+    def __init__(self, name, labels=None):
+        self.name = name
+        self.labels = labels or {}
+        self.started_at = time.time()
+        self.spans = {}
+        self.counters = {}
+        self.error = None
+
+    def to_dict(self):
+        return {
+            'trace': self.name, 'started_at': self.started_at, 'labels': self.labels,
+            'spans': self.spans, 'counters': self.counters, 'error': self.error,
+        }
+
+
+@contextmanager
+def trace(name, **labels):
+    """ Abre um trace para a chamada atual; no fim, o registro é enviado aos sinks. """
+    current = Trace(name, labels)
+    token = _current.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.spans['total'] = time.perf_counter() - start
+        _current.reset(token)
+        record(current.to_dict())
+
+
+@contextmanager
+def span(stage):
+    """ Soma a duração do bloco à etapa 'stage' do trace atual. """
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.spans[stage] = current.spans.get(stage, 0.0) + time.perf_counter() - start
+
+
+def count(name, value=1):
+    """ Soma 'value' ao contador 'name' do trace atual (ex.: candidates_areas, sql_rows_ranking). """
+    current = _current.get()
+    if current is not None:
+        current.counters[name] = current.counters.get(name, 0) + value
+
+
+def current_trace():
+    return _current.get()
+
+
+# --------------------------------------------------------------------------- #
+#                                  SINKS                                      #
+# --------------------------------------------------------------------------- #
+_sinks = []
+_sinks_lock = threading.Lock()
+
+
+def add_sink(sink):
+    """ Registra 'sink' (função que recebe o dict de cada trace concluído). """
+    with _sinks_lock:
+        _sinks.append(sink)
+    return sink
+
+
+def remove_sink(sink):
+    with _sinks_lock:
+        if sink in _sinks: _sinks.remove(sink)
+
+
+def record(trace_dict):
+    """
+    Entrega um trace concluído aos sinks. Também usado para registros vindos de outro processo
+    (ex.: workers do utils.service, que devolvem o trace junto do resultado).
+    """
+    collected = _collector.get()
+    if collected is not None: collected.append(trace_dict)
+    for sink in list(_sinks):
+        try:
+            sink(trace_dict)
+        except Exception as e:
+            # Falha de exportação não pode derrubar a busca
+            print(f"Erro ao exportar métricas: {e}")
+
+
+@contextmanager
+def collect():
+    """ Lista com os traces concluídos dentro do bloco (no contexto atual; blocos aninhados repassam ao externo). """
+    records = []
+    parent = _collector.get()
+    token = _collector.set(records)
+    try:
+        yield records
+    finally:
+        _collector.reset(token)
+        if parent is not None: parent.extend(records)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class MetricsRegistry(object):
+    """ Agregado em memória dos traces: chamadas, histograma de duração por etapa e soma dos contadores. """
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.calls = {}       # (trace, status) -> chamadas
+        self.durations = {}   # (trace, stage) -> [contagem por bucket..., +Inf, soma]
+        self.counters = {}    # (trace, nome) -> soma
+
+    def __call__(self, trace_dict):
+        name = trace_dict['trace']
+        status = 'error' if trace_dict.get('error') else 'ok'
+        with self._lock:
+            self.calls[(name, status)] = self.calls.get((name, status), 0) + 1
+            for stage, seconds in trace_dict['spans'].items():
+                hist = self.durations.setdefault((name, stage), [0] * (len(self.buckets) + 1) + [0.0])
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound: hist[i] += 1
+                hist[len(self.buckets)] += 1
+                hist[-1] += seconds
+            for counter, value in trace_dict['counters'].items():
+                self.counters[(name, counter)] = self.counters.get((name, counter), 0) + value
+
+    def prometheus_text(self):
+        """ Métricas no formato de exposição texto do Prometheus (endpoint /metrics ou textfile collector). """
+        p = METRIC_PREFIX
+        with self._lock:
+            lines = [f"# HELP {p}_calls_total Chamadas instrumentadas por tipo e resultado.",
+                     f"# TYPE {p}_calls_total counter"]
+            for (name, status), value in sorted(self.calls.items()):
+                lines.append(f"{p}_calls_total{_labels(trace=name, status=status)} {value}")
+
+            lines += [f"# HELP {p}_stage_seconds Duração de cada etapa em segundos.",
+                      f"# TYPE {p}_stage_seconds histogram"]
+            for (name, stage), hist in sorted(self.durations.items()):
+                for bound, value in zip(self.buckets, hist):
+                    lines.append(f"{p}_stage_seconds_bucket{_labels(trace=name, stage=stage, le=bound)} {value}")
+                lines.append(f"{p}_stage_seconds_bucket{_labels(trace=name, stage=stage, le='+Inf')} {hist[len(self.buckets)]}")
+                lines.append(f"{p}_stage_seconds_sum{_labels(trace=name, stage=stage)} {hist[-1]}")
+                lines.append(f"{p}_stage_seconds_count{_labels(trace=name, stage=stage)} {hist[len(self.buckets)]}")
+
+            lines += [f"# HELP {p}_events_total Soma dos contadores (candidatos, linhas de SQL, acertos de cache).",
+                      f"# TYPE {p}_events_total counter"]
+            for (name, counter), value in sorted(self.counters.items()):
+                lines.append(f"{p}_events_total{_labels(trace=name, name=counter)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """ Grava o texto do Prometheus com troca atômica (formato do textfile collector do node_exporter). """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+class JsonLinesSink(object):
+    """ Acrescenta cada trace como uma linha JSON em 'path' (leitura offline, ver main()). """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, trace_dict):
+        line = json.dumps(trace_dict, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+_registry = add_sink(MetricsRegistry())
+_file_sink = add_sink(JsonLinesSink(os.environ[TRACE_FILE_ENV])) if os.environ.get(TRACE_FILE_ENV) else None
+
+
+def get_registry():
+    """ Agregador do processo (sempre ativo). """
+    return _registry
+
+
+def disable_file_sink():
+    """
+    Para de gravar RECOMENDAPROF_TRACE_FILE neste processo. Usado nos workers, que herdam a
+    variável mas devolvem os traces ao processo principal, que já os grava.
+    """
+    global _file_sink
+    if _file_sink is not None:
+        remove_sink(_file_sink)
+        _file_sink = None
+
+
+# --------------------------------------------------------------------------- #
+#                           LEITURA OFFLINE (CLI)                             #
+# --------------------------------------------------------------------------- #
+def read_traces(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip(): yield json.loads(line)
+
+
+def summarize(traces):
+    """ {trace: {'calls', 'errors', 'stages': {etapa: {p50, p95, p99}}, 'counters': {nome: média}}} """
+    import numpy as np
+
+    grouped = {}
+    for t in traces:
+        group = grouped.setdefault(t['trace'], {'calls': 0, 'errors': 0, 'spans': {}, 'counters': {}})
+        group['calls'] += 1
+        if t.get('error'): group['errors'] += 1
+        for stage, seconds in t['spans'].items(): group['spans'].setdefault(stage, []).append(seconds)
+        for name, value in t['counters'].items(): group['counters'].setdefault(name, []).append(value)
+
+    summary = {}
+    for name, group in grouped.items():
+        summary[name] = {
+            'calls': group['calls'], 'errors': group['errors'],
+            'stages': {stage: {f"p{p}": float(np.percentile(values, p)) for p in (50, 95, 99)}
+                       for stage, values in group['spans'].items()},
+            'counters': {counter: sum(values) / group['calls'] for counter, values in group['counters'].items()},
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leitura offline dos traces gravados em JSON-lines.")
+    parser.add_argument('command', choices=['summary', 'prometheus'])
+    parser.add_argument('path', help="Arquivo JSON-lines (RECOMENDAPROF_TRACE_FILE).")
+    parser.add_argument('-o', '--output', default=None, help="(prometheus) grava em arquivo em vez de imprimir.")
+    args = parser.parse_args()
+
+    if args.command == 'prometheus':
+        registry = MetricsRegistry()
+        for t in read_traces(args.path): registry(t)
+        if args.output:
+            registry.write_prometheus(args.output)
+            print(f"Métricas gravadas em {args.output}.")
+        else:
+            print(registry.prometheus_text(), end='')
+        return
+
+    for name, s in summarize(read_traces(args.path)).items():
+        print(f"{name}: {s['calls']} chamada(s), {s['errors']} erro(s)")
+        for stage, values in s['stages'].items():
+            print(f"  {stage:<12} p50 {values['p50'] * 1000:8.1f} ms   p95 {values['p95'] * 1000:8.1f} ms   "
+                  f"p99 {values['p99'] * 1000:8.1f} ms")
+        for counter, mean in sorted(s['counters'].items()):
+            print(f"  {counter:<24} média {mean:10.1f} por chamada")
+
+
+if __name__ == '__main__':
+    main()
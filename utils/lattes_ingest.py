@@ -0,0 +1,532 @@
+# -*- coding: utf-8 -*-
+# lattes_ingest.py - Carga dos currículos Lattes (XML) no banco SQLite
+# Cada arquivo é lido em streaming (iterparse, liberando os elementos já processados), os arquivos
+# são processados em paralelo num pool de processos e as linhas são gravadas em lote (executemany)
+# em transações grandes. Cada identificador Lattes (NUMERO-IDENTIFICADOR) é associado a um id de
+# 'pessoa' (tabela 'lattes_pessoa'): na primeira carga, ao professor já existente com o mesmo nome
+# ou, sem correspondência única, a um professor novo com o próprio identificador Lattes como id.
+# 'ppg' e 'pessoa_ppg' (dados da CAPES) não vêm do Lattes e não são alterados: professores novos
+# só passam no filtro de área (e aparecem nas buscas) depois de vinculados a um PPG em 'pessoa_ppg'.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.lattes_ingest caminho/dos/curriculos [outro.xml curriculo.zip ...] --workers 8
+#   python -m utils.lattes_ingest caminho/dos/curriculos --incremental --remove-missing
+# No modo incremental só os currículos com conteúdo diferente da última carga (hash por id_pessoa)
+# são regravados, e as tabelas/modelos derivados são atualizados apenas para esses professores.
+
+import argparse
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+import unicodedata
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import Counter
+from utils.db_utils import get_db_connection, bump_data_version
+from utils.professor_metrics import metrics_available, refresh_professor_metrics
+
+# Currículos por transação
+BATCH_SIZE = 500
+# Tamanho do vocabulário do 'dataset' quando o banco ainda não tem cabeçalho (id_pessoa = 0)
+DEFAULT_VOCABULARY_SIZE = 2000
+# Tabelas com uma linha por item do currículo (apagadas e regravadas a cada carga do professor)
+CHILD_TABLES = ('publicacao', 'orientacao', 'palavra_chave', 'area_conhecimento')
+# Hash do conteúdo de cada currículo carregado (base do modo incremental)
+HASH_TABLE = 'curriculo_hash'
+# Identificador Lattes -> id_pessoa (estável entre cargas)
+LINK_TABLE = 'lattes_pessoa'
+# Campos de 'pessoa' que vêm do Lattes (as demais colunas não são tocadas)
+PESSOA_FIELDS = ('nome', 'titulacao', 'universidade', 'ano_doutorado')
+
+# Produção bibliográfica: elemento -> (tipo, dados básicos, atributo do título, atributo do ano,
+# detalhamento, {coluna: atributo do detalhamento})
+PUBLICATIONS = {
+    'ARTIGO-PUBLICADO': ('ARTIGO', 'DADOS-BASICOS-DO-ARTIGO', 'TITULO-DO-ARTIGO', 'ANO-DO-ARTIGO',
+                         'DETALHAMENTO-DO-ARTIGO', {'periodico': 'TITULO-DO-PERIODICO-OU-REVISTA', 'issn': 'ISSN',
+                                                    'volume': 'VOLUME', 'pagina_inicial': 'PAGINA-INICIAL',
+                                                    'pagina_final': 'PAGINA-FINAL'}),
+    'TRABALHO-EM-EVENTOS': ('EVENTO', 'DADOS-BASICOS-DO-TRABALHO', 'TITULO-DO-TRABALHO', 'ANO-DO-TRABALHO',
+                            'DETALHAMENTO-DO-TRABALHO', {'periodico': 'NOME-DO-EVENTO',
+                                                        'classificacao_evento': 'CLASSIFICACAO-DO-EVENTO',
+                                                        'volume': 'VOLUME', 'pagina_inicial': 'PAGINA-INICIAL',
+                                                        'pagina_final': 'PAGINA-FINAL'}),
+    'LIVRO-PUBLICADO-OU-ORGANIZADO': ('LIVRO', 'DADOS-BASICOS-DO-LIVRO', 'TITULO-DO-LIVRO', 'ANO',
+                                      'DETALHAMENTO-DO-LIVRO', {}),
+    'CAPITULO-DE-LIVRO-PUBLICADO': ('CAPITULO', 'DADOS-BASICOS-DO-CAPITULO', 'TITULO-DO-CAPITULO-DO-LIVRO', 'ANO',
+                                    'DETALHAMENTO-DO-CAPITULO', {'periodico': 'TITULO-DO-LIVRO',
+                                                                 'pagina_inicial': 'PAGINA-INICIAL',
+                                                                 'pagina_final': 'PAGINA-FINAL'}),
+}
+# Seções completas: ao terminar uma delas, a raiz é esvaziada (memória constante por arquivo)
+_SECTIONS = {'DADOS-GERAIS', 'PRODUCAO-BIBLIOGRAFICA', 'PRODUCAO-TECNICA', 'OUTRA-PRODUCAO', 'DADOS-COMPLEMENTARES'}
+# Natureza das orientações pelo sufixo do elemento (mesmos valores usados pelo Ranking)
+_ORIENTATION_NATURE = {'MESTRADO': 'MESTRADO', 'DOUTORADO': 'DOUTORADO', 'POS-DOUTORADO': 'POS_DOUTORADO'}
+
+_TOKEN = re.compile(r'\w+')
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _child(elem, tag):
+    found = elem.find(tag)
+    return found.attrib if found is not None else {}
+
+
+# --------------------------------------------------------------------------- #
+#                      PARSING (executado nos workers)                        #
+# --------------------------------------------------------------------------- #
+_worker_stopwords = frozenset()
+_worker_nlp = None
+
+
+def _init_worker(stopwords, lemmatize):
+    global _worker_stopwords, _worker_nlp
+    _worker_stopwords = frozenset(stopwords)
+    if lemmatize:
+        from utils.thesis_recommend import get_nlp
+        _worker_nlp = get_nlp()
+
+
+def _tokens(titles):
+    """ Contagem de lemas (ou palavras, sem spaCy) dos títulos, sem stopwords: a linha do 'dataset'. """
+    counts = Counter()
+    if _worker_nlp is not None:
+        for doc in _worker_nlp.pipe(titles, batch_size=64):
+            for token in doc:
+                if token.is_stop or not token.is_alpha: continue
+                lemma = token.lemma_.strip().lower()
+                if len(lemma) > 2 and lemma not in _worker_stopwords: counts[lemma] += 1
+        return counts
+    for title in titles:
+        for word in _TOKEN.findall(title.lower()):
+            if len(word) > 2 and word.isalpha() and word not in _worker_stopwords: counts[word] += 1
+    return counts
+
+
+def _open(path):
+    """ Arquivo XML ou .zip com o XML do currículo (formato do download do Lattes). """
+    if path.lower().endswith('.zip'):
+        archive = zipfile.ZipFile(path)
+        name = next(n for n in archive.namelist() if n.lower().endswith('.xml'))
+        return archive.open(name)
+    return open(path, 'rb')
+
+
+def _publication(elem, spec, id_pessoa):
+    tipo, basic_tag, title_attr, year_attr, detail_tag, detail_columns = spec
+    basic = _child(elem, basic_tag)
+    detail = _child(elem, detail_tag)
+    ano = _int(basic.get(year_attr))
+    row = {
+        'tipo': tipo, 'titulo': basic.get(title_attr, '').strip(), 'idioma': basic.get('IDIOMA', ''),
+        'ano': ano, 'id_pessoa': id_pessoa, 'meio_divulgacao': basic.get('MEIO-DE-DIVULGACAO'),
+    }
+    if tipo == 'LIVRO': row['tipo_livro'] = basic.get('TIPO')
+    for column, attr in detail_columns.items():
+        row[column] = detail.get(attr)
+
+    keywords = [
+        {'palavra': word.strip(), 'ano': ano, 'id_pessoa': id_pessoa}
+        for key, word in sorted(_child(elem, 'PALAVRAS-CHAVE').items()) if word.strip()
+    ]
+    areas = [
+        {'grande_area_conhecimento': area.get('NOME-GRANDE-AREA-DO-CONHECIMENTO'),
+         'area_conhecimento': area.get('NOME-DA-AREA-DO-CONHECIMENTO'),
+         'sub_area_conhecimento': area.get('NOME-DA-SUB-AREA-DO-CONHECIMENTO'),
+         'especialidade': area.get('NOME-DA-ESPECIALIDADE'), 'id_pessoa': id_pessoa, 'ano': ano, 'tipo': tipo}
+        for area in (a.attrib for a in elem.iterfind('AREAS-DO-CONHECIMENTO/*'))
+        if area.get('NOME-GRANDE-AREA-DO-CONHECIMENTO') or area.get('NOME-DA-AREA-DO-CONHECIMENTO')
+    ]
+    return row, keywords, areas
+
+
+def _orientation(elem, id_pessoa):
+    """ Orientação concluída ('ORIENTACOES-CONCLUIDAS-PARA-*') ou em andamento ('ORIENTACAO-EM-ANDAMENTO-DE-*'). """
+    basic, detail = {}, {}
+    for child in elem:
+        if child.tag.startswith('DADOS-BASICOS'): basic = child.attrib
+        elif child.tag.startswith('DETALHAMENTO'): detail = child.attrib
+    suffix = elem.tag.split('-PARA-', 1)[1] if '-PARA-' in elem.tag else elem.tag.split('-DE-', 1)[-1]
+    natureza = _ORIENTATION_NATURE.get(suffix) or basic.get('NATUREZA') or suffix.replace('-', '_')
+    return {
+        'tipo_orientacao': detail.get('TIPO-DE-ORIENTACAO', ''), 'natureza': natureza,
+        'ano': basic.get('ANO', ''), 'titulo': (basic.get('TITULO') or basic.get('TITULO-DO-TRABALHO') or '').strip(),
+        'id_pessoa': id_pessoa,
+    }
+
+
+def _is_orientation(tag):
+    return tag.startswith('ORIENTACOES-CONCLUIDAS-PARA-') or tag == 'OUTRAS-ORIENTACOES-CONCLUIDAS' \
+        or tag.startswith('ORIENTACAO-EM-ANDAMENTO-DE-')
+
+
+def parse_curriculum(path):
+    """
+    Lê um currículo em streaming e retorna {'id', 'pessoa', 'publicacao', 'orientacao', 'palavra_chave',
+    'area_conhecimento', 'tokens'} (linhas como dicts coluna -> valor) ou {'error', 'source'}.
+    """
+    try:
+        record = {table: [] for table in CHILD_TABLES}
+        pessoa, titles, root, id_pessoa = {}, [], None, None
+        with _open(path) as f:
+            for event, elem in ET.iterparse(f, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    if root is None:
+                        root = elem
+                        id_pessoa = _int(elem.get('NUMERO-IDENTIFICADOR'))
+                    continue
+
+                if tag in PUBLICATIONS:
+                    row, keywords, areas = _publication(elem, PUBLICATIONS[tag], id_pessoa)
+                    record['publicacao'].append(row)
+                    record['palavra_chave'].extend(keywords)
+                    record['area_conhecimento'].extend(areas)
+                    if row['titulo']: titles.append(row['titulo'])
+                    elem.clear()
+                elif _is_orientation(tag):
+                    record['orientacao'].append(_orientation(elem, id_pessoa))
+                    elem.clear()
+                elif tag == 'DADOS-GERAIS':
+                    doutorado = _child(elem, 'FORMACAO-ACADEMICA-TITULACAO/DOUTORADO')
+                    mestrado = _child(elem, 'FORMACAO-ACADEMICA-TITULACAO/MESTRADO')
+                    if doutorado.get('STATUS-DO-CURSO', 'CONCLUIDO') == 'CONCLUIDO' and doutorado:
+                        titulacao = 'Doutorado'
+                    elif mestrado.get('STATUS-DO-CURSO', 'CONCLUIDO') == 'CONCLUIDO' and mestrado:
+                        titulacao = 'Mestrado'
+                    else:
+                        titulacao = 'Graduação'
+                    pessoa = {
+                        'id': id_pessoa, 'nome': elem.get('NOME-COMPLETO', '').strip(), 'titulacao': titulacao,
+                        'universidade': _child(elem, 'ENDERECO/ENDERECO-PROFISSIONAL').get('NOME-INSTITUICAO-EMPRESA'),
+                        'ano_doutorado': _int(doutorado.get('ANO-DE-CONCLUSAO')) if titulacao == 'Doutorado' else None,
+                    }
+                    record['area_conhecimento'].extend(
+                        {'grande_area_conhecimento': area.get('NOME-GRANDE-AREA-DO-CONHECIMENTO'),
+                         'area_conhecimento': area.get('NOME-DA-AREA-DO-CONHECIMENTO'),
+                         'sub_area_conhecimento': area.get('NOME-DA-SUB-AREA-DO-CONHECIMENTO'),
+                         'especialidade': area.get('NOME-DA-ESPECIALIDADE'),
+                         'id_pessoa': id_pessoa, 'ano': None, 'tipo': 'ATUACAO'}
+                        for area in (a.attrib for a in elem.iterfind('AREAS-DE-ATUACAO/AREA-DE-ATUACAO'))
+                    )
+
+                if tag in _SECTIONS: root.clear()
+
+        if id_pessoa is None or not pessoa:
+            return {'error': "currículo sem NUMERO-IDENTIFICADOR ou DADOS-GERAIS", 'source': path}
+        record['pessoa'] = pessoa
+        # Hash do conteúdo extraído (não dos bytes do arquivo): recompactar ou reformatar o XML não conta como mudança
+        content = json.dumps(record, sort_keys=True, ensure_ascii=False, default=str)
+        record.update({
+            'id': id_pessoa, 'hash': hashlib.sha1(content.encode('utf-8')).hexdigest(),
+            'tokens': _tokens(titles), 'source': path,
+        })
+        return record
+    except Exception as e:
+        return {'error': str(e), 'source': path}
+
+
+# --------------------------------------------------------------------------- #
+#                      GRAVAÇÃO (processo principal)                          #
+# --------------------------------------------------------------------------- #
+def _discover(paths):
+    """ Arquivos .xml/.zip informados diretamente ou encontrados (recursivamente) nas pastas. """
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, _, filenames in os.walk(path):
+                for name in sorted(filenames):
+                    if name.lower().endswith(('.xml', '.zip')): yield os.path.join(dirpath, name)
+        else:
+            yield path
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _name_key(nome):
+    """ Nome comparável: sem acentos, minúsculo e com espaços simples. """
+    text = unicodedata.normalize('NFKD', str(nome or ''))
+    return ' '.join(''.join(c for c in text if not unicodedata.combining(c)).lower().split())
+
+
+def _assign_id(record, id_pessoa):
+    """ Troca o identificador Lattes pelo id_pessoa do banco em todas as linhas do currículo. """
+    record['numero'] = record['id']
+    record['id'] = id_pessoa
+    record['pessoa']['id'] = id_pessoa
+    for table in CHILD_TABLES:
+        for row in record[table]: row['id_pessoa'] = id_pessoa
+
+
+class _Writer(object):
+    """ Grava lotes de currículos já lidos, só nas colunas que existem no banco de destino. """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.columns = {table: _table_columns(conn, table) for table in ('pessoa',) + CHILD_TABLES}
+        missing = [table for table, cols in self.columns.items() if not cols]
+        if missing: raise RuntimeError(f"Tabelas ausentes no banco: {', '.join(missing)}")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {HASH_TABLE} "
+            "(id_pessoa INTEGER PRIMARY KEY, hash TEXT NOT NULL, fonte TEXT, atualizado_em TEXT NOT NULL)"
+        )
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {LINK_TABLE} (numero INTEGER PRIMARY KEY, id_pessoa INTEGER NOT NULL)")
+        conn.commit()
+        self.links = dict(conn.execute(f"SELECT numero, id_pessoa FROM {LINK_TABLE}"))
+        self._claimed = set(self.links.values())
+        self._by_name = {}
+        for id_pessoa, nome in conn.execute("SELECT id, nome FROM pessoa"):
+            self._by_name.setdefault(_name_key(nome), []).append(id_pessoa)
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS _ingest_ids (id_pessoa INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS _ingest_tokens (id_pessoa INTEGER, lemma TEXT, n INTEGER)")
+
+    def resolve(self, record):
+        """
+        id_pessoa do currículo: o já associado ao identificador Lattes; senão, o professor existente
+        com o mesmo nome (se único e ainda sem currículo); senão, o próprio identificador Lattes.
+        """
+        numero = record['id']
+        id_pessoa = self.links.get(numero)
+        if id_pessoa is None:
+            candidates = [i for i in self._by_name.get(_name_key(record['pessoa'].get('nome')), [])
+                          if i == numero or i not in self._claimed]
+            if numero in candidates or len(candidates) != 1:
+                id_pessoa = numero
+            else:
+                id_pessoa = candidates[0]
+            self.links[numero] = id_pessoa
+            self._claimed.add(id_pessoa)
+        _assign_id(record, id_pessoa)
+        return id_pessoa
+
+    def _upsert_pessoa(self, rows):
+        # ON CONFLICT em vez de INSERT OR REPLACE: só os campos do Lattes mudam (e não são
+        # apagados quando o currículo não os informa); as demais colunas são preservadas
+        cols = [c for c in self.columns['pessoa'] if c in rows[0]]
+        updates = ', '.join(f"{c} = COALESCE(excluded.{c}, {c})" for c in cols if c in PESSOA_FIELDS)
+        self.conn.executemany(
+            f"INSERT INTO pessoa ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}",
+            [tuple(row.get(c) for c in cols) for row in rows]
+        )
+
+    def _insert(self, table, rows, verb='INSERT'):
+        if not rows: return
+        cols = [c for c in self.columns[table] if c in rows[0]]
+        self.conn.executemany(
+            f"{verb} INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' for _ in cols)})",
+            [tuple(row.get(c) for c in cols) for row in rows]
+        )
+
+    def write(self, records):
+        ids = [(r['id'],) for r in records]
+        with self.conn:
+            self.conn.execute("DELETE FROM _ingest_ids")
+            self.conn.executemany("INSERT OR IGNORE INTO _ingest_ids VALUES (?)", ids)
+            for table in CHILD_TABLES:
+                self.conn.execute(f"DELETE FROM {table} WHERE id_pessoa IN (SELECT id_pessoa FROM _ingest_ids)")
+            self._upsert_pessoa([r['pessoa'] for r in records])
+            for table in CHILD_TABLES:
+                self._insert(table, [row for r in records for row in r[table]])
+            self.conn.executemany(
+                "INSERT INTO _ingest_tokens VALUES (?, ?, ?)",
+                # Linha (id, NULL, 0) garante a linha do 'dataset' mesmo para currículos sem títulos
+                [(r['id'], lemma, n) for r in records for lemma, n in list(r['tokens'].items()) + [(None, 0)]]
+            )
+            now = datetime.datetime.now().isoformat(timespec='seconds')
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {HASH_TABLE} (id_pessoa, hash, fonte, atualizado_em) VALUES (?, ?, ?, ?)",
+                [(r['id'], r['hash'], r['source'], now) for r in records]
+            )
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {LINK_TABLE} (numero, id_pessoa) VALUES (?, ?)",
+                [(r['numero'], r['id']) for r in records]
+            )
+
+    def remove(self, ids):
+        """ Apaga os professores cujos currículos deixaram de existir (inclusive os vínculos com PPGs). """
+        with self.conn:
+            self.conn.execute("DELETE FROM _ingest_ids")
+            self.conn.executemany("INSERT OR IGNORE INTO _ingest_ids VALUES (?)", [(i,) for i in ids])
+            for table in CHILD_TABLES + ('dataset', 'pessoa_ppg', HASH_TABLE, LINK_TABLE):
+                self.conn.execute(f"DELETE FROM {table} WHERE id_pessoa IN (SELECT id_pessoa FROM _ingest_ids)")
+            self.conn.execute("DELETE FROM pessoa WHERE id IN (SELECT id_pessoa FROM _ingest_ids)")
+
+    def without_ppg(self, ids):
+        """ Ids (entre 'ids') sem vínculo em 'pessoa_ppg': ficam fora do filtro de área até serem vinculados. """
+        linked = {row[0] for row in self.conn.execute("SELECT DISTINCT id_pessoa FROM pessoa_ppg")}
+        return [i for i in ids if i not in linked]
+
+    def write_dataset(self, vocabulary_size):
+        """
+        Regrava as linhas do 'dataset' (contagem de palavras por professor) dos currículos carregados.
+        Usa o vocabulário do cabeçalho existente; sem cabeçalho, cria um com as palavras mais frequentes.
+        """
+        conn = self.conn
+        header = conn.execute("SELECT linha FROM dataset WHERE id_pessoa = 0").fetchone()
+        with conn:
+            if header is None:
+                vocabulary = [row[0] for row in conn.execute(
+                    "SELECT lemma FROM _ingest_tokens WHERE lemma IS NOT NULL GROUP BY lemma HAVING COUNT(*) > 1 "
+                    "ORDER BY COUNT(*) DESC, lemma LIMIT ?", (vocabulary_size,)
+                )]
+                if not vocabulary: return 0
+                conn.execute("INSERT INTO dataset (linha, id_pessoa) VALUES (?, 0)", ('id_pessoa,' + ','.join(vocabulary),))
+            else:
+                vocabulary = [c for c in header[0].split(',') if c != 'id_pessoa']
+            position = {word: i for i, word in enumerate(vocabulary)}
+
+            conn.execute("DELETE FROM dataset WHERE id_pessoa != 0 AND id_pessoa IN (SELECT id_pessoa FROM _ingest_tokens)")
+
+            rows, current, counts = [], None, None
+            cursor = conn.execute("SELECT id_pessoa, lemma, n FROM _ingest_tokens ORDER BY id_pessoa")
+            for id_pessoa, lemma, n in cursor:
+                if id_pessoa != current:
+                    if current is not None: rows.append((f"{current}," + ','.join(map(str, counts)), current))
+                    current, counts = id_pessoa, [0] * len(vocabulary)
+                index = position.get(lemma)
+                if index is not None: counts[index] += n
+            if current is not None: rows.append((f"{current}," + ','.join(map(str, counts)), current))
+            conn.executemany("INSERT INTO dataset (linha, id_pessoa) VALUES (?, ?)", rows)
+        return len(rows)
+
+
+def _valid_derived():
+    """ Exportações/modelos derivados que estão em dia com o banco antes da carga. """
+    from utils.sparse_dataset import load_sparse_dataset
+    from utils.model_store import load_model
+    from utils.thesis_recommend import BIRCH_MODEL_NAME, TFIDF_MODEL_NAME
+    return {
+        'sparse_dataset': load_sparse_dataset() is not None,
+        'birch': load_model(BIRCH_MODEL_NAME) is not None,
+        'tfidf': load_model(TFIDF_MODEL_NAME) is not None,
+    }
+
+
+def _refresh_derived(valid, ids):
+    """
+    Atualiza, só para os professores em 'ids', os derivados que estavam em dia antes da carga
+    (os já desatualizados continuam dependendo de uma reconstrução completa).
+    """
+    from utils.sparse_dataset import export_dataset
+    from utils.thesis_recommend import ClusterPalavras, ClusterPalavrasChaves
+
+    # A exportação CSR é uma leitura sequencial da tabela, sem NLP: refeita por inteiro
+    if valid['sparse_dataset']: export_dataset()
+    for name, update in (('birch', ClusterPalavras().updateModel), ('tfidf', ClusterPalavrasChaves().updateModel)):
+        if not valid[name]: continue
+        try:
+            update(ids)
+        except Exception as e:
+            print(f"Modelo '{name}' não atualizado ({e}); execute 'python -m utils.model_store build'.")
+
+
+def ingest(paths, workers=None, batch_size=BATCH_SIZE, vocabulary_size=DEFAULT_VOCABULARY_SIZE, lemmatize=True,
+           incremental=False, remove_missing=False):
+    """
+    Carrega os currículos de 'paths' (arquivos ou pastas). Retorna (carregados, inalterados, removidos, falhas).
+    Professores já existentes (mesmo identificador Lattes) têm as linhas substituídas. Com 'incremental',
+    currículos com o mesmo hash da última carga são pulados; com 'remove_missing', professores carregados
+    antes e ausentes de 'paths' são apagados (só os que vieram desta carga: os demais não têm hash).
+    """
+    files = list(_discover(paths))
+    valid = _valid_derived()
+    conn = get_db_connection()
+    conn.row_factory = None
+    # Carga em lote: durabilidade a cada commit não é necessária (o job pode ser refeito)
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        writer = _Writer(conn)
+        stopwords = []
+        if _table_columns(conn, 'stopwords'):
+            stopwords = [row[0] for row in conn.execute("SELECT word FROM stopwords")]
+        known = dict(conn.execute(f"SELECT id_pessoa, hash FROM {HASH_TABLE}"))
+
+        loaded, skipped, failures, batch, ids, seen = 0, 0, 0, [], [], set()
+        start = time.perf_counter()
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(stopwords, lemmatize)) as pool:
+            for record in pool.imap_unordered(parse_curriculum, files, chunksize=8):
+                if 'error' in record:
+                    failures += 1
+                    print(f"Falha em {record['source']}: {record['error']}")
+                    continue
+                writer.resolve(record)
+                seen.add(record['id'])
+                if incremental and known.get(record['id']) == record['hash']:
+                    skipped += 1
+                    continue
+                batch.append(record)
+                ids.append(record['id'])
+                if len(batch) >= batch_size:
+                    writer.write(batch)
+                    loaded += len(batch)
+                    batch = []
+                    print(f"{loaded}/{len(files)} currículos ({loaded / (time.perf_counter() - start):.0f}/s)")
+            if batch:
+                writer.write(batch)
+                loaded += len(batch)
+
+        removed = []
+        if remove_missing:
+            if failures:
+                # Um arquivo ilegível não pode ser confundido com um currículo removido
+                print("Remoção ignorada: há currículos com falha de leitura nesta carga.")
+            else:
+                removed = sorted(set(known) - seen)
+                if removed: writer.remove(removed)
+
+        if ids:
+            writer.write_dataset(vocabulary_size)
+            unlinked = writer.without_ppg(ids)
+            if unlinked:
+                print(f"{len(unlinked)} professor(es) sem vínculo em 'pessoa_ppg' (ex.: {', '.join(map(str, unlinked[:5]))}): "
+                      "não aparecem nas buscas até serem vinculados a um PPG.")
+        changed = ids + removed
+        if changed:
+            if metrics_available(conn): refresh_professor_metrics(conn, changed)
+            with conn:
+                version = bump_data_version(conn)
+            print(f"Versão dos dados: {version}.")
+    finally:
+        conn.close()
+
+    if changed: _refresh_derived(valid, changed)
+    return loaded, skipped, len(removed), failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carrega currículos Lattes (XML ou .zip) no banco SQLite.")
+    parser.add_argument('paths', nargs='+', help="Arquivos .xml/.zip ou pastas com eles.")
+    parser.add_argument('--workers', type=int, default=None, help="Processos de leitura (padrão: núcleos da CPU).")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Currículos por transação.")
+    parser.add_argument('--vocabulary-size', type=int, default=DEFAULT_VOCABULARY_SIZE,
+                        help="Palavras do 'dataset' quando o banco ainda não tem cabeçalho.")
+    parser.add_argument('--no-lemmatize', action='store_true',
+                        help="Conta palavras sem lematizar (não carrega o spaCy nos workers).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Regrava só os currículos que mudaram desde a última carga.")
+    parser.add_argument('--remove-missing', action='store_true',
+                        help="Apaga professores carregados antes cujos currículos não estão em 'paths'.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    loaded, skipped, removed, failures = ingest(
+        args.paths, args.workers, args.batch_size, args.vocabulary_size, not args.no_lemmatize,
+        args.incremental, args.remove_missing
+    )
+    print(f"{loaded} currículo(s) carregado(s), {skipped} inalterado(s), {removed} removido(s), "
+          f"{failures} falha(s) ({time.perf_counter() - start:.1f}s).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+# llm_cache.py - Cache persistente (SQLite) das respostas de LLM
+# Respostas para o mesmo prompt/modelo são idênticas entre usuários (ex.: resumo de um professor),
+# então ficam num arquivo ao lado do banco, compartilhado por todas as sessões e processos.
+# Chave: provedor + modelo + versão do template + hash do prompt. Expira por TTL e, acima do
+# tamanho máximo, descarta as entradas usadas há mais tempo (LRU).
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.llm_cache stats
+#   python -m utils.llm_cache clear
+
+import argparse
+import hashlib
+import sqlite3
+import threading
+from utils.instrumentation import count
+from utils.sqlite_lru import SQLiteLRU, cache_path, print_stats
+
+CACHE_FILE_NAME = 'llm_cache.db'
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def get_cache_path():
+    """ Arquivo 'llm_cache.db' ao lado do banco de dados em uso. """
+    return cache_path(CACHE_FILE_NAME)
+
+
+def make_key(provider, model, template_version, prompt):
+    """ Chave estável da resposta: o prompt já contém todas as entradas do template. """
+    digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    return f"{provider}:{model}:v{template_version}:{digest}"
+
+
+class LLMCache(object):
+    """ Cache chave -> texto com TTL, limite de tamanho (LRU) e contadores de acerto/falta por função. """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or get_cache_path()
+        self._store = SQLiteLRU(self.path, 'llm_cache', 'helper', (('provider', 'TEXT'), ('model', 'TEXT')),
+                                value_type='TEXT', ttl=ttl, max_bytes=max_bytes, label='cache de LLM')
+
+    def get(self, key, helper):
+        """ Texto guardado para 'key' ou None (ausente ou expirado). Conta acerto/falta em 'helper'. """
+        value = self._store.get(key, helper)
+        count('llm_cache_miss' if value is None else 'llm_cache_hit')
+        return value
+
+    def put(self, key, value, helper, provider, model):
+        """ Guarda 'value' (texto) e despeja as entradas mais antigas se o arquivo passar do limite. """
+        self._store.put(key, value, helper, provider=provider, model=model)
+
+    def evict(self):
+        self._store.evict()
+
+    def stats(self):
+        """ {'entries', 'bytes', 'groups': {helper: {'hits', 'misses'}}} """
+        return self._store.stats()
+
+    def clear(self):
+        self._store.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """ Cache do processo; None se o arquivo não puder ser aberto (as chamadas seguem sem cache). """
+    global _cache
+    path = get_cache_path()
+    if _cache is None or _cache.path != path:
+        with _cache_lock:
+            if _cache is None or _cache.path != path:
+                try:
+                    _cache = LLMCache(path)
+                except sqlite3.Error as e:
+                    print(f"Cache de LLM indisponível: {e}")
+                    return None
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache persistente das respostas de LLM.")
+    parser.add_argument('command', choices=['stats', 'clear'])
+    args = parser.parse_args()
+
+    cache = get_llm_cache()
+    if cache is None: return
+    if args.command == 'clear':
+        cache.clear()
+        print(f"Cache {cache.path} esvaziado.")
+        return
+
+    print_stats(cache.path, cache.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# llm_client.py - Cliente HTTP dos provedores de LLM (Ollama / Gemini)
+# Sessões keep-alive reaproveitadas (uma por thread, como as conexões do banco), tempos limite
+# de conexão/leitura, limite de chamadas simultâneas por provedor e novas tentativas com backoff.
+# A API assíncrona (acomplete / complete_many) permite várias chamadas em andamento ao mesmo tempo
+# e stream() entrega a resposta em pedaços, à medida que o modelo gera o texto.
+
+import asyncio
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_URL = "http://localhost:11434/api/generate"
+GEMINI_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+GEMINI_STREAM_URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent"
+GEMINI_DEFAULT_MODEL = "gemini-2.5-flash"
+# Modelo estável usado quando o padrão responde 404
+GEMINI_FALLBACK_MODEL = "gemini-pro"
+
+# (conexão, leitura) em segundos. Modelos locais em CPU demoram a gerar a resposta completa.
+TIMEOUTS = {'ollama': (3.05, 120), 'gemini': (5, 60)}
+# Chamadas simultâneas por provedor (o Ollama local processa poucas gerações em paralelo)
+CONCURRENCY = {'ollama': 2, 'gemini': 8}
+# Espera máxima (segundos) por uma vaga do provedor, separada do tempo limite de leitura: com
+# várias chamadas na fila (ex.: pré-carga dos cartões), cada uma espera as anteriores terminarem.
+# Com 2 vagas no Ollama, 600 s cobrem ~10 gerações lentas à frente na fila.
+QUEUE_TIMEOUTS = {'ollama': 600, 'gemini': 120}
+MAX_RETRIES = 2
+BACKOFF_SECONDS = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """ Falha de uma chamada de LLM; a mensagem já é adequada para exibir ao usuário. """
+
+
+class LLMClient(object):
+    """
+    Cliente compartilhado pelos provedores. Seguro para uso concorrente: cada thread tem a
+    própria requests.Session (pool de conexões keep-alive) e cada provedor um semáforo.
+    """
+
+    def __init__(self, timeouts=None, concurrency=None, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, queue_timeouts=None):
+        self.timeouts = dict(TIMEOUTS, **(timeouts or {}))
+        self.queue_timeouts = dict(QUEUE_TIMEOUTS, **(queue_timeouts or {}))
+        concurrency = dict(CONCURRENCY, **(concurrency or {}))
+        self._slots = {provider: threading.BoundedSemaphore(n) for provider, n in concurrency.items()}
+        self.retries = retries
+        self.backoff = backoff
+        self._local = threading.local()
+        # Threads para a API assíncrona: uma por vaga de provedor, as demais esperam na fila
+        self._executor = ThreadPoolExecutor(max_workers=sum(concurrency.values()), thread_name_prefix='llm')
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+    def _request(self, provider, url, **kwargs):
+        """
+        POST com tempo limite e novas tentativas (sem controle de vagas). Retorna a resposta;
+        erros de conexão da última tentativa são propagados (requests.RequestException).
+        """
+        connect_timeout, read_timeout = self.timeouts[provider]
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session().post(url, timeout=(connect_timeout, read_timeout), **kwargs)
+            except requests.ConnectionError:
+                # Inclui ConnectTimeout. Tempo limite de leitura não é repetido: o provedor
+                # já recebeu o pedido e repetir só multiplicaria a espera do usuário.
+                if attempt == self.retries: raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    return response
+                response.close()
+            # Backoff exponencial com jitter
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+
+    def _acquire(self, provider):
+        # Espera por vaga limitada: um provedor travado não prende a chamada para sempre
+        if not self._slots[provider].acquire(timeout=self.queue_timeouts[provider]):
+            raise LLMError(f"Provedor '{provider}' ocupado; tente novamente.")
+
+    def _post(self, provider, url, **kwargs):
+        """ _request() ocupando uma vaga do provedor durante a chamada. """
+        self._acquire(provider)
+        try:
+            return self._request(provider, url, **kwargs)
+        finally:
+            self._slots[provider].release()
+
+    def ollama(self, prompt, model="mistral", options=None):
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {"temperature": 0.3}}
+        response = self._post('ollama', OLLAMA_URL, json=payload)
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as e:
+            raise LLMError(str(e))
+        return response.json().get("response", "")
+
+    def gemini(self, prompt, api_key, model=GEMINI_DEFAULT_MODEL):
+        if not api_key: raise LLMError("Chave de API não configurada.")
+        body = {"contents": [{"parts": [{"text": prompt}]}]}
+        response = self._post('gemini', GEMINI_URL.format(model=model), params={'key': api_key},
+                              headers={'Content-Type': 'application/json'}, json=body)
+        if response.status_code == 404 and model == GEMINI_DEFAULT_MODEL:
+            model = GEMINI_FALLBACK_MODEL
+            response = self._post('gemini', GEMINI_URL.format(model=model), params={'key': api_key},
+                                  headers={'Content-Type': 'application/json'}, json=body)
+        if response.status_code != 200:
+            raise LLMError(f"Erro na API Gemini ({model}): {response.status_code} - {response.text}")
+        try:
+            return response.json()['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError, ValueError):
+            raise LLMError("Erro: Resposta vazia da API Gemini.")
+
+    def stream_ollama(self, prompt, model="mistral", options=None):
+        """ Gerador com os pedaços da resposta à medida que o Ollama os produz (NDJSON). """
+        payload = {"model": model, "prompt": prompt, "stream": True, "options": options or {"temperature": 0.3}}
+        self._acquire('ollama')
+        try:
+            response = self._request('ollama', OLLAMA_URL, json=payload, stream=True)
+            with response:
+                try:
+                    response.raise_for_status()
+                except requests.HTTPError as e:
+                    raise LLMError(str(e))
+                for line in response.iter_lines(chunk_size=None):  # chunk_size=None: cada bloco (chunked) sai assim que chega
+                    if not line: continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"): raise LLMError(chunk["error"])
+                    if chunk.get("response"): yield chunk["response"]
+                    if chunk.get("done"): break
+        finally:
+            self._slots['ollama'].release()
+
+    def stream_gemini(self, prompt, api_key, model=GEMINI_DEFAULT_MODEL):
+        """ Gerador com os pedaços da resposta do Gemini (streamGenerateContent, eventos SSE). """
+        if not api_key: raise LLMError("Chave de API não configurada.")
+        body = {"contents": [{"parts": [{"text": prompt}]}]}
+        self._acquire('gemini')
+        try:
+            def _open(model):
+                return self._request('gemini', GEMINI_STREAM_URL.format(model=model), params={'key': api_key, 'alt': 'sse'},
+                                     headers={'Content-Type': 'application/json'}, json=body, stream=True)
+            response = _open(model)
+            if response.status_code == 404 and model == GEMINI_DEFAULT_MODEL:
+                response.close()
+                model = GEMINI_FALLBACK_MODEL
+                response = _open(model)
+            with response:
+                if response.status_code != 200:
+                    raise LLMError(f"Erro na API Gemini ({model}): {response.status_code} - {response.text}")
+                for line in response.iter_lines(chunk_size=None):
+                    if not line or not line.startswith(b'data:'): continue
+                    try:
+                        parts = json.loads(line[len(b'data:'):])['candidates'][0]['content']['parts']
+                    except (KeyError, IndexError, ValueError):
+                        continue
+                    text = ''.join(part.get('text', '') for part in parts)
+                    if text: yield text
+        finally:
+            self._slots['gemini'].release()
+
+    def stream(self, provider, prompt, model=None, api_key=None):
+        """ Versão em streaming de complete(): gerador de pedaços de texto. """
+        if provider == 'ollama': return self.stream_ollama(prompt, model or "mistral")
+        if provider == 'gemini': return self.stream_gemini(prompt, api_key, model or GEMINI_DEFAULT_MODEL)
+        raise LLMError(f"Provedor desconhecido: {provider}")
+
+    def complete(self, provider, prompt, model=None, api_key=None):
+        """ Chamada síncrona por nome de provedor ('ollama' ou 'gemini'). """
+        if provider == 'ollama': return self.ollama(prompt, model or "mistral")
+        if provider == 'gemini': return self.gemini(prompt, api_key, model or GEMINI_DEFAULT_MODEL)
+        raise LLMError(f"Provedor desconhecido: {provider}")
+
+    async def acomplete(self, provider, prompt, model=None, api_key=None):
+        """ Versão assíncrona de complete(): a chamada HTTP roda no pool de threads do cliente. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.complete, provider, prompt, model, api_key)
+
+    def submit(self, fn, *args):
+        """ Agenda fn(*args) no pool de threads do cliente sem esperar. Retorna um concurrent.futures.Future. """
+        return self._executor.submit(fn, *args)
+
+    def run_all(self, calls):
+        """
+        Executa várias chamadas de uma vez. 'calls' é uma lista de funções sem argumentos
+        (ex.: lambda: llm_summarize_profile(...)). Retorna os resultados na mesma ordem;
+        chamadas que falharem retornam a exceção em vez do texto.
+        """
+        async def _gather():
+            loop = asyncio.get_running_loop()
+            futures = [loop.run_in_executor(self._executor, call) for call in calls]
+            return await asyncio.gather(*futures, return_exceptions=True)
+        return asyncio.run(_gather())
+
+    def complete_many(self, prompts, provider, model=None, api_key=None):
+        """ Várias chamadas de complete() simultâneas (respeitando o limite do provedor). """
+        return self.run_all([
+            (lambda prompt=prompt: self.complete(provider, prompt, model, api_key)) for prompt in prompts
+        ])
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """ Cliente do processo (sessões e semáforos compartilhados por todas as sessões do app). """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None: _client = LLMClient()
+    return _client
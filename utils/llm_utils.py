@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+# llm_utils.py - Integração com LLMs (Ollama local / Gemini na nuvem)
+# Funções sem dependência do Streamlit: usadas pela interface e pelo serviço HTTP.
+
+import json
+import random
+import re
+from utils.llm_client import get_client, LLMError, GEMINI_DEFAULT_MODEL
+from utils.llm_cache import get_llm_cache, make_key
+
+# Nome do provedor na interface -> nome no cliente
+PROVIDERS = {"Local (Ollama)": 'ollama', "Nuvem (Gemini)": 'gemini'}
+
+# Versão do template de cada função: incrementar ao mudar o texto do prompt invalida o cache dela
+PROMPT_VERSIONS = {
+    'extract_cnpq_areas': 1,
+    'infer_area_from_pubs': 1,
+    'explain_recommendation': 1,
+    'summarize_profile': 1,
+}
+
+def call_ollama(prompt, model="mistral"):
+    try:
+        return get_client().ollama(prompt, model)
+    except Exception as e:
+        return f"Erro ao conectar com Ollama: {e}"
+
+def call_gemini(prompt, api_key, model="gemini-2.5-flash"):
+    """ Chamada REST para Gemini com Fallback automático (gemini-pro se o modelo padrão der 404) """
+    try:
+        return get_client().gemini(prompt, api_key, model)
+    except LLMError as e:
+        return str(e)
+    except Exception as e:
+        return f"Erro de conexão: {e}"
+
+def _complete(helper, prompt, provider, model_name, api_key=None):
+    """
+    Chamada ao provedor passando pelo cache persistente (compartilhado entre usuários).
+    Falhas voltam como texto de erro, no mesmo formato de call_ollama/call_gemini, e não são guardadas.
+    """
+    client_provider = PROVIDERS.get(provider)
+    if client_provider is None: return None
+    # A interface só escolhe modelo para o Ollama; o Gemini usa o modelo padrão
+    model = model_name if client_provider == 'ollama' else GEMINI_DEFAULT_MODEL
+
+    cache = get_llm_cache()
+    key = make_key(client_provider, model, PROMPT_VERSIONS[helper], prompt)
+    if cache is not None:
+        cached = cache.get(key, helper)
+        if cached is not None: return cached
+
+    if client_provider == 'ollama':
+        text = call_ollama(prompt, model)
+        failed = text.startswith("Erro ao conectar com Ollama:")
+    else:
+        try:
+            text, failed = get_client().gemini(prompt, api_key, model), False
+        except LLMError as e:
+            text, failed = str(e), True
+        except Exception as e:
+            text, failed = f"Erro de conexão: {e}", True
+
+    if cache is not None and not failed: cache.put(key, text, helper, client_provider, model)
+    return text
+
+def _stream_complete(helper, prompt, provider, model_name, api_key=None):
+    """ Como _complete, mas gerando o texto em pedaços. Erros saem como texto e não são guardados. """
+    client_provider = PROVIDERS[provider]
+    model = model_name if client_provider == 'ollama' else GEMINI_DEFAULT_MODEL
+
+    cache = get_llm_cache()
+    key = make_key(client_provider, model, PROMPT_VERSIONS[helper], prompt)
+    if cache is not None:
+        cached = cache.get(key, helper)
+        if cached is not None:
+            yield cached
+            return
+
+    chunks = []
+    try:
+        for chunk in get_client().stream(client_provider, prompt, model, api_key):
+            chunks.append(chunk)
+            yield chunk
+    except LLMError as e:
+        yield f"Erro ao conectar com Ollama: {e}" if client_provider == 'ollama' else str(e)
+        return
+    except Exception as e:
+        yield f"Erro ao conectar com Ollama: {e}" if client_provider == 'ollama' else f"Erro de conexão: {e}"
+        return
+    if cache is not None and chunks: cache.put(key, ''.join(chunks), helper, client_provider, model)
+
+def format_areas_display(raw_areas):
+    """
+    Limpa a string bruta do banco, remove duplicatas, conserta capitalização 
+    e remove underlines. Retorna uma lista limpa.
+    """
+    if not raw_areas or "Inferido" in raw_areas:
+        return "Área não cadastrada formalmente."
+    
+    # Divide as cadeias de hierarquia
+    chains = raw_areas.split(' | ')
+    clean_terms = set()
+    
+    for chain in chains:
+        parts = chain.split('#')
+        for p in parts:
+            p = p.strip()
+            if p and p != '-' and p.lower() != 'não informado':
+                # Remove underlines e ajusta Capitalização (Title Case)
+                cleaned_term = p.replace('_', ' ').title()
+                
+                # Ajuste fino para preposições em pt-BR (da, de, do, e)
+                cleaned_term = re.sub(r'\b(Da|De|Do|E|Em|Para)\b', lambda m: m.group(0).lower(), cleaned_term)
+                
+                clean_terms.add(cleaned_term)
+    
+    # Ordena alfabeticamente
+    sorted_terms = sorted(list(clean_terms))
+    return ", ".join(sorted_terms)
+
+def llm_extract_cnpq_areas(user_text, provider, model_name, api_key=None):
+    """
+    Extrai a hierarquia CNPq (GA, A, SA, E) do texto do aluno para fidelidade matemática à Tese.
+    """
+    if provider == "Simulação (sem IA)":
+        return {"grande_area": "Ciências Exatas", "area": user_text.split()[0]}
+    
+    sys_prompt = f"""
+    Analise o interesse de pesquisa: '{user_text}'.
+    Mapeie para a Tabela de Áreas do Conhecimento do CNPq (Brasil).
+    Retorne APENAS um JSON estrito (sem markdown) no formato:
+    {{
+        "grande_area": "Ex: Ciências Exatas e da Terra",
+        "area": "Ex: Ciência da Computação",
+        "sub_area": "Ex: Metodologia e Técnicas da Computação",
+        "especialidade": "Ex: Engenharia de Software"
+    }}
+    Se não souber, tente aproximar o máximo possível.
+    """
+    
+    resp = _complete('extract_cnpq_areas', sys_prompt, provider, model_name, api_key) or ""
+    
+    # Tentativa de parser simples do JSON
+    try:
+        # Limpa markdown ```json ... ``` se o modelo retornar
+        clean_resp = resp.replace("```json", "").replace("```", "").strip()
+        return json.loads(clean_resp)
+    except:
+        return {}
+
+def build_infer_area_prompt(prof_name, pubs_list):
+    pubs_text = "\n".join(pubs_list[:5]) # Usa as 5 primeiras
+    
+    return f"""
+    Com base nos títulos das publicações abaixo do professor {prof_name}, infira as Áreas de Conhecimento (CNPq).
+    Publicações:
+    {pubs_text}
+    
+    Retorne uma lista formatada e separada por vírgulas.
+    Exemplo: Ciência da Computação, Engenharia de Software, Machine Learning.
+    Seja conciso.
+    """
+
+def llm_infer_area_from_pubs(prof_name, pubs_list, provider, model_name, api_key=None):
+    """
+    Infere as Áreas de Conhecimento a partir das publicações (para resolver dados faltantes).
+    """
+    if not pubs_list: return "Sem dados de publicação para inferir."
+    
+    if provider in PROVIDERS: return _complete('infer_area_from_pubs', build_infer_area_prompt(prof_name, pubs_list), provider, model_name, api_key)
+    return "Simulação: Área inferida por IA com base em publicações."
+
+def llm_explain_recommendation(prof_name, score, user_query, provider, model_name, api_key=None):
+    """ Gera explicação personalizada """
+    if provider == "Simulação (sem IA)":
+        # Determinístico; Random próprio (e não random.seed global) por ser chamado de várias threads
+        return random.Random(prof_name + user_query).choice([
+            f"A trajetória de **{prof_name}** tem forte sinergia com '{user_query}' (Score: {score:.2f}).",
+            f"Indicadores de produção e orientação destacam **{prof_name}** para este tema.",
+            f"Com base nas métricas da tese, **{prof_name}** é uma recomendação sólida ({score:.2f})."
+        ])
+    
+    prompt = f"Explique em 1 frase por que o professor '{prof_name}' é bom para '{user_query}' (Score {score:.1f})."
+    if provider in PROVIDERS: return _complete('explain_recommendation', prompt, provider, model_name, api_key)
+    return ""
+
+def build_summary_prompt(prof_name, raw_areas_text):
+    return f"""
+    Aja como um redator acadêmico. Com base nas seguintes áreas de conhecimento cruas do Currículo Lattes:
+    "{raw_areas_text}"
+    
+    Escreva um resumo de 1 parágrafo (máximo 2 linhas) descrevendo o perfil de pesquisa do professor {prof_name}.
+    Comece com "Pesquisador(a) com ênfase em..." ou "Especialista em...".
+    Não use markdown, não use listas, apenas texto corrido e fluido em português.
+    Corrija formatações estranhas (ex: tire underlines).
+    """
+
+def llm_summarize_profile(prof_name, raw_areas_text, provider, model_name, api_key=None):
+    """
+    Usa LLM para criar um resumo profissional legível a partir da sopa de palavras-chave.
+    """
+    if provider == "Simulação (sem IA)":
+        return None # Retorna None para usar a lista formatada padrão
+    
+    return _complete('summarize_profile', build_summary_prompt(prof_name, raw_areas_text), provider, model_name, api_key)
+
+def stream_summarize_profile(prof_name, raw_areas_text, provider, model_name, api_key=None):
+    """
+    Versão em streaming de llm_summarize_profile: gerador de pedaços do texto (para st.write_stream).
+    Retorna None na Simulação. Respostas em cache saem de uma vez; as novas são guardadas ao final.
+    """
+    if provider not in PROVIDERS: return None
+    return _stream_complete('summarize_profile', build_summary_prompt(prof_name, raw_areas_text), provider, model_name, api_key)
+
+def prefetch_profile_texts(profs, user_query, provider, model_name, api_key=None, format_areas=None, skip_summary=()):
+    """
+    Dispara em paralelo (sem esperar) o resumo do perfil e a explicação da recomendação de cada
+    professor em 'profs'. Retorna {id: {'summary': Future, 'explanation': Future}}; os resultados
+    também ficam no cache persistente. 'format_areas' converte info['raw_hierarchy'] no texto
+    de áreas enviado ao resumo (o mesmo usado na tela de detalhes). Professores em 'skip_summary'
+    (ex.: resumo já pré-calculado em 'perfil_llm') ficam com 'summary' = None.
+    """
+    client = get_client()
+    jobs = {}
+    for prof in profs:
+        raw_areas = prof.get('info', {}).get('raw_hierarchy', '')
+        areas_text = format_areas(raw_areas) if format_areas else raw_areas
+        jobs[prof['id']] = {
+            'summary': None if prof['id'] in skip_summary else
+                       client.submit(llm_summarize_profile, prof['nome'], areas_text, provider, model_name, api_key),
+            'explanation': client.submit(llm_explain_recommendation, prof['nome'], prof['hybrid_score'],
+                                         user_query, provider, model_name, api_key),
+        }
+    return jobs
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# model_store.py - Armazenamento em disco dos modelos pré-treinados do motor
+# Os modelos são versionados contra uma "impressão digital" das tabelas de origem:
+# se o banco mudar, o modelo salvo é ignorado até ser reconstruído.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.model_store build
+
+import argparse
+import hashlib
+import os
+import pickle
+import threading
+import time
+import sklearn
+from utils.db_utils import get_db_path, pooled_connection
+
+# Incrementar quando o formato dos arquivos salvos mudar
+MODEL_FORMAT_VERSION = 1
+
+_cache = {}
+_cache_lock = threading.RLock()
+
+
+def get_models_dir():
+    """ Pasta 'models/' ao lado do banco de dados em uso. """
+    return os.path.join(os.path.dirname(os.path.abspath(get_db_path())), 'models')
+
+
+def _db_file_key():
+    path = get_db_path()
+    stat = os.stat(path)
+    return (path, stat.st_mtime_ns, stat.st_size)
+
+
+def model_file_key(name):
+    """ (mtime_ns, tamanho) do arquivo salvo do modelo 'name', ou None se ele não existir. """
+    try:
+        stat = os.stat(os.path.join(get_models_dir(), f"{name}.pkl"))
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def saved_models_key():
+    """ ((nome, (mtime_ns, tamanho)), ...) dos modelos salvos: muda a cada 'build' ou atualização incremental. """
+    try:
+        files = sorted(f for f in os.listdir(get_models_dir()) if f.endswith('.pkl'))
+    except FileNotFoundError:
+        return ()
+    return tuple((f[:-len('.pkl')], model_file_key(f[:-len('.pkl')])) for f in files)
+
+
+def db_fingerprint(tables, conn=None):
+    """
+    Resumo barato do conteúdo das tabelas (contagem, maior rowid e volume de texto).
+    Mudanças em qualquer uma delas alteram a impressão digital.
+    """
+    if conn is None:
+        with pooled_connection() as conn:
+            return db_fingerprint(tables, conn)
+
+    digest = hashlib.sha1()
+    for table in tables:
+        cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        size_expr = ' + '.join(f"COALESCE(LENGTH({c}), 0)" for c in cols) or '0'
+        row = conn.execute(
+            f"SELECT COUNT(*), COALESCE(MAX(rowid), 0), COALESCE(SUM({size_expr}), 0) FROM {table}"
+        ).fetchone()
+        digest.update(f"{table}:{tuple(row)};".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def current_fingerprint(tables):
+    """ Impressão digital atual das 'tables', recalculada só quando o arquivo do banco muda. """
+    file_key = _db_file_key()
+    cache_key = ('fingerprint', tuple(tables))
+    cached = _cache.get(cache_key)
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+    fingerprint = db_fingerprint(tables)
+    with _cache_lock:
+        _cache[cache_key] = (file_key, fingerprint)
+    return fingerprint
+
+
+def save_model(name, payload, tables):
+    """ Serializa 'payload' em models/<name>.pkl junto da impressão digital das 'tables'. """
+    models_dir = get_models_dir()
+    os.makedirs(models_dir, exist_ok=True)
+    envelope = {
+        'format_version': MODEL_FORMAT_VERSION,
+        'sklearn_version': sklearn.__version__,
+        'tables': tuple(tables),
+        'fingerprint': db_fingerprint(tables),
+        'created_at': time.time(),
+        'payload': payload,
+    }
+    final_path = os.path.join(models_dir, f"{name}.pkl")
+    tmp_path = final_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(envelope, f, protocol=pickle.HIGHEST_PROTOCOL)
+    # Troca atômica: processos lendo o arquivo antigo não veem um arquivo pela metade
+    os.replace(tmp_path, final_path)
+    with _cache_lock:
+        _cache.pop(name, None)
+    return final_path
+
+
+def _read_envelope(name):
+    path = os.path.join(get_models_dir(), f"{name}.pkl")
+    if not os.path.exists(path): return None
+    try:
+        with open(path, 'rb') as f:
+            envelope = pickle.load(f)
+    except Exception as e:
+        print(f"Erro ao carregar modelo '{name}': {e}")
+        return None
+    if envelope.get('format_version') != MODEL_FORMAT_VERSION: return None
+    if envelope.get('sklearn_version') != sklearn.__version__: return None
+    return envelope
+
+
+def load_model(name):
+    """
+    Retorna o payload do modelo salvo ou None se ele não existir ou estiver desatualizado.
+    O resultado fica em memória e só é revalidado quando o arquivo do banco ou o do modelo muda
+    (ex.: 'build' rodado por outro processo).
+    """
+    file_key = (_db_file_key(), model_file_key(name))
+    cached = _cache.get(name)
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+
+    with _cache_lock:
+        cached = _cache.get(name)
+        if cached is not None and cached[0] == file_key:
+            return cached[1]
+        envelope = _read_envelope(name)
+        payload = None
+        if envelope is not None and envelope['fingerprint'] == current_fingerprint(envelope['tables']):
+            payload = envelope['payload']
+        _cache[name] = (file_key, payload)
+        return payload
+
+
+def load_saved_model(name):
+    """
+    Payload salvo sem conferir a impressão digital (None se não existir ou for de outro formato).
+    Usado para atualizar as linhas de um modelo após uma carga incremental, sem retreiná-lo.
+    """
+    envelope = _read_envelope(name)
+    return None if envelope is None else envelope['payload']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina e salva os modelos pré-calculados do motor de recomendação.")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--birch-clusters', type=int, default=None,
+                        help="Quantidade de clusters do Birch (padrão: ~6 candidatos por cluster num conjunto típico de candidatos da busca).")
+    args = parser.parse_args()
+
+    from utils.thesis_recommend import ClusterPalavras, ClusterPalavrasChaves
+
+    start = time.perf_counter()
+    path = ClusterPalavras().buildModel(args.birch_clusters)
+    print(f"Birch salvo em {path} ({time.perf_counter() - start:.2f}s).")
+
+    start = time.perf_counter()
+    path = ClusterPalavrasChaves().buildModel()
+    print(f"TF-IDF das palavras-chave salvo em {path} ({time.perf_counter() - start:.2f}s).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# professor_metrics.py - Tabela materializada de métricas por professor
+# Substitui as subconsultas correlacionadas do Ranking.getRanking por agregados pré-calculados.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.professor_metrics rebuild   -> recria tudo do zero
+#   python -m utils.professor_metrics refresh   -> recalcula só os professores alterados
+
+import argparse
+import sqlite3
+import time
+from utils.db_utils import get_db_connection
+
+METRICS_TABLE = 'professor_metrics'
+PUB_YEAR_TABLE = 'professor_metrics_pub_ano'
+ORI_YEAR_TABLE = 'professor_metrics_ori_ano'
+PENDING_TABLE = 'professor_metrics_pendente'
+
+# Tabelas cujas alterações invalidam as métricas de um professor (todas possuem id_pessoa)
+SOURCE_TABLES = ('publicacao', 'orientacao', 'area_conhecimento', 'pessoa_ppg')
+
+# Agregados independentes do ano corrente (mesmas expressões do SQL original do Ranking)
+_METRICS_SELECT = """
+    SELECT
+        pe.id AS id_pessoa,
+        (SELECT sigla_universidade FROM ppg JOIN pessoa_ppg pp ON ppg.id = pp.id_ppg WHERE pp.id_pessoa = pe.id LIMIT 1) as sigla_inst,
+        (SELECT GROUP_CONCAT(
+            COALESCE(grande_area_conhecimento, '') || '#' ||
+            COALESCE(area_conhecimento, '') || '#' ||
+            COALESCE(sub_area_conhecimento, '') || '#' ||
+            COALESCE(especialidade, ''),
+            ' | ')
+         FROM area_conhecimento WHERE id_pessoa = pe.id
+        ) as hierarquia_cnpq,
+        (SELECT GROUP_CONCAT(titulo, ' ') FROM publicacao WHERE id_pessoa = pe.id LIMIT 10) as fallback_text,
+        (SELECT GROUP_CONCAT(idioma, ', ') FROM (SELECT DISTINCT idioma FROM publicacao WHERE id_pessoa = pe.id AND idioma IS NOT NULL AND idioma != '')) as idiomas_publicacao,
+        (SELECT COALESCE(SUM(CASE WHEN tipo='LIVRO' THEN 2.0 ELSE 1.0 END), 0) FROM publicacao WHERE id_pessoa = pe.id) as raw_prod,
+        (SELECT CAST(COUNT(*) AS FLOAT) FROM orientacao WHERE id_pessoa = pe.id AND natureza IN ('MESTRADO', 'DOUTORADO')) as total_orientacoes,
+        (SELECT CAST(COUNT(*) AS FLOAT) FROM publicacao WHERE id_pessoa = pe.id) as total_pubs
+    FROM pessoa pe
+"""
+
+# Contagens por ano: permitem responder exatamente à janela 'lookback_years' e ao corte
+# 'ano < ano corrente' sem reler publicacao/orientacao. O CREATE TABLE ... AS preserva a
+# afinidade da coluna 'ano' de origem (orientacao.ano é TEXT), mantendo as comparações idênticas.
+_PUB_YEAR_SELECT = "SELECT id_pessoa, ano, COUNT(*) AS n FROM publicacao"
+_ORI_YEAR_SELECT = "SELECT id_pessoa, ano, COUNT(*) AS n FROM orientacao WHERE natureza IN ('MESTRADO', 'DOUTORADO')"
+
+
+def metrics_available(conn):
+    """ Indica se a tabela materializada existe no banco aberto. """
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (METRICS_TABLE,)
+    ).fetchone()
+    return row is not None
+
+
+def _create_triggers(cur):
+    """ Marca professores como pendentes sempre que suas tabelas de origem mudam. """
+    for table in SOURCE_TABLES:
+        for event, ref in (('INSERT', 'NEW'), ('DELETE', 'OLD'), ('UPDATE', 'NEW')):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{PENDING_TABLE}_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    INSERT OR IGNORE INTO {PENDING_TABLE}(id_pessoa) VALUES ({ref}.id_pessoa);
+                END
+            """)
+        # Em UPDATE o registro pode ter mudado de dono: o antigo também fica pendente
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{PENDING_TABLE}_{table}_update_old
+            AFTER UPDATE OF id_pessoa ON {table}
+            BEGIN
+                INSERT OR IGNORE INTO {PENDING_TABLE}(id_pessoa) VALUES (OLD.id_pessoa);
+            END
+        """)
+
+
+def rebuild_professor_metrics(conn=None):
+    """
+    Recria do zero as tabelas materializadas, seus índices e os gatilhos de invalidação.
+    Retorna a quantidade de professores processados.
+    """
+    own_conn = conn is None
+    if own_conn: conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        for table in (METRICS_TABLE, PUB_YEAR_TABLE, ORI_YEAR_TABLE):
+            cur.execute(f"DROP TABLE IF EXISTS {table}")
+
+        cur.execute(f"CREATE TABLE {METRICS_TABLE} AS {_METRICS_SELECT}")
+        cur.execute(f"CREATE UNIQUE INDEX idx_{METRICS_TABLE}_id ON {METRICS_TABLE}(id_pessoa)")
+
+        cur.execute(f"CREATE TABLE {PUB_YEAR_TABLE} AS {_PUB_YEAR_SELECT} GROUP BY id_pessoa, ano")
+        cur.execute(f"CREATE INDEX idx_{PUB_YEAR_TABLE} ON {PUB_YEAR_TABLE}(id_pessoa, ano, n)")
+
+        cur.execute(f"CREATE TABLE {ORI_YEAR_TABLE} AS {_ORI_YEAR_SELECT} GROUP BY id_pessoa, ano")
+        cur.execute(f"CREATE INDEX idx_{ORI_YEAR_TABLE} ON {ORI_YEAR_TABLE}(id_pessoa, ano, n)")
+
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {PENDING_TABLE} (id_pessoa INTEGER PRIMARY KEY)")
+        cur.execute(f"DELETE FROM {PENDING_TABLE}")
+        _create_triggers(cur)
+
+        conn.commit()
+        return cur.execute(f"SELECT COUNT(*) FROM {METRICS_TABLE}").fetchone()[0]
+    finally:
+        if own_conn: conn.close()
+
+
+def refresh_professor_metrics(conn=None, ids=None):
+    """
+    Recalcula apenas os professores informados em 'ids' ou, se omitido,
+    os marcados como pendentes pelos gatilhos. Retorna a quantidade recalculada.
+    """
+    own_conn = conn is None
+    if own_conn: conn = get_db_connection()
+    try:
+        if not metrics_available(conn):
+            raise RuntimeError(
+                f"Tabela '{METRICS_TABLE}' inexistente. Execute 'python -m utils.professor_metrics rebuild'."
+            )
+        cur = conn.cursor()
+        if ids is None:
+            ids = [row[0] for row in cur.execute(f"SELECT id_pessoa FROM {PENDING_TABLE}")]
+        ids = sorted({int(i) for i in ids})
+        if not ids: return 0
+
+        # Tabela temporária evita limites de parâmetros do SQLite em listas grandes
+        cur.execute("CREATE TEMP TABLE IF NOT EXISTS _metrics_ids (id_pessoa INTEGER PRIMARY KEY)")
+        cur.execute("DELETE FROM _metrics_ids")
+        cur.executemany("INSERT INTO _metrics_ids VALUES (?)", [(i,) for i in ids])
+
+        cur.execute(f"DELETE FROM {METRICS_TABLE} WHERE id_pessoa IN (SELECT id_pessoa FROM _metrics_ids)")
+        cur.execute(f"INSERT INTO {METRICS_TABLE} {_METRICS_SELECT} WHERE pe.id IN (SELECT id_pessoa FROM _metrics_ids)")
+
+        cur.execute(f"DELETE FROM {PUB_YEAR_TABLE} WHERE id_pessoa IN (SELECT id_pessoa FROM _metrics_ids)")
+        cur.execute(f"INSERT INTO {PUB_YEAR_TABLE} {_PUB_YEAR_SELECT} WHERE id_pessoa IN (SELECT id_pessoa FROM _metrics_ids) GROUP BY id_pessoa, ano")
+
+        cur.execute(f"DELETE FROM {ORI_YEAR_TABLE} WHERE id_pessoa IN (SELECT id_pessoa FROM _metrics_ids)")
+        cur.execute(f"INSERT INTO {ORI_YEAR_TABLE} {_ORI_YEAR_SELECT} AND id_pessoa IN (SELECT id_pessoa FROM _metrics_ids) GROUP BY id_pessoa, ano")
+
+        cur.execute(f"DELETE FROM {PENDING_TABLE} WHERE id_pessoa IN (SELECT id_pessoa FROM _metrics_ids)")
+        cur.execute("DROP TABLE _metrics_ids")
+        conn.commit()
+        return len(ids)
+    finally:
+        if own_conn: conn.close()
+
+
+def pending_ids(conn, whereClause):
+    """
+    Candidatos de 'whereClause' marcados pelos gatilhos e ainda não recalculados: as linhas
+    deles na tabela materializada estão desatualizadas até o próximo refresh.
+    """
+    try:
+        rows = conn.execute(f"SELECT id_pessoa FROM {PENDING_TABLE} WHERE id_pessoa IN ({whereClause})").fetchall()
+    except sqlite3.OperationalError:
+        # Banco sem a tabela de pendentes (materializado antes dos gatilhos)
+        return []
+    return [row[0] for row in rows]
+
+
+def ranking_metrics_sql(whereClause, current_year, start_year_recent, exclude=()):
+    """
+    SQL do Ranking lendo da tabela materializada: uma busca indexada por candidato
+    (mais somas sobre as poucas linhas por ano do próprio professor). Os ids de 'exclude'
+    (pendentes) ficam de fora, para serem lidos das tabelas de origem.
+    """
+    excluded = f"AND pe.id NOT IN ({', '.join(map(str, exclude))})" if exclude else ''
+    return f"""
+    SELECT
+        pe.id, pe.nome, pe.ano_doutorado, pe.titulacao, pe.universidade,
+        pm.sigla_inst, pm.hierarquia_cnpq, pm.fallback_text, pm.idiomas_publicacao,
+        COALESCE(pm.raw_prod, 0) as raw_prod,
+        COALESCE(pm.total_orientacoes, 0.0) as total_orientacoes,
+        (SELECT CAST(COALESCE(SUM(n), 0) AS FLOAT) FROM {ORI_YEAR_TABLE} WHERE id_pessoa = pe.id AND ano < {current_year}) as orientacoes_concluidas_est,
+        (SELECT CAST(COALESCE(SUM(n), 0) AS FLOAT) FROM {PUB_YEAR_TABLE} WHERE id_pessoa = pe.id AND ano >= {start_year_recent}) as raw_pesq,
+        COALESCE(pm.total_pubs, 0.0) as total_pubs
+    FROM pessoa pe
+    LEFT JOIN {METRICS_TABLE} pm ON pm.id_pessoa = pe.id
+    WHERE pe.id IN ({whereClause}) {excluded}
+    """
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção da tabela materializada de métricas por professor.")
+    parser.add_argument('command', choices=['rebuild', 'refresh'],
+                        help="rebuild: recria tudo; refresh: recalcula os professores pendentes.")
+    parser.add_argument('--ids', default=None,
+                        help="(refresh) Lista de id_pessoa separados por vírgula; padrão: pendentes.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'rebuild':
+        total = rebuild_professor_metrics()
+    else:
+        ids = [i for i in args.ids.split(',') if i.strip()] if args.ids else None
+        total = refresh_professor_metrics(ids=ids)
+    print(f"{total} professores processados em {time.perf_counter() - start:.2f}s.")
+
+
+if __name__ == '__main__':
+    main()
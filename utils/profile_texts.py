@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# profile_texts.py - Resumos de perfil e áreas inferidas pré-calculados (tabela 'perfil_llm')
+# As entradas dos LLMs (áreas de 'area_conhecimento', títulos de 'publicacao') só mudam quando
+# o banco é recarregado; este job gera os textos de todos os professores uma vez, fora do
+# caminho da requisição, e a interface os lê direto da tabela.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.profile_texts build --provider ollama --model mistral --workers 2
+#   python -m utils.profile_texts build --provider gemini --api-key SUA_CHAVE --workers 8
+# Interrompido, o job pode ser rodado de novo: professores já processados (mesma entrada,
+# provedor, modelo e versão do prompt) são pulados.
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.db_utils import get_db_connection, pooled_connection, SQL_PUBLICATIONS_LIST
+from utils.llm_client import LLMClient, GEMINI_DEFAULT_MODEL
+from utils.llm_utils import format_areas_display, build_summary_prompt, build_infer_area_prompt, PROMPT_VERSIONS
+
+TABLE = 'perfil_llm'
+# Professores gravados por transação: o progresso salvo a cada lote é o ponto de retomada
+CHECKPOINT_EVERY = 20
+
+SQL_CREATE = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id_pessoa INTEGER PRIMARY KEY,
+    resumo TEXT,
+    areas_inferidas TEXT,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    atualizado_em TEXT NOT NULL
+)
+"""
+
+# Mesma hierarquia (GA#A#SA#E separadas por ' | ') usada pelo Ranking como 'raw_hierarchy'
+SQL_PROFILE_INPUTS = """
+SELECT pe.id, pe.nome,
+    (SELECT GROUP_CONCAT(
+        COALESCE(grande_area_conhecimento, '') || '#' ||
+        COALESCE(area_conhecimento, '') || '#' ||
+        COALESCE(sub_area_conhecimento, '') || '#' ||
+        COALESCE(especialidade, ''),
+        ' | ')
+     FROM area_conhecimento WHERE id_pessoa = pe.id
+    ) as hierarquia_cnpq
+FROM pessoa pe
+ORDER BY pe.id
+"""
+
+
+def _inputs(conn, id_pessoa, nome, hierarquia):
+    """
+    Prompts do professor: resumo a partir das áreas cadastradas ou, sem áreas,
+    inferência a partir dos 5 títulos mais recentes. Retorna (prompt_resumo, prompt_areas).
+    """
+    if hierarquia:
+        return build_summary_prompt(nome, format_areas_display(hierarquia)), None
+    titulos = [row[0] for row in conn.execute(SQL_PUBLICATIONS_LIST + " LIMIT 5", (id_pessoa,))]
+    if not titulos: return None, None
+    return None, build_infer_area_prompt(nome, titulos)
+
+
+def _input_hash(provider, model, summary_prompt, areas_prompt):
+    key = [provider, model, PROMPT_VERSIONS['summarize_profile'], PROMPT_VERSIONS['infer_area_from_pubs'],
+           summary_prompt, areas_prompt]
+    return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def build_profile_texts(provider, model=None, api_key=None, workers=2, limit=None, force=False):
+    """
+    Gera resumo (ou áreas inferidas) de cada professor com 'workers' chamadas simultâneas
+    e grava em 'perfil_llm'. Retorna (gerados, pulados, falhas).
+    """
+    model = model or ("mistral" if provider == 'ollama' else GEMINI_DEFAULT_MODEL)
+    # Cliente próprio: o limite de chamadas simultâneas do provedor passa a ser 'workers'
+    client = LLMClient(concurrency={provider: workers})
+
+    conn = get_db_connection()
+    try:
+        conn.execute(SQL_CREATE)
+        conn.commit()
+        done = {row[0]: row[1] for row in conn.execute(f"SELECT id_pessoa, input_hash FROM {TABLE}")}
+
+        todo, skipped = [], 0
+        with pooled_connection() as read_conn:
+            for id_pessoa, nome, hierarquia in read_conn.execute(SQL_PROFILE_INPUTS).fetchall():
+                summary_prompt, areas_prompt = _inputs(read_conn, id_pessoa, nome, hierarquia)
+                if summary_prompt is None and areas_prompt is None: continue
+                input_hash = _input_hash(provider, model, summary_prompt, areas_prompt)
+                if not force and done.get(id_pessoa) == input_hash:
+                    skipped += 1
+                    continue
+                todo.append((id_pessoa, summary_prompt, areas_prompt, input_hash))
+                if limit and len(todo) >= limit: break
+
+        def _generate(job):
+            id_pessoa, summary_prompt, areas_prompt, input_hash = job
+            resumo = client.complete(provider, summary_prompt, model, api_key) if summary_prompt else None
+            areas = client.complete(provider, areas_prompt, model, api_key) if areas_prompt else None
+            return id_pessoa, resumo, areas, input_hash
+
+        generated, failures, pending = 0, 0, 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_generate, job) for job in todo]
+            # Gravação só nesta thread (a conexão de escrita não é compartilhada com os workers)
+            for future in as_completed(futures):
+                try:
+                    id_pessoa, resumo, areas, input_hash = future.result()
+                except Exception as e:
+                    failures += 1
+                    print(f"Falha ao gerar texto: {e}")
+                    continue
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {TABLE} (id_pessoa, resumo, areas_inferidas, provider, model, input_hash, atualizado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (id_pessoa, resumo, areas, provider, model, input_hash, datetime.datetime.now().isoformat(timespec='seconds'))
+                )
+                generated += 1
+                pending += 1
+                if pending >= CHECKPOINT_EVERY:
+                    conn.commit()
+                    pending = 0
+                    elapsed = time.perf_counter() - start
+                    print(f"{generated}/{len(todo)} professores ({generated / elapsed:.2f}/s)")
+        conn.commit()
+        return generated, skipped, failures
+    finally:
+        conn.close()
+
+
+def profile_texts_version():
+    """
+    Versão da tabela 'perfil_llm' (quantidade de linhas e última gravação), para a chave do cache
+    da interface. Independe da versão dos dados das buscas: os textos não entram no ranking.
+    """
+    try:
+        with pooled_connection() as conn:
+            rows, last = conn.execute(f"SELECT COUNT(*), MAX(atualizado_em) FROM {TABLE}").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return f"{rows}:{last}"
+
+
+def get_profile_texts(ids):
+    """ {id_pessoa: {'resumo', 'areas_inferidas'}} dos professores em 'ids' ({} se a tabela não existir). """
+    ids = [int(i) for i in ids]
+    if not ids: return {}
+    placeholders = ', '.join('?' for _ in ids)
+    try:
+        with pooled_connection() as conn:
+            rows = conn.execute(
+                f"SELECT id_pessoa, resumo, areas_inferidas FROM {TABLE} WHERE id_pessoa IN ({placeholders})", ids
+            ).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {str(row[0]): {'resumo': row[1], 'areas_inferidas': row[2]} for row in rows}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-calcula resumos de perfil e áreas inferidas com um LLM.")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--provider', choices=['ollama', 'gemini'], default='ollama')
+    parser.add_argument('--model', default=None, help="Modelo (padrão: mistral no Ollama, o padrão do cliente no Gemini).")
+    parser.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY'), help="Chave do Gemini (ou GEMINI_API_KEY).")
+    parser.add_argument('--workers', type=int, default=2, help="Chamadas simultâneas ao provedor.")
+    parser.add_argument('--limit', type=int, default=None, help="Processa no máximo N professores nesta execução.")
+    parser.add_argument('--force', action='store_true', help="Regera mesmo os professores já processados.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generated, skipped, failures = build_profile_texts(
+        args.provider, args.model, args.api_key, args.workers, args.limit, args.force
+    )
+    print(f"{generated} gerado(s), {skipped} já processado(s), {failures} falha(s) "
+          f"({time.perf_counter() - start:.1f}s). Falhas são refeitas na próxima execução.")
+
+
+if __name__ == '__main__':
+    main()
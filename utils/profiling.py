@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# profiling.py - Captura de perfil (cProfile + tracemalloc) das buscas lentas
+# Desligado por padrão. Com RECOMENDAPROF_PROFILE=1, cada busca roda sob o cProfile (e o
+# tracemalloc, se houver limite de memória); quando passa do limite de tempo ou de memória, a
+# busca é gravada em 'profiles/<id>/' ao lado do banco: estatísticas do cProfile, relatório
+# das maiores alocações, parâmetros, hash do texto e o trace (utils.instrumentation). O comando
+# 'replay' roda a mesma busca de novo para investigar o caso fora da produção.
+#
+# Variáveis de ambiente:
+#   RECOMENDAPROF_PROFILE=1              liga a captura
+#   RECOMENDAPROF_PROFILE_MS=2000        limite de tempo da busca (ms)
+#   RECOMENDAPROF_PROFILE_MB=256         limite do pico de memória alocada na busca (MB; 0 = sem tracemalloc)
+#   RECOMENDAPROF_PROFILE_DIR=...        pasta das capturas (padrão: 'profiles/' ao lado do banco)
+#   RECOMENDAPROF_PROFILE_HASH_ONLY=1    grava só o hash do texto (o replay passa a exigir --text)
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.profiling list
+#   python -m utils.profiling show <id>
+#   python -m utils.profiling replay <id> [--profile]
+
+import argparse
+import cProfile
+import datetime
+import hashlib
+import io
+import json
+import os
+import platform
+import pstats
+import shutil
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from utils.db_utils import get_db_path
+from utils.instrumentation import count, current_trace
+
+PROFILES_DIR_NAME = 'profiles'
+CAPTURE_FILE = 'captura.json'
+STATS_FILE = 'perfil.pstats'
+MEMORY_FILE = 'memoria.txt'
+# Capturas mantidas (as mais antigas são apagadas)
+MAX_CAPTURES = 50
+# Quadros de pilha guardados por alocação e linhas dos relatórios
+TRACEMALLOC_FRAMES = 10
+REPORT_LINES = 25
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+_config = {
+    'enabled': _env_flag('RECOMENDAPROF_PROFILE'),
+    'latency_ms': float(os.environ.get('RECOMENDAPROF_PROFILE_MS', 2000)),
+    'memory_mb': float(os.environ.get('RECOMENDAPROF_PROFILE_MB', 256)),
+    'directory': os.environ.get('RECOMENDAPROF_PROFILE_DIR'),
+    'store_input': not _env_flag('RECOMENDAPROF_PROFILE_HASH_ONLY'),
+}
+# cProfile e o pico do tracemalloc são globais: uma busca perfilada por vez (as demais seguem sem perfil)
+_profile_lock = threading.Lock()
+
+
+def configure(enabled=None, latency_ms=None, memory_mb=None, directory=None, store_input=None):
+    """ Altera a configuração em tempo de execução (os valores omitidos são mantidos). """
+    for key, value in (('enabled', enabled), ('latency_ms', latency_ms), ('memory_mb', memory_mb),
+                       ('directory', directory), ('store_input', store_input)):
+        if value is not None: _config[key] = value
+
+
+def get_profiles_dir():
+    """ Pasta 'profiles/' ao lado do banco de dados em uso (ou RECOMENDAPROF_PROFILE_DIR). """
+    return _config['directory'] or os.path.join(os.path.dirname(os.path.abspath(get_db_path())), PROFILES_DIR_NAME)
+
+
+def _input_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _capture_id(name, text, params):
+    # Mesma busca (texto + parâmetros) sobrescreve a captura anterior em vez de acumular cópias
+    key = json.dumps([name, _input_hash(text), params], sort_keys=True, default=str)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _prune(directory):
+    captures = [os.path.join(directory, d) for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d))]
+    captures.sort(key=os.path.getmtime, reverse=True)
+    for old in captures[MAX_CAPTURES:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _save(name, text, params, profiler, elapsed, peak_bytes, memory_stats):
+    capture_id = _capture_id(name, text, params)
+    directory = os.path.join(get_profiles_dir(), capture_id)
+    os.makedirs(directory, exist_ok=True)
+
+    profiler.dump_stats(os.path.join(directory, STATS_FILE))
+    if memory_stats is not None:
+        with open(os.path.join(directory, MEMORY_FILE), 'w', encoding='utf-8') as f:
+            f.write(f"Pico de memória alocada durante a busca: {peak_bytes / 2 ** 20:.1f} MB\n")
+            f.write("Maiores crescimentos de memória na busca (por linha):\n")
+            for stat in memory_stats[:REPORT_LINES]:
+                f.write(f"{stat}\n")
+
+    current = current_trace()
+    capture = {
+        'id': capture_id,
+        'name': name,
+        'captured_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'elapsed_ms': elapsed * 1000,
+        'peak_memory_mb': peak_bytes / 2 ** 20 if memory_stats is not None else None,
+        'thresholds': {'latency_ms': _config['latency_ms'], 'memory_mb': _config['memory_mb']},
+        'input_sha256': _input_hash(text),
+        'input_chars': len(text),
+        'input': text if _config['store_input'] else None,
+        'params': params,
+        'trace': {'spans': dict(current.spans), 'counters': dict(current.counters)} if current is not None else None,
+        'db': os.path.abspath(get_db_path()),
+        'python': platform.python_version(),
+    }
+    with open(os.path.join(directory, CAPTURE_FILE), 'w', encoding='utf-8') as f:
+        json.dump(capture, f, ensure_ascii=False, indent=2, default=str)
+    _prune(get_profiles_dir())
+    return directory
+
+
+@contextmanager
+def profiled(name, text, params):
+    """
+    Perfila o bloco se a captura estiver ligada; grava a captura se passar de algum limite.
+    'params' (dict serializável) é o que o replay precisa, além do texto, para repetir a busca.
+    """
+    if not _config['enabled']:
+        yield
+        return
+    if not _profile_lock.acquire(blocking=False):
+        count('profile_skipped')
+        yield
+        return
+
+    track_memory = _config['memory_mb'] > 0
+    started_tracemalloc = False
+    before = None
+    try:
+        if track_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+                started_tracemalloc = True
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            peak_bytes = tracemalloc.get_traced_memory()[1] - baseline if track_memory else 0
+            slow = elapsed * 1000 >= _config['latency_ms']
+            heavy = track_memory and peak_bytes >= _config['memory_mb'] * 2 ** 20
+            if slow or heavy:
+                try:
+                    memory_stats = tracemalloc.take_snapshot().compare_to(before, 'lineno') if track_memory else None
+                    path = _save(name, text, params, profiler, elapsed, peak_bytes, memory_stats)
+                    count('profile_captured')
+                    print(f"Busca lenta ({elapsed * 1000:.0f} ms, pico {peak_bytes / 2 ** 20:.0f} MB) capturada em {path}")
+                except Exception as e:
+                    # Falha ao gravar a captura não pode derrubar a busca
+                    print(f"Erro ao gravar perfil: {e}")
+    finally:
+        if started_tracemalloc: tracemalloc.stop()
+        _profile_lock.release()
+
+
+# --------------------------------------------------------------------------- #
+#                                    CLI                                      #
+# --------------------------------------------------------------------------- #
+def load_capture(capture_id):
+    path = os.path.join(get_profiles_dir(), capture_id, CAPTURE_FILE)
+    if not os.path.exists(path): raise FileNotFoundError(f"Captura '{capture_id}' não encontrada em {get_profiles_dir()}.")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _print_stats(source, lines=REPORT_LINES):
+    out = io.StringIO()
+    pstats.Stats(source, stream=out).sort_stats('cumulative').print_stats(lines)
+    print(out.getvalue())
+
+
+def _list():
+    directory = get_profiles_dir()
+    if not os.path.isdir(directory):
+        print(f"Nenhuma captura em {directory}.")
+        return
+    captures = []
+    for capture_id in os.listdir(directory):
+        try:
+            captures.append(load_capture(capture_id))
+        except (FileNotFoundError, ValueError):
+            continue
+    captures.sort(key=lambda c: c['captured_at'], reverse=True)
+    print(f"{'id':<18} {'data':<20} {'tempo (ms)':>10} {'pico (MB)':>10} {'texto':>6}  etapa mais lenta")
+    for c in captures:
+        spans = {k: v for k, v in ((c.get('trace') or {}).get('spans') or {}).items() if k != 'total'}
+        slowest = max(spans, key=spans.get) if spans else '-'
+        peak = f"{c['peak_memory_mb']:.1f}" if c.get('peak_memory_mb') is not None else '-'
+        print(f"{c['id']:<18} {c['captured_at']:<20} {c['elapsed_ms']:>10.0f} {peak:>10} {c['input_chars']:>6}  {slowest}")
+
+
+def _replay(capture, text=None, profile=False):
+    from utils.instrumentation import collect
+    from utils.thesis_recommend import get_engine
+
+    text = text if text is not None else capture.get('input')
+    if text is None:
+        raise SystemExit("Captura feita só com o hash do texto: informe o texto original com --text.")
+    if _input_hash(text) != capture['input_sha256']:
+        print("Aviso: o texto informado não corresponde ao hash da captura.")
+
+    params = capture['params']
+    profiler = cProfile.Profile() if profile else None
+    with collect() as traces:
+        start = time.perf_counter()
+        if profiler: profiler.enable()
+        results = get_engine().recommend(text, **params)
+        if profiler: profiler.disable()
+        elapsed = time.perf_counter() - start
+
+    print(f"Replay: {len(results)} resultado(s) em {elapsed * 1000:.0f} ms (captura: {capture['elapsed_ms']:.0f} ms).")
+    if traces:
+        for stage, seconds in traces[-1]['spans'].items():
+            print(f"  {stage:<10} {seconds * 1000:10.1f} ms")
+        if traces[-1]['error']: print(f"  erro: {traces[-1]['error']}")
+    if profiler: _print_stats(profiler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capturas de perfil das buscas lentas (cProfile + tracemalloc).")
+    parser.add_argument('command', choices=['list', 'show', 'replay'])
+    parser.add_argument('id', nargs='?', help="Id da captura (ver 'list').")
+    parser.add_argument('--text', default=None, help="(replay) texto original, para capturas feitas só com o hash.")
+    parser.add_argument('--profile', action='store_true', help="(replay) perfila a nova execução com o cProfile.")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        _list()
+        return
+    if not args.id: parser.error("informe o id da captura.")
+    capture = load_capture(args.id)
+    if args.command == 'show':
+        print(json.dumps({k: v for k, v in capture.items() if k != 'input'}, ensure_ascii=False, indent=2))
+        directory = os.path.join(get_profiles_dir(), args.id)
+        _print_stats(os.path.join(directory, STATS_FILE))
+        memory_path = os.path.join(directory, MEMORY_FILE)
+        if os.path.exists(memory_path):
+            with open(memory_path, encoding='utf-8') as f:
+                print(f.read())
+        return
+    # Replay sem a captura automática, para não sobrescrever a captura original
+    configure(enabled=False)
+    _replay(capture, args.text, args.profile)
+
+
+if __name__ == '__main__':
+    main()
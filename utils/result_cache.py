@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+# result_cache.py - Cache compartilhado dos resultados do motor e das publicações
+# Mesma busca (texto, pesos, área do aluno, janela, página) e mesmas publicações dão o mesmo
+# resultado para qualquer usuário, então os resultados ficam num arquivo ao lado do banco,
+# compartilhado por todas as réplicas da interface e workers do serviço e mantido entre reinícios.
+# Cada entrada guarda a versão dos dados em que foi calculada: o contador de versão do banco
+# (utils.db_utils.get_data_version, incrementado pelas cargas), a identidade do arquivo (inode,
+# data de modificação e tamanho) e a dos modelos salvos, para que um banco trocado ou editado
+# por fora, ou modelos reconstruídos, também invalidem as entradas antigas. Expira por TTL e, acima do tamanho máximo, descarta as entradas usadas há
+# mais tempo (LRU; ver utils.sqlite_lru).
+#
+# Backend (RECOMENDAPROF_RESULT_CACHE): 'sqlite' (padrão, entre processos), 'memory' (só o
+# processo atual) ou 'off'.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.result_cache stats
+#   python -m utils.result_cache clear
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from utils.db_utils import get_db_path, get_data_version
+from utils.instrumentation import count, trace
+from utils.model_store import saved_models_key
+from utils.sqlite_lru import EVICT_TO_FRACTION, SQLiteLRU, cache_path, print_stats
+
+BACKEND_ENV = 'RECOMENDAPROF_RESULT_CACHE'
+CACHE_FILE_NAME = 'result_cache.db'
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def get_cache_path():
+    """ Arquivo 'result_cache.db' ao lado do banco de dados em uso. """
+    return cache_path(CACHE_FILE_NAME)
+
+
+def make_key(namespace, *parts):
+    """ Chave estável dos argumentos (dicts em ordem canônica). """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{namespace}:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def data_version():
+    """
+    Versão dos dados em que um resultado vale: contador de versão do banco, identidade do arquivo
+    (inode, data de modificação, tamanho), como no utils.model_store, e os carimbos dos modelos
+    salvos (Birch, TF-IDF). O contador sozinho não muda se o banco for substituído ou editado fora
+    do utils.lattes_ingest (ou se não tiver a tabela), nem quando os modelos são reconstruídos.
+    """
+    stat = os.stat(get_db_path())
+    models = hashlib.sha1(repr(saved_models_key()).encode('utf-8')).hexdigest()[:16]
+    return f"{get_data_version()}:{stat.st_ino}:{stat.st_mtime_ns}:{stat.st_size}:{models}"
+
+
+class SQLiteResultCache(object):
+    """ Backend compartilhado entre processos: chave -> objeto (pickle) com TTL, LRU por bytes e versão dos dados. """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or get_cache_path()
+        self._store = SQLiteLRU(self.path, 'result_cache', 'namespace', (('data_version', 'TEXT'),),
+                                ttl=ttl, max_bytes=max_bytes, label='cache de resultados')
+
+    def get(self, key, namespace, version):
+        """ Objeto guardado para 'key' ou None (ausente, expirado ou de outra versão dos dados). """
+        # Versão nova dos dados: nenhuma entrada antiga serve mais (todas são apagadas)
+        blob = self._store.get(key, namespace, current=('data_version', version))
+        return None if blob is None else pickle.loads(blob)
+
+    def put(self, key, value, namespace, version):
+        """ Guarda 'value' e despeja as entradas mais antigas se o arquivo passar do limite. """
+        self._store.put(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), namespace, data_version=version)
+
+    def evict(self):
+        self._store.evict()
+
+    def stats(self):
+        """ {'entries', 'bytes', 'groups': {namespace: {'hits', 'misses'}}} """
+        return self._store.stats()
+
+    def clear(self):
+        self._store.clear()
+
+
+class MemoryResultCache(object):
+    """ Backend do processo atual, com a mesma interface e os mesmos limites do SQLiteResultCache. """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or get_cache_path()
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key -> (blob, versão dos dados, created_at)
+        self._stats = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, key):
+        blob = self._entries.pop(key)[0]
+        self._total_bytes -= len(key) + len(blob)
+
+    def get(self, key, namespace, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] != version or time.time() - entry[2] > self.ttl):
+                self._remove(key)
+                entry = None
+            counts = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0})
+            counts['misses' if entry is None else 'hits'] += 1
+            if entry is None: return None
+            self._entries.move_to_end(key)
+        # Cópia a cada leitura (pickle): quem recebe pode alterar o resultado à vontade
+        return pickle.loads(entry[0])
+
+    def put(self, key, value, namespace, version):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(key) + len(blob) > self.max_bytes: return
+        with self._lock:
+            if key in self._entries: self._remove(key)
+            self._entries[key] = (blob, version, time.time())
+            self._total_bytes += len(key) + len(blob)
+            if self._total_bytes > self.max_bytes:
+                target = int(self.max_bytes * EVICT_TO_FRACTION)
+                while self._total_bytes > target:
+                    self._remove(next(iter(self._entries)))
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._total_bytes,
+                    'groups': {k: dict(v) for k, v in sorted(self._stats.items())}}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+            self._total_bytes = 0
+
+
+BACKENDS = {'sqlite': SQLiteResultCache, 'memory': MemoryResultCache}
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """ Cache do processo (backend de RECOMENDAPROF_RESULT_CACHE); None se desligado ou indisponível. """
+    global _cache
+    backend = os.environ.get(BACKEND_ENV, 'sqlite').lower()
+    if backend == 'off': return None
+    if backend not in BACKENDS:
+        print(f"Backend de cache desconhecido: {backend}")
+        return None
+    path = get_cache_path()
+    if not isinstance(_cache, BACKENDS[backend]) or _cache.path != path:
+        with _cache_lock:
+            if not isinstance(_cache, BACKENDS[backend]) or _cache.path != path:
+                try:
+                    _cache = BACKENDS[backend](path)
+                except sqlite3.Error as e:
+                    print(f"Cache de resultados indisponível: {e}")
+                    return None
+    return _cache
+
+
+def cached_call(namespace, key_parts, compute, cacheable=None):
+    """
+    Resultado de compute() em cache pela chave de 'key_parts' e pela versão atual dos dados (ver data_version).
+    'cacheable(valor)' falso deixa o valor fora do cache (ex.: busca que terminou em erro).
+    """
+    cache = get_result_cache()
+    if cache is None: return compute()
+    key = make_key(namespace, *key_parts)
+    version = data_version()
+    value = cache.get(key, namespace, version)
+    count(f"result_cache_miss_{namespace}" if value is None else f"result_cache_hit_{namespace}")
+    if value is None:
+        value = compute()
+        if cacheable is None or cacheable(value): cache.put(key, value, namespace, version)
+    return value
+
+
+# --------------------------------------------------------------------------- #
+#                          RESULTADOS EM CACHE                                #
+# --------------------------------------------------------------------------- #
+class CachedPage(list):
+    """
+    Página de resultados vinda do cache (uma lista comum), com a mesma paginação do
+    RankedResults: as próximas páginas também são buscadas no cache.
+    """
+
+    def __init__(self, items, total, offset, top_k, query):
+        super().__init__(items)
+        self.total = total
+        self.offset = offset
+        self.top_k = top_k
+        self._query = query
+
+    @property
+    def has_more(self):
+        return self.offset + len(self) < self.total
+
+    def page(self, offset):
+        """ 'top_k' posições do mesmo ranking a partir de 'offset' (lista vazia se passar do fim). """
+        if offset >= self.total: return []
+        return recommendation_page(*self._query, top_k=self.top_k, offset=offset)
+
+    def next_page(self):
+        """ Próximas 'top_k' posições do mesmo ranking (lista vazia se acabou). """
+        return self.page(self.offset + len(self))
+
+
+def _compute_page(text, weights, student_area_struct, lookback_years, area_substring, top_k, offset):
+    from utils.instrumentation import collect
+    from utils.thesis_recommend import get_engine, RankedResults
+
+    # O motor devolve [] quando falha: o erro vem do trace e impede que o vazio entre no cache
+    with collect() as traces:
+        results = get_engine().recommend(text, weights, student_area_struct, lookback_years, area_substring, top_k)
+    error = traces[-1]['error'] if traces else None
+    if isinstance(results, RankedResults):
+        items = results.page(offset) if offset else list(results)
+        return {'results': list(items), 'total': results.total, 'error': error}
+    items = list(results)
+    return {'results': items[offset:offset + top_k] if top_k else items[offset:], 'total': len(items), 'error': error}
+
+
+def recommendation_page(text, weights=None, student_area_struct=None, lookback_years=4, area_substring=False,
+                        top_k=None, offset=0):
+    """ Página do ranking de utils.thesis_recommend (posições [offset, offset + top_k)), via cache. """
+    if weights is None: weights = {}
+    query = (text, weights, student_area_struct, lookback_years, area_substring)
+    # Trace próprio: latência vista por quem chama (com acertos) e os contadores do cache;
+    # numa falta, a busca do motor gera também o seu trace 'recommend'
+    with trace('recommend_cached'):
+        payload = cached_call(
+            'recommend', query + (top_k, offset),
+            lambda: _compute_page(text, weights, student_area_struct, lookback_years, area_substring, top_k, offset),
+            cacheable=lambda payload: not payload['error']
+        )
+    return CachedPage(payload['results'], payload['total'], offset, top_k, query)
+
+
+def publications(professor_identifier, limit=10):
+    """ utils.db_utils.get_publications_by_professor_id via cache: (títulos, total). """
+    from utils.db_utils import get_publications_by_professor_id
+    return tuple(cached_call('publications', (str(professor_identifier), limit),
+                             lambda: get_publications_by_professor_id(professor_identifier, limit)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache compartilhado dos resultados do motor e das publicações.")
+    parser.add_argument('command', choices=['stats', 'clear'])
+    args = parser.parse_args()
+
+    cache = get_result_cache()
+    if cache is None: return
+    if args.command == 'clear':
+        cache.clear()
+        print(f"Cache {cache.path} esvaziado.")
+        return
+
+    print_stats(cache.path, cache.stats())
+
+
+if __name__ == '__main__':
+    main()
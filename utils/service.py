@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+# service.py - Serviço HTTP (JSON) do motor de recomendação, sem dependências além da stdlib
+# O motor (CPU) roda em um pool de processos com spaCy/índices/modelos já carregados em cada
+# worker; consultas ao banco e chamadas de LLM (E/S) rodam nas threads do próprio servidor.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.service --port 8600 --workers 4 --max-pending 32
+#
+# Endpoints:
+#   GET  /health
+#   GET  /metrics                        (formato texto do Prometheus)
+#   POST /recommend                      {"text", "weights", "student_area_struct", "lookback_years",
+#                                         "area_substring", "top_k", "offset"}
+#   GET  /professors/<id>/publications?limit=10
+#   POST /llm/extract_areas              {"text", "provider", "model", "api_key"}
+#   POST /llm/infer_area                 {"name", "publications", "provider", "model", "api_key"}
+#   POST /llm/explain                    {"name", "score", "query", "provider", "model", "api_key"}
+#   POST /llm/summarize                  {"name", "areas", "provider", "model", "api_key"}
+
+import argparse
+import json
+import math
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+from utils.instrumentation import trace, count, record, get_registry
+
+DEFAULT_PORT = 8600
+DEFAULT_TOP_K = 20
+MAX_BODY_BYTES = 1 << 20
+
+LLM_HELPERS = ('extract_areas', 'infer_area', 'explain', 'summarize')
+
+_PUBLICATIONS_PATH = re.compile(r'^/professors/([^/]+)/publications$')
+
+
+# --------------------------------------------------------------------------- #
+#                         WORKERS (pool de processos)                         #
+# --------------------------------------------------------------------------- #
+def _init_worker():
+    """ Executado uma vez por processo: carrega spaCy, índice de áreas e modelos antes da 1ª busca. """
+    from utils.instrumentation import disable_file_sink
+    from utils.thesis_recommend import warm_up
+    # Os traces voltam ao servidor junto do resultado (record): só ele grava o arquivo
+    disable_file_sink()
+    warm_up(background=False)
+
+
+def _run_recommendation(params):
+    """ Roda uma busca no worker e devolve só a página pedida (via cache compartilhado, ver utils.result_cache). """
+    from utils.instrumentation import collect
+    from utils.result_cache import recommendation_page
+
+    top_k = params['top_k']
+    offset = params['offset']
+    # O trace da busca volta junto do resultado e é agregado no processo do servidor (/metrics)
+    with collect() as traces:
+        page = recommendation_page(
+            params['text'], params['weights'], params['student_area_struct'],
+            params['lookback_years'], params['area_substring'], top_k, offset
+        )
+    return {'results': list(page), 'total': page.total, 'offset': offset, 'traces': traces}
+
+
+def _to_json(value):
+    """ Tipos do numpy/pandas viram tipos nativos; NaN vira null (JSON estrito). """
+    if isinstance(value, dict): return {str(k): _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)): return [_to_json(v) for v in value]
+    if isinstance(value, np.generic): value = value.item()
+    if isinstance(value, float) and not math.isfinite(value): return None
+    return value
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# --------------------------------------------------------------------------- #
+#                              SERVIDOR HTTP                                  #
+# --------------------------------------------------------------------------- #
+class RecommendationService(object):
+    """
+    Estado do serviço: pool de processos do motor e limite de buscas em andamento
+    (as que excedem 'max_pending' recebem 503 na hora, em vez de formar fila sem fim).
+    """
+
+    def __init__(self, workers=None, max_pending=None, timeout=60):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+
+    def recommend(self, body):
+        text = str(body.get('text') or '').strip()
+        if not text: raise ServiceError(400, "Campo 'text' é obrigatório.")
+        try:
+            params = {
+                'text': text,
+                'weights': body.get('weights') or {},
+                'student_area_struct': body.get('student_area_struct') or {},
+                'lookback_years': int(body.get('lookback_years', 4)),
+                'area_substring': bool(body.get('area_substring', False)),
+                'top_k': int(body.get('top_k', DEFAULT_TOP_K)) or None,
+                'offset': max(0, int(body.get('offset', 0))),
+            }
+        except (TypeError, ValueError) as e:
+            raise ServiceError(400, f"Parâmetro inválido: {e}")
+
+        if not self._slots.acquire(blocking=False):
+            raise ServiceError(503, "Muitas buscas em andamento; tente novamente.")
+        try:
+            future = self.pool.submit(_run_recommendation, params)
+            try:
+                payload = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                raise ServiceError(504, "Tempo limite da busca excedido.")
+        finally:
+            self._slots.release()
+        for worker_trace in payload.pop('traces', []): record(worker_trace)
+        return payload
+
+    def publications(self, professor_id, query):
+        from utils.result_cache import publications
+        try:
+            limit = int(query.get('limit', ['10'])[0])
+        except ValueError:
+            raise ServiceError(400, "Parâmetro 'limit' inválido.")
+        with trace('publications'):
+            titles, total = publications(professor_id, limit)
+            count('sql_rows_publications', len(titles))
+        return {'publications': titles, 'total': total}
+
+    def llm(self, helper, body):
+        from utils import llm_utils
+
+        # Validado antes do trace: caminhos arbitrários não viram séries novas em /metrics
+        if helper not in LLM_HELPERS: raise ServiceError(404, f"Função de LLM desconhecida: {helper}")
+        provider = body.get('provider', "Simulação (sem IA)")
+        model = body.get('model', "mistral")
+        api_key = body.get('api_key')
+        if helper == 'explain':
+            try:
+                body = dict(body, score=float(body.get('score', 0)))
+            except (TypeError, ValueError) as e:
+                raise ServiceError(400, f"Parâmetro inválido: {e}")
+        with trace(f"llm_{helper}"):
+            return {'result': self._llm_call(llm_utils, helper, body, provider, model, api_key)}
+
+    def _llm_call(self, llm_utils, helper, body, provider, model, api_key):
+        if helper == 'extract_areas':
+            result = llm_utils.llm_extract_cnpq_areas(str(body.get('text', '')), provider, model, api_key)
+        elif helper == 'infer_area':
+            result = llm_utils.llm_infer_area_from_pubs(body.get('name', ''), body.get('publications') or [], provider, model, api_key)
+        elif helper == 'explain':
+            result = llm_utils.llm_explain_recommendation(body.get('name', ''), body['score'],
+                                                          str(body.get('query', '')), provider, model, api_key)
+        else:
+            result = llm_utils.llm_summarize_profile(body.get('name', ''), body.get('areas', ''), provider, model, api_key)
+        return result
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, payload):
+        data = json.dumps(_to_json(payload), ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if status == 503: self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, status, text):
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES: raise ServiceError(413, "Corpo da requisição muito grande.")
+        if not length: return {}
+        try:
+            body = json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            raise ServiceError(400, "JSON inválido.")
+        if not isinstance(body, dict): raise ServiceError(400, "O corpo deve ser um objeto JSON.")
+        return body
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        try:
+            if method == 'GET' and url.path == '/metrics':
+                return self._send_text(200, get_registry().prometheus_text())
+            elif method == 'GET' and url.path == '/health':
+                payload = {'status': 'ok', 'workers': self.service.workers, 'max_pending': self.service.max_pending}
+            elif method == 'POST' and url.path == '/recommend':
+                payload = self.service.recommend(self._read_body())
+            elif method == 'POST' and url.path.startswith('/llm/'):
+                payload = self.service.llm(url.path[len('/llm/'):], self._read_body())
+            elif method == 'GET' and _PUBLICATIONS_PATH.match(url.path):
+                professor_id = _PUBLICATIONS_PATH.match(url.path).group(1)
+                payload = self.service.publications(professor_id, parse_qs(url.query))
+            else:
+                raise ServiceError(404, "Rota não encontrada.")
+        except ServiceError as e:
+            return self._send(e.status, {'error': str(e)})
+        except Exception as e:
+            print(f"Erro no serviço: {e}")
+            return self._send(500, {'error': 'Erro interno.'})
+        self._send(200, payload)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+def make_server(host='127.0.0.1', port=DEFAULT_PORT, workers=None, max_pending=None, timeout=60):
+    """ Cria (sem iniciar) o servidor HTTP e o pool de workers. """
+    service = RecommendationService(workers, max_pending, timeout)
+    handler = type('Handler', (_Handler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP (JSON) do motor de recomendação.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help="Processos do motor (padrão: núcleos da CPU).")
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="Buscas simultâneas aceitas antes de responder 503 (padrão: 4 por worker).")
+    parser.add_argument('--timeout', type=float, default=60, help="Tempo limite de cada busca, em segundos.")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.workers, args.max_pending, args.timeout)
+    print(f"Serviço em http://{args.host}:{args.port} ({server.service.workers} workers).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# sparse_dataset.py - Formato binário esparso (CSR) da tabela 'dataset'
+# A tabela guarda o bag-of-words de cada professor como texto CSV ('linha') e o cabeçalho
+# como a linha mágica id_pessoa = 0. Aqui a matriz é exportada uma vez para arrays .npy
+# (abertos via mmap) e o vocabulário para um índice separado, sem parsing de texto por busca.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.sparse_dataset export
+
+import argparse
+import json
+import os
+import threading
+import time
+import numpy as np
+from scipy import sparse
+from utils.db_utils import pooled_connection
+from utils.model_store import get_models_dir, db_fingerprint, current_fingerprint
+
+DATASET_DIR_NAME = 'dataset_csr'
+SOURCE_TABLES = ('dataset',)
+_ARRAYS = ('data', 'indices', 'indptr', 'ids')
+
+
+def get_dataset_dir():
+    return os.path.join(get_models_dir(), DATASET_DIR_NAME)
+
+
+def _parse_row(values):
+    """ Mesmo comportamento do pd.to_numeric(errors='coerce').fillna(0) do parsing antigo. """
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except ValueError:
+        row = np.zeros(len(values), dtype=np.float64)
+        for i, value in enumerate(values):
+            try:
+                row[i] = float(value)
+            except ValueError:
+                pass
+        return np.nan_to_num(row, nan=0.0)
+
+
+def export_dataset(conn=None):
+    """
+    Lê a tabela 'dataset' em streaming e grava a matriz CSR (data/indices/indptr),
+    os ids de cada linha e o vocabulário. Retorna (linhas, colunas).
+    """
+    if conn is None:
+        with pooled_connection() as conn:
+            return export_dataset(conn)
+
+    header = conn.execute("SELECT linha FROM dataset WHERE id_pessoa = 0").fetchone()
+    if header is None:
+        raise RuntimeError("Tabela 'dataset' sem cabeçalho (id_pessoa = 0).")
+    cols = header[0].split(',')
+    # A coluna 'id_pessoa' do CSV não é uma palavra: fica fora da matriz
+    keep = np.array([c != 'id_pessoa' for c in cols])
+    vocabulary = [c for c in cols if c != 'id_pessoa']
+
+    data, indices, indptr, ids = [], [], [0], []
+    cur = conn.execute(
+        "SELECT id_pessoa, linha FROM dataset "
+        "WHERE linha NOT LIKE 'id_pessoa%' AND id_pessoa != 0 ORDER BY rowid"
+    )
+    for id_pessoa, linha in cur:
+        values = linha.split(',')
+        if len(values) != len(cols): continue
+        row = _parse_row(values)[keep]
+        nz = np.flatnonzero(row)
+        data.append(row[nz])
+        indices.append(nz)
+        indptr.append(indptr[-1] + len(nz))
+        ids.append(int(id_pessoa))
+
+    # Mesmo tipo de índice em indices/indptr: o scipy não precisa converter (e copiar) ao abrir via mmap
+    idx_dtype = np.int32 if indptr[-1] < np.iinfo(np.int32).max else np.int64
+    arrays = {
+        'data': np.concatenate(data) if data else np.zeros(0, dtype=np.float64),
+        'indices': np.concatenate(indices).astype(idx_dtype) if indices else np.zeros(0, dtype=idx_dtype),
+        'indptr': np.asarray(indptr, dtype=idx_dtype),
+        'ids': np.asarray(ids, dtype=np.int64),
+    }
+    fingerprint = db_fingerprint(SOURCE_TABLES, conn)
+
+    out_dir = get_dataset_dir()
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, 'meta.json')
+    if os.path.exists(meta_path): os.remove(meta_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), array)
+    with open(os.path.join(out_dir, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocabulary, f, ensure_ascii=False)
+    # meta.json por último: só marca a exportação como válida quando todos os arrays existem
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, 'shape': [len(ids), len(vocabulary)]}, f)
+
+    global _loaded
+    _loaded = None
+    return len(ids), len(vocabulary)
+
+
+class SparseDataset(object):
+    """ Matriz de contagem de palavras (CSR) indexada por id_pessoa. """
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as f:
+            self.vocabulary = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in _ARRAYS}
+        self.ids = arrays['ids']
+        self.matrix = sparse.csr_matrix(
+            (arrays['data'], arrays['indices'], arrays['indptr']),
+            shape=tuple(self.meta['shape']), copy=False
+        )
+
+    def rows(self, ids):
+        """
+        Retorna (submatriz CSR, ids) das linhas dos professores pedidos,
+        na mesma ordem em que aparecem na tabela original.
+        """
+        positions = np.flatnonzero(np.isin(self.ids, np.asarray(list(ids), dtype=np.int64)))
+        return self.matrix[positions], np.asarray(self.ids[positions])
+
+
+_loaded = None
+_lock = threading.Lock()
+
+
+def load_sparse_dataset():
+    """ Retorna o SparseDataset exportado, ou None se não existir ou estiver desatualizado. """
+    global _loaded
+    directory = get_dataset_dir()
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.exists(meta_path): return None
+
+    with _lock:
+        if _loaded is None or _loaded.meta_mtime != os.stat(meta_path).st_mtime_ns:
+            try:
+                dataset = SparseDataset(directory)
+            except Exception as e:
+                print(f"Erro ao carregar dataset esparso: {e}")
+                return None
+            dataset.meta_mtime = os.stat(meta_path).st_mtime_ns
+            _loaded = dataset
+        dataset = _loaded
+
+    if dataset.meta.get('fingerprint') != current_fingerprint(SOURCE_TABLES): return None
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta a tabela 'dataset' para o formato esparso (CSR).")
+    parser.add_argument('command', choices=['export'])
+    parser.parse_args()
+
+    start = time.perf_counter()
+    n_rows, n_cols = export_dataset()
+    print(f"Matriz {n_rows} x {n_cols} exportada para {get_dataset_dir()} ({time.perf_counter() - start:.2f}s).")
+
+
+if __name__ == '__main__':
+    main()
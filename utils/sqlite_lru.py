@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+# sqlite_lru.py - Tabela chave -> valor em SQLite com TTL e limite de tamanho (LRU)
+# Base dos caches persistentes (utils.llm_cache, utils.result_cache): um arquivo ao lado do banco,
+# compartilhado por threads e processos. Cada escrita confere o tamanho total dentro da própria
+# transação (BEGIN IMMEDIATE), então o limite vale para a soma do que todos os processos gravaram.
+# Acertos e faltas são contados por grupo (a função ou o tipo de resultado que usou o cache).
+# Leituras não escrevem: contadores, marcas de acesso (LRU) e a limpeza de versões antigas ficam
+# em memória e são gravados junto da próxima escrita ou a cada FLUSH_INTERVAL segundos.
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from utils.db_utils import get_db_path
+
+# Após estourar o limite, remove até ficar nesta fração dele (evita despejar a cada escrita)
+EVICT_TO_FRACTION = 0.9
+# Um acerto só renova 'accessed_at' se a marca gravada tiver mais que isso (segundos)
+TOUCH_INTERVAL = 60
+# Intervalo máximo (segundos) entre gravações do que foi acumulado em memória pelas leituras
+FLUSH_INTERVAL = 30
+
+
+def cache_path(file_name):
+    """ Arquivo 'file_name' ao lado do banco de dados em uso. """
+    return os.path.join(os.path.dirname(os.path.abspath(get_db_path())), file_name)
+
+
+class SQLiteLRU(object):
+    """
+    Tabela 'table' (chave -> texto ou bytes) com TTL, limite de bytes (LRU) e a tabela
+    '<table>_stats' de acertos/faltas por grupo. 'group_column' nomeia o grupo e 'columns'
+    ((nome, tipo SQL), ...) são colunas extras gravadas junto de cada entrada.
+    """
+
+    def __init__(self, path, table, group_column, columns=(), value_type='BLOB', ttl=None, max_bytes=None,
+                 label='cache'):
+        self.path = path
+        self.table = table
+        self.group_column = group_column
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.label = label
+        self._local = threading.local()
+        # Pendências das leituras: {grupo: [acertos, faltas]}, {chave: accessed_at}, (coluna, valor atual)
+        self._pending_lock = threading.Lock()
+        self._counts, self._touched, self._purge = {}, {}, None
+        self._flushed_at = time.time()
+        extra = ''.join(f"{name} {sql_type} NOT NULL,\n" for name, sql_type in columns)
+        conn = self._conn()
+        conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                {group_column} TEXT NOT NULL,
+                {extra}value {value_type} NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_accessed ON {table}(accessed_at)")
+        conn.execute(
+            f"""CREATE TABLE IF NOT EXISTS {table}_stats (
+                {group_column} TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        conn.commit()
+        atexit.register(self.flush)
+
+    def _conn(self):
+        # Uma conexão por thread (sqlite3 não compartilha conexões entre threads por padrão)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, group, current=None):
+        """
+        Valor guardado para 'key' ou None (ausente, expirado ou obsoleto). Conta acerto/falta em 'group'.
+        'current' = (coluna, valor): entradas com outro valor nessa coluna não servem mais e são
+        apagadas na próxima gravação. Só lê o arquivo (ver flush).
+        """
+        now = time.time()
+        columns = 'value, created_at, accessed_at' + (f", {current[0]}" if current is not None else '')
+        try:
+            row = self._conn().execute(f"SELECT {columns} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            # Cache indisponível (arquivo travado, disco cheio...) não pode derrubar quem chama
+            print(f"Erro no {self.label}: {e}")
+            return None
+        with self._pending_lock:
+            if row is not None and current is not None and row[3] != current[1]:
+                self._purge = current
+                row = None
+            elif row is not None and now - row[1] > self.ttl:
+                row = None
+            self._counts.setdefault(group, [0, 0])[0 if row is not None else 1] += 1
+            if row is not None and now - row[2] > TOUCH_INTERVAL: self._touched[key] = now
+            due = now - self._flushed_at > FLUSH_INTERVAL
+        if due: self.flush()
+        return None if row is None else row[0]
+
+    def _take_pending(self):
+        with self._pending_lock:
+            pending = (self._counts, self._touched, self._purge)
+            self._counts, self._touched, self._purge = {}, {}, None
+            self._flushed_at = time.time()
+        return pending
+
+    def _restore_pending(self, pending):
+        """ Devolve à memória o que não pôde ser gravado (tenta de novo na próxima gravação). """
+        counts, touched, purge = pending
+        with self._pending_lock:
+            for group, (hits, misses) in counts.items():
+                current = self._counts.setdefault(group, [0, 0])
+                current[0] += hits
+                current[1] += misses
+            for key, accessed_at in touched.items():
+                self._touched[key] = max(accessed_at, self._touched.get(key, 0))
+            if self._purge is None: self._purge = purge
+
+    def _write_pending(self, conn, pending):
+        """ Grava contadores, marcas de acesso e a limpeza de versões antigas na transação de 'conn'. """
+        counts, touched, purge = pending
+        if purge is not None:
+            conn.execute(f"DELETE FROM {self.table} WHERE {purge[0]} != ?", (purge[1],))
+        if touched:
+            conn.executemany(f"UPDATE {self.table} SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                             [(accessed_at, key) for key, accessed_at in touched.items()])
+        if counts:
+            conn.executemany(
+                f"INSERT INTO {self.table}_stats ({self.group_column}, hits, misses) VALUES (?, ?, ?) "
+                f"ON CONFLICT({self.group_column}) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                [(group, hits, misses) for group, (hits, misses) in counts.items()]
+            )
+
+    def flush(self):
+        """ Grava o que as leituras acumularam em memória (contadores, marcas de acesso, limpeza). """
+        pending = self._take_pending()
+        if not any(pending): return
+        try:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_pending(conn, pending)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        except sqlite3.Error as e:
+            self._restore_pending(pending)
+            print(f"Erro no {self.label}: {e}")
+
+    def put(self, key, value, group, **columns):
+        """ Guarda 'value' (texto ou bytes) com as colunas extras e despeja as entradas mais antigas se passar do limite. """
+        now = time.time()
+        size = len(key) + len(value.encode('utf-8') if isinstance(value, str) else value)
+        if size > self.max_bytes: return
+        names = ('key', self.group_column) + tuple(columns) + ('value', 'size', 'created_at', 'accessed_at')
+        values = (key, group) + tuple(columns.values()) + (value, size, now, now)
+        pending = self._take_pending()
+        try:
+            conn = self._conn()
+            # Escrita e verificação do tamanho na mesma transação: o total inclui o que os
+            # outros processos gravaram, e dois processos não despejam ao mesmo tempo
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Pendências das leituras antes do despejo: a ordem LRU usa as marcas de acesso recentes
+                self._write_pending(conn, pending)
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                    values
+                )
+                total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+                if total > self.max_bytes: self._evict(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        except sqlite3.Error as e:
+            self._restore_pending(pending)
+            print(f"Erro no {self.label}: {e}")
+
+    def _evict(self, conn):
+        """ Remove expirados e, se ainda acima do limite, as entradas acessadas há mais tempo (sem commit). """
+        conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl,))
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        target = int(self.max_bytes * EVICT_TO_FRACTION)
+        if total > target:
+            cutoff = None
+            for accessed_at, size in conn.execute(f"SELECT accessed_at, size FROM {self.table} ORDER BY accessed_at"):
+                total -= size
+                cutoff = accessed_at
+                if total <= target: break
+            conn.execute(f"DELETE FROM {self.table} WHERE accessed_at <= ?", (cutoff,))
+
+    def evict(self):
+        """ Remove expirados e, se ainda acima do limite, as entradas acessadas há mais tempo. """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._evict(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def stats(self):
+        """ {'entries', 'bytes', 'groups': {grupo: {'hits', 'misses'}}} """
+        self.flush()
+        conn = self._conn()
+        entries, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        groups = {
+            group: {'hits': hits, 'misses': misses}
+            for group, hits, misses in conn.execute(
+                f"SELECT {self.group_column}, hits, misses FROM {self.table}_stats ORDER BY {self.group_column}"
+            )
+        }
+        return {'entries': entries, 'bytes': total, 'groups': groups}
+
+    def clear(self):
+        self._take_pending()
+        conn = self._conn()
+        conn.execute(f"DELETE FROM {self.table}")
+        conn.execute(f"DELETE FROM {self.table}_stats")
+        conn.commit()
+
+
+def print_stats(path, stats):
+    """ Saída do comando 'stats' dos caches: tamanho e taxa de acerto por grupo. """
+    print(f"{path}: {stats['entries']} entrada(s), {stats['bytes'] / 1024:.1f} KiB")
+    for group, counts in stats['groups'].items():
+        total = counts['hits'] + counts['misses']
+        rate = counts['hits'] / total if total else 0
+        print(f"  {group}: {counts['hits']} acerto(s), {counts['misses']} falta(s) ({rate:.0%} de acerto)")
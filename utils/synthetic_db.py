@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# synthetic_db.py - Gerador de banco SQLite sintético no formato do Lattes/CAPES
+# Mesmo esquema de 'base_recomendacao.db' (pessoa, ppg, pessoa_ppg, publicacao, orientacao,
+# palavra_chave, area_conhecimento, dataset, stopwords), com dados fictícios e reprodutíveis
+# (mesma semente = mesmo banco). As distribuições imitam as reais: poucas áreas concentram a
+# maioria dos docentes e a produção por pessoa tem cauda longa (muitos com pouca produção,
+# alguns com centenas de publicações). Serve para medir desempenho (utils.benchmark) sem o banco real.
+#
+# Uso (a partir da raiz do projeto):
+#   python -m utils.synthetic_db data/sintetico_10k.db --professors 10000 --seed 42
+#   RECOMENDAPROF_DB=data/sintetico_10k.db python -m utils.benchmark
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+# Docentes gravados por transação
+CHUNK_SIZE = 2000
+CURRENT_YEAR = 2025
+
+SCHEMA = """
+CREATE TABLE pessoa (id INTEGER PRIMARY KEY, titulacao TEXT, universidade TEXT, nome TEXT, ano_doutorado INTEGER);
+CREATE TABLE ppg (id INTEGER PRIMARY KEY, nome TEXT, nome_universidade TEXT, sigla_universidade TEXT,
+                  mestrado INTEGER, doutorado INTEGER, area1 TEXT, area2 TEXT, area3 TEXT);
+CREATE TABLE pessoa_ppg (id_ppg INTEGER, id_pessoa INTEGER);
+CREATE TABLE area_conhecimento (id INTEGER PRIMARY KEY, grande_area_conhecimento TEXT, area_conhecimento TEXT,
+                                sub_area_conhecimento TEXT, especialidade TEXT, id_pessoa INTEGER, ano INTEGER, tipo TEXT);
+CREATE TABLE publicacao (id INTEGER PRIMARY KEY, tipo TEXT, titulo TEXT, titulo_portugues TEXT, idioma TEXT, ano INTEGER,
+                         id_pessoa INTEGER, titulo_sem_stopword TEXT, periodico TEXT, issn TEXT, volume TEXT,
+                         pagina_inicial TEXT, pagina_final TEXT, meio_divulgacao TEXT, tipo_livro TEXT,
+                         classificacao_evento TEXT);
+CREATE TABLE orientacao (tipo_orientacao TEXT, natureza TEXT, ano TEXT, titulo TEXT, id_pessoa INTEGER);
+CREATE TABLE palavra_chave (palavra TEXT, ano INTEGER, id_pessoa INTEGER);
+CREATE TABLE dataset (linha TEXT, id_pessoa INTEGER);
+CREATE TABLE stopwords (id INTEGER PRIMARY KEY, word TEXT);
+"""
+
+# (grande área, área, subáreas, especialidades, vocabulário, peso relativo de docentes)
+TOPICS = (
+    ('CIENCIAS_EXATAS_E_DA_TERRA', 'Ciência da Computação',
+     ('Metodologia e Técnicas da Computação', 'Sistemas de Computação', 'Teoria da Computação'),
+     ('Banco de Dados', 'Engenharia de Software', 'Inteligência Artificial'),
+     'computação algoritmo aprendizado máquina rede software dado sistema inteligência grafo otimização '
+     'segurança nuvem visão linguagem', 9),
+    ('CIENCIAS_EXATAS_E_DA_TERRA', 'Matemática', ('Análise', 'Álgebra', 'Matemática Aplicada'),
+     ('Equações Diferenciais', 'Geometria Diferencial', 'Probabilidade'),
+     'equação operador álgebra geometria topologia probabilidade estatística análise matriz modelo', 4),
+    ('CIENCIAS_EXATAS_E_DA_TERRA', 'Química', ('Química Orgânica', 'Físico-Química', 'Química Analítica'),
+     ('Síntese Orgânica', 'Catálise', 'Eletroquímica'),
+     'síntese composto catálise reação molécula polímero espectroscopia solvente cristal eletroquímica', 6),
+    ('CIENCIAS_EXATAS_E_DA_TERRA', 'Física', ('Física da Matéria Condensada', 'Física das Partículas Elementares'),
+     ('Supercondutividade', 'Física Nuclear'),
+     'partícula quântico campo energia spin laser plasma supercondutor óptica cosmologia', 4),
+    ('ENGENHARIAS', 'Engenharia Elétrica', ('Sistemas Elétricos de Potência', 'Telecomunicações', 'Eletrônica Industrial'),
+     ('Controle de Processos', 'Teoria Eletromagnética', 'Circuitos Eletrônicos'),
+     'energia potência sinal circuito antena controle conversor transmissão sensor robótica', 6),
+    ('ENGENHARIAS', 'Engenharia Civil', ('Estruturas', 'Geotécnica', 'Engenharia Hidráulica'),
+     ('Estruturas de Concreto', 'Mecânica dos Solos', 'Hidrologia'),
+     'concreto estrutura solo fundação pavimento hidráulica drenagem aço ponte sustentabilidade', 4),
+    ('CIENCIAS_BIOLOGICAS', 'Ecologia', ('Ecologia de Ecossistemas', 'Ecologia Aplicada'),
+     ('Conservação', 'Ecologia de Populações'),
+     'ecossistema biodiversidade espécie floresta conservação habitat clima população solo água', 5),
+    ('CIENCIAS_DA_SAUDE', 'Saúde Coletiva', ('Epidemiologia', 'Saúde Pública', 'Medicina Preventiva'),
+     ('Vigilância Epidemiológica', 'Doenças Transmissíveis'),
+     'saúde epidemiologia vigilância doença população vacina atenção cuidado mortalidade prevenção', 8),
+    ('CIENCIAS_HUMANAS', 'Educação', ('Ensino-Aprendizagem', 'Política Educacional', 'Currículo'),
+     ('Formação de Professores', 'Educação Inclusiva'),
+     'educação ensino aprendizagem professor escola currículo formação política avaliação inclusão', 10),
+    ('CIENCIAS_SOCIAIS_APLICADAS', 'Administração', ('Administração de Empresas', 'Administração Pública'),
+     ('Estratégia', 'Finanças'),
+     'gestão organização empresa estratégia inovação governança finanças mercado desempenho sustentabilidade', 7),
+    ('CIENCIAS_AGRARIAS', 'Agronomia', ('Fitotecnia', 'Ciência do Solo', 'Fitossanidade'),
+     ('Manejo e Tratos Culturais', 'Fertilidade do Solo'),
+     'cultivo solo planta produtividade irrigação adubação semente praga colheita fertilidade', 5),
+    ('LINGUISTICA_LETRAS_E_ARTES', 'Letras', ('Linguística Aplicada', 'Literatura Brasileira'),
+     ('Análise do Discurso', 'Teoria Literária'),
+     'linguagem discurso literatura texto leitura gramática tradução narrativa poesia ensino', 4),
+)
+
+# Moldes de título: as palavras do tema entram nos '{}' e os conectivos viram stopwords
+TITLE_TEMPLATES = (
+    '{} de {} para {}', '{} e {} em {} de {}', 'uma abordagem de {} para {} {}', 'análise de {} em {}',
+    '{} {} aplicado a {}', 'sobre {} e {}: um estudo de {}', '{} baseado em {} e {} para {}',
+)
+STOPWORDS = ('de', 'para', 'em', 'e', 'uma', 'um', 'sobre', 'a', 'o', 'do', 'da', 'baseado', 'aplicado', 'estudo')
+
+PUBLICATION_TYPES = (('ARTIGO', 55), ('EVENTO', 30), ('CAPITULO', 10), ('LIVRO', 5))
+ORIENTATION_TYPES = (('MESTRADO', 45), ('DOUTORADO', 20), ('INICIACAO_CIENTIFICA', 35))
+LANGUAGES = (('Português', 60), ('Inglês', 35), ('Espanhol', 5))
+
+
+def _weighted(options):
+    values, weights = zip(*options)
+    return list(values), list(weights)
+
+
+class _Generator(object):
+    """ Gera os docentes em blocos; todas as escolhas saem do mesmo random.Random(seed). """
+
+    def __init__(self, professors, seed):
+        self.rng = random.Random(seed)
+        self.professors = professors
+        self.topics = [(ga, a, subs, specs, vocab.split(), weight) for ga, a, subs, specs, vocab, weight in TOPICS]
+        self.topic_weights = [t[5] for t in self.topics]
+        self.vocabulary = sorted({word for t in self.topics for word in t[4]})
+        self.universities = [(f"Universidade Federal Sintética {i}", f"UFS{i}") for i in range(1, 41)]
+        self.pub_types = _weighted(PUBLICATION_TYPES)
+        self.ori_types = _weighted(ORIENTATION_TYPES)
+        self.languages = _weighted(LANGUAGES)
+        self.ppgs = self._make_ppgs()
+
+    def _make_ppgs(self):
+        """ ~1 PPG para cada 20 docentes, distribuídos pelos temas conforme o peso de cada um. """
+        total = max(len(self.topics), self.professors // 20)
+        weight_sum = sum(self.topic_weights)
+        ppgs, by_topic = [], {}
+        for t_index, topic in enumerate(self.topics):
+            ga, area, subs, specs, vocab, weight = topic
+            for _ in range(max(1, round(total * weight / weight_sum))):
+                universidade, sigla = self.rng.choice(self.universities)
+                # Programas interdisciplinares citam a área de outro tema em area3
+                other = self.rng.choice(self.topics)[1] if self.rng.random() < 0.2 else None
+                ppg_id = len(ppgs) + 1
+                ppgs.append((ppg_id, f"Programa de Pós-Graduação em {area}", universidade, sigla,
+                             1, int(self.rng.random() < 0.6), area, self.rng.choice(subs), other))
+                by_topic.setdefault(t_index, []).append(ppg_id)
+        self.ppgs_by_topic = by_topic
+        return ppgs
+
+    def _title(self, vocab):
+        template = self.rng.choice(TITLE_TEMPLATES)
+        words = [self.rng.choice(vocab) for _ in range(template.count('{}'))]
+        return template.format(*words)
+
+    def chunk(self, first_id, last_id):
+        """ Linhas de todas as tabelas para os docentes first_id..last_id. """
+        rng = self.rng
+        rows = {t: [] for t in ('pessoa', 'pessoa_ppg', 'area_conhecimento', 'publicacao', 'orientacao', 'palavra_chave', 'dataset')}
+        position = {word: i for i, word in enumerate(self.vocabulary)}
+
+        for id_pessoa in range(first_id, last_id + 1):
+            t_index = rng.choices(range(len(self.topics)), self.topic_weights)[0]
+            ga, area, subs, specs, vocab, _ = self.topics[t_index]
+            # Parte do vocabulário vem de um segundo tema (produção interdisciplinar)
+            second = self.topics[rng.randrange(len(self.topics))][4]
+            mixed = vocab * 4 + second
+
+            ano_doutorado = rng.randint(1980, CURRENT_YEAR - 1)
+            universidade = rng.choice(self.universities)[0]
+            rows['pessoa'].append((id_pessoa, 'Doutorado', universidade, f"Docente Sintético {id_pessoa}", ano_doutorado))
+            for ppg_id in rng.sample(self.ppgs_by_topic[t_index], min(len(self.ppgs_by_topic[t_index]), 1 + (rng.random() < 0.15))):
+                rows['pessoa_ppg'].append((ppg_id, id_pessoa))
+            # ~10% sem áreas cadastradas (exercita o fallback semântico do Ranking)
+            if rng.random() > 0.1:
+                for _ in range(rng.randint(1, 3)):
+                    rows['area_conhecimento'].append(
+                        (ga, area, rng.choice(subs), rng.choice(specs) if rng.random() < 0.7 else '', id_pessoa, None, 'ATUACAO')
+                    )
+
+            # Produção com cauda longa (log-normal): mediana ~16, alguns com centenas
+            counts = [0] * len(self.vocabulary)
+            for _ in range(min(1500, int(rng.lognormvariate(2.8, 1.0)))):
+                ano = max(ano_doutorado - 4, CURRENT_YEAR - int(rng.expovariate(1 / 8)))
+                tipo = rng.choices(*self.pub_types)[0]
+                titulo = self._title(mixed)
+                rows['publicacao'].append((tipo, titulo, rng.choices(*self.languages)[0], ano, id_pessoa))
+                for word in titulo.split():
+                    index = position.get(word)
+                    if index is not None: counts[index] += 1
+                if rng.random() < 0.6:
+                    for word in rng.sample(vocab, rng.randint(1, 4)):
+                        rows['palavra_chave'].append((word, ano, id_pessoa))
+            rows['dataset'].append((f"{id_pessoa}," + ','.join(map(str, counts)), id_pessoa))
+
+            for _ in range(min(200, int(rng.lognormvariate(1.5, 0.9)))):
+                ano = rng.randint(max(ano_doutorado, CURRENT_YEAR - 30), CURRENT_YEAR)
+                rows['orientacao'].append((
+                    'ORIENTADOR_PRINCIPAL' if rng.random() < 0.85 else 'CO_ORIENTADOR',
+                    rng.choices(*self.ori_types)[0], str(ano), self._title(vocab), id_pessoa
+                ))
+        return rows
+
+
+_INSERTS = {
+    'pessoa': "INSERT INTO pessoa (id, titulacao, universidade, nome, ano_doutorado) VALUES (?, ?, ?, ?, ?)",
+    'pessoa_ppg': "INSERT INTO pessoa_ppg (id_ppg, id_pessoa) VALUES (?, ?)",
+    'area_conhecimento': "INSERT INTO area_conhecimento (grande_area_conhecimento, area_conhecimento, sub_area_conhecimento, "
+                         "especialidade, id_pessoa, ano, tipo) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    'publicacao': "INSERT INTO publicacao (tipo, titulo, idioma, ano, id_pessoa) VALUES (?, ?, ?, ?, ?)",
+    'orientacao': "INSERT INTO orientacao (tipo_orientacao, natureza, ano, titulo, id_pessoa) VALUES (?, ?, ?, ?, ?)",
+    'palavra_chave': "INSERT INTO palavra_chave (palavra, ano, id_pessoa) VALUES (?, ?, ?)",
+    'dataset': "INSERT INTO dataset (linha, id_pessoa) VALUES (?, ?)",
+}
+
+
+def generate_database(path, professors=1000, seed=42, overwrite=False):
+    """ Cria o banco sintético em 'path' com 'professors' docentes. Retorna {tabela: linhas}. """
+    if os.path.exists(path):
+        if not overwrite: raise FileExistsError(f"{path} já existe (use overwrite=True / --force).")
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    generator = _Generator(professors, seed)
+    conn = sqlite3.connect(path)
+    # Arquivo novo e descartável: sem journal nem fsync durante a geração
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.executemany("INSERT INTO ppg VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", generator.ppgs)
+            conn.executemany("INSERT INTO stopwords (word) VALUES (?)", [(w,) for w in STOPWORDS])
+            conn.execute("INSERT INTO dataset (linha, id_pessoa) VALUES (?, 0)", ('id_pessoa,' + ','.join(generator.vocabulary),))
+
+        totals = {'ppg': len(generator.ppgs)}
+        start = time.perf_counter()
+        for first_id in range(1, professors + 1, CHUNK_SIZE):
+            last_id = min(professors, first_id + CHUNK_SIZE - 1)
+            rows = generator.chunk(first_id, last_id)
+            with conn:
+                for table, values in rows.items():
+                    conn.executemany(_INSERTS[table], values)
+                    totals[table] = totals.get(table, 0) + len(values)
+            if professors > CHUNK_SIZE:
+                print(f"{last_id}/{professors} docentes ({last_id / (time.perf_counter() - start):.0f}/s)")
+        return totals
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera um banco SQLite sintético no formato do banco real.")
+    parser.add_argument('path', help="Arquivo do banco a criar (ex.: data/sintetico_10k.db).")
+    parser.add_argument('--professors', type=int, default=1000, help="Quantidade de docentes (ex.: 1000 a 500000).")
+    parser.add_argument('--seed', type=int, default=42, help="Semente (mesma semente e tamanho = mesmo banco).")
+    parser.add_argument('--force', action='store_true', help="Sobrescreve o arquivo se ele já existir.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals = generate_database(args.path, args.professors, args.seed, args.force)
+    print(f"{args.path} gerado em {time.perf_counter() - start:.1f}s:")
+    for table, count in totals.items():
+        print(f"  {table}: {count}")
+    print(f"Para usar: RECOMENDAPROF_DB={args.path} (índices e métricas: 'python -m utils.db_indexes migrate', "
+          "'python -m utils.professor_metrics rebuild').")
+
+
+if __name__ == '__main__':
+    main()
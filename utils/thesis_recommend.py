@@ -2,47 +2,102 @@
 # thesis_recommend.py - Implementação Fiel e Expandida da Tese
 # Lógica: Filtro SQL -> Clusterização (Birch/KMeans) -> Ranking Multifatorial (6 Variáveis)
 
-import spacy
+import os
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 import datetime
 import re
+from scipy import sparse
 from sklearn.cluster import Birch, KMeans
 from sklearn.preprocessing import Normalizer
 from sklearn.feature_extraction.text import TfidfVectorizer
-from utils.db_utils import get_db_connection
+from utils.db_utils import get_db_path, pooled_connection
+from utils.instrumentation import trace, span, count
+from utils.area_index import get_area_index
+from utils.model_store import load_model, load_saved_model, save_model, saved_models_key
+from utils.profiling import profiled
+from utils.professor_metrics import metrics_available, pending_ids, ranking_metrics_sql
+from utils.sparse_dataset import load_sparse_dataset
 
-try:
-    nlp = spacy.load('pt_core_news_md')
-except IOError:
-    nlp = None
+BIRCH_MODEL_NAME = 'birch_palavras'
+TFIDF_MODEL_NAME = 'tfidf_palavras_chave'
+# Buscas (assinaturas de lemas e tokens) com candidatos em cache (por processo; ver CandidateCache)
+CANDIDATE_CACHE_SIZE = 128
+
+# Consultas do motor ('{ids}' = lista de id_pessoa); também auditadas por utils.db_indexes
+SQL_DATASET_ALL = "select * from dataset where linha not like 'id_pessoa%' and id_pessoa != 0"
+SQL_DATASET_ROWS = "select * from dataset where linha not like 'id_pessoa%' and id_pessoa in ({ids})"
+SQL_DATASET_HEADER = "select * from dataset where id_pessoa = 0"
+SQL_KEYWORDS = """
+ SELECT GROUP_CONCAT(UPPER(palavra), ', ') as palavras, id_pessoa 
+ FROM (SELECT palavra, id_pessoa FROM palavra_chave WHERE ano > 2010 AND id_pessoa IN ({ids}) ORDER BY id_pessoa) 
+ GROUP BY id_pessoa
+"""
+SQL_KEYWORDS_ALL = """
+ SELECT GROUP_CONCAT(UPPER(palavra), ', ') as palavras, id_pessoa 
+ FROM (SELECT palavra, id_pessoa FROM palavra_chave WHERE ano > 2010 ORDER BY id_pessoa) 
+ GROUP BY id_pessoa
+"""
+SQL_NAMES = "SELECT id, nome FROM pessoa WHERE id IN ({ids})"
+
+# --- spaCy (carregamento preguiçoso) ---
+# O motor só usa is_stop e lemma_: parser e NER ficam de fora. O lematizador do pt_core_news_md
+# depende das classes gramaticais do morphologizer (e do tok2vec), que por isso são mantidos.
+SPACY_MODEL = 'pt_core_news_md'
+SPACY_EXCLUDE = ['parser', 'ner', 'senter']
+
+nlp = None
+_nlp_failed = False
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """ Carrega o modelo spaCy na primeira chamada (thread-safe). Retorna None se não estiver instalado. """
+    global nlp, _nlp_failed
+    if nlp is not None or _nlp_failed: return nlp
+    with _nlp_lock:
+        if nlp is None and not _nlp_failed:
+            import spacy
+            try:
+                nlp = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+            except IOError:
+                _nlp_failed = True
+    return nlp
+
+def warm_up(background=True):
+    """
+    Pré-carrega spaCy e o índice de áreas para que a primeira busca não pague esse custo.
+    Com background=True roda numa thread daemon e retorna a thread.
+    """
+    def _run():
+        get_nlp()
+        try:
+            get_area_index()
+        except Exception as e:
+            print(f"Aquecimento do índice de áreas falhou: {e}")
+
+    if not background:
+        _run()
+        return None
+    thread = threading.Thread(target=_run, name='engine-warm-up', daemon=True)
+    thread.start()
+    return thread
 
 # =========================================================================== #
 #                                 CLASSE Areas                                #
 # =========================================================================== #
 class Areas(object):
-    def __init__(self, originalText):
+    def __init__(self, originalText, substring=False):
         self.originalText = originalText
+        # substring=True reproduz o filtro antigo (LIKE '%termo%'), inclusive o termo vazio
+        # gerado pelo espaço final do texto lematizado, que casa qualquer área preenchida
+        self.substring = substring
 
     def getPossibleAdvisors(self):
-        conn = get_db_connection()
-        cur = conn.cursor()
         words = self.originalText.split(" ")
-        conditions = []
-        params = []
-        for word in words:
-            term = word.lower()
-            conditions.append(f"(LOWER(area1) LIKE ? OR LOWER(area2) LIKE ? OR LOWER(area3) LIKE ?)")
-            params.extend([f"%{term}%", f"%{term}%", f"%{term}%"])
-        where_clause = " OR ".join(conditions)
-        sql = f"SELECT DISTINCT p.id_pessoa FROM ppg INNER JOIN pessoa_ppg p ON ppg.id = p.id_ppg WHERE {where_clause}"
-        try:
-            cur.execute(sql, params)
-            data = cur.fetchall()
-            ids = [str(row['id_pessoa']) for row in data]
-            return ', '.join(ids)
-        finally:
-            conn.close()
+        ids = sorted(get_area_index().lookup(words, substring=self.substring))
+        return ', '.join(str(i) for i in ids)
 
 # =========================================================================== #
 #                          CLASSE ClusterPalavras                             #
@@ -51,26 +106,13 @@ class ClusterPalavras(object):
     kmeans = None
     headerDs = None
     finalDataFrame = None
+    # True quando o cluster veio do modelo salvo (python -m utils.model_store build)
+    pretrained = False
 
-    def generateCluster(self, ids, clustersAmount): 
-        if not ids: return
-        conn = get_db_connection()
-        try:
-            sql_data = f"select * from dataset where linha not like 'id_pessoa%' and id_pessoa in ({ids})"
-            sql_header = "select * from dataset where id_pessoa = 0"
-            df_data = pd.read_sql_query(sql_data, conn)
-            df_header = pd.read_sql_query(sql_header, conn)
-        except:
-            conn.close()
-            return
-        conn.close()
-
-        if df_data.empty: return
-
-        if not df_header.empty:
-            cols = df_header.iloc[0]['linha'].split(',')
-        else:
-            return 
+    def _parseDataset(self, df_data, df_header):
+        """ Converte as linhas CSV do 'dataset' em matriz numérica (contagem de palavras). """
+        if df_data.empty or df_header.empty: return None, None
+        cols = df_header.iloc[0]['linha'].split(',')
 
         data_expanded = df_data['linha'].str.split(',', expand=True)
         if data_expanded.shape[1] == len(cols):
@@ -79,13 +121,110 @@ class ClusterPalavras(object):
         data_expanded['id_pessoa'] = df_data['id_pessoa']
         df_clustering = data_expanded.drop(columns=['id_pessoa'], errors='ignore')
         df_clustering = df_clustering.apply(pd.to_numeric, errors='coerce').fillna(0)
+        return df_clustering, cols
+
+    def _loadDataset(self, ids=None):
+        """
+        Retorna (matriz de contagens, ids, cabeçalho) dos professores em 'ids' (todos se None).
+        Usa a matriz esparsa exportada (python -m utils.sparse_dataset export) quando disponível.
+        """
+        stored = load_sparse_dataset()
+        count('cache_hit_sparse_dataset' if stored is not None else 'cache_miss_sparse_dataset')
+        if stored is not None:
+            if ids is None:
+                return stored.matrix, np.asarray(stored.ids), stored.vocabulary
+            matrix, found_ids = stored.rows(int(i) for i in ids.split(', '))
+            return matrix, found_ids, stored.vocabulary
+
+        sql_data = SQL_DATASET_ALL if ids is None else SQL_DATASET_ROWS.format(ids=ids)
+        with pooled_connection() as conn:
+            df_data = pd.read_sql_query(sql_data, conn)
+            df_header = pd.read_sql_query(SQL_DATASET_HEADER, conn)
+        count('sql_rows_dataset', len(df_data))
+
+        df_clustering, cols = self._parseDataset(df_data, df_header)
+        if df_clustering is None: return None, None, None
+        return df_clustering, df_data['id_pessoa'].values, cols
 
-        transformer = Normalizer().fit(df_clustering)
-        transformed_data = transformer.transform(df_clustering)
+    def buildModel(self, clustersAmount=None):
+        """
+        Treina o Birch uma única vez sobre todo o 'dataset' e salva modelo, cabeçalho e rótulos.
+        Retorna o caminho do arquivo gerado.
+        """
+        matrix, row_ids, cols = self._loadDataset()
+        if matrix is None or matrix.shape[0] == 0:
+            raise RuntimeError("Tabela 'dataset' vazia ou sem cabeçalho (id_pessoa = 0).")
+
+        if clustersAmount is None: clustersAmount = self._defaultClustersAmount(matrix.shape[0])
+        transformed_data = Normalizer().fit_transform(matrix)
+        model = Birch(n_clusters=clustersAmount).fit(transformed_data)
+
+        labels = pd.DataFrame({'id_pessoa': np.asarray(row_ids).astype(int), 'classe': model.labels_})
+        return save_model(BIRCH_MODEL_NAME, {'model': model, 'header': cols, 'labels': labels}, ('dataset',))
+
+    def _defaultClustersAmount(self, total):
+        """
+        Clusters do modelo global dimensionados para um conjunto típico de candidatos (~6 por
+        cluster, como o Birch por busca da Tese), e não 6 professores por cluster no banco inteiro:
+        com clusters tão pequenos, o cluster do aluno raramente contém algum candidato.
+        """
+        try:
+            from spacy.lang.pt.stop_words import STOP_WORDS
+        except ImportError:
+            STOP_WORDS = ()
+        typical = get_area_index().typical_candidates(STOP_WORDS) or total
+        return max(2, min(total, round(typical / 6)))
+
+    def updateModel(self, ids):
+        """
+        Atualiza os rótulos salvos só dos professores em 'ids' (lista de id_pessoa), classificando
+        as linhas atuais do 'dataset' nos clusters já treinados; ids sem linha são removidos.
+        """
+        stored = load_saved_model(BIRCH_MODEL_NAME)
+        if stored is None: raise RuntimeError("Modelo Birch não encontrado; execute 'python -m utils.model_store build'.")
+        ids = [int(i) for i in ids]
+        labels = stored['labels'].loc[~stored['labels']['id_pessoa'].isin(ids)]
+
+        matrix, row_ids, cols = self._loadDataset(', '.join(map(str, ids))) if ids else (None, None, None)
+        if matrix is not None and matrix.shape[0] > 0:
+            if matrix.shape[1] != stored['model'].n_features_in_:
+                raise RuntimeError("Vocabulário do 'dataset' mudou; execute 'python -m utils.model_store build'.")
+            classes = stored['model'].predict(Normalizer().fit_transform(matrix))
+            labels = pd.concat(
+                [labels, pd.DataFrame({'id_pessoa': np.asarray(row_ids).astype(int), 'classe': classes})],
+                ignore_index=True
+            )
+        stored['labels'] = labels.reset_index(drop=True)
+        return save_model(BIRCH_MODEL_NAME, stored, ('dataset',))
+
+    def generateCluster(self, ids, clustersAmount): 
+        if not ids: return
+
+        # Caminho rápido: modelo pré-treinado, só filtra os rótulos para os candidatos
+        stored = load_model(BIRCH_MODEL_NAME)
+        count('cache_hit_birch_model' if stored is not None else 'cache_miss_birch_model')
+        if stored is not None:
+            id_set = {int(i) for i in ids.split(', ')}
+            labels = stored['labels']
+            self.kmeans = stored['model']
+            self.headerDs = stored['header']
+            self.finalDataFrame = labels.loc[labels['id_pessoa'].isin(id_set)].reset_index(drop=True)
+            self.pretrained = True
+            return
+        self.pretrained = False
+
+        try:
+            matrix, row_ids, cols = self._loadDataset(ids)
+        except:
+            return
+        if matrix is None or matrix.shape[0] == 0: return
+
+        transformer = Normalizer().fit(matrix)
+        transformed_data = transformer.transform(matrix)
         self.kmeans = Birch(n_clusters=clustersAmount).fit(transformed_data)
         
         self.finalDataFrame = pd.DataFrame()
-        self.finalDataFrame['id_pessoa'] = df_data['id_pessoa']
+        self.finalDataFrame['id_pessoa'] = row_ids
         self.finalDataFrame['classe'] = self.kmeans.labels_
         self.headerDs = cols
 
@@ -103,21 +242,47 @@ class ClusterPalavras(object):
             retorno[value] = retorno.get(value, 0) + 1
         return retorno
 
-    def predict(self, dataset_dict):
-        if not self.headerDs: return 0
+    def _transform(self, dataset_dict):
+        """ Vetor normalizado do texto no espaço do 'dataset' (mesma transformação do treino). """
         vector = np.zeros((1, len(self.headerDs)))
         df_vec = pd.DataFrame(vector, columns=self.headerDs)
         for word, count in dataset_dict.items():
             if word in df_vec.columns: df_vec.at[0, word] = count
         if 'id_pessoa' in df_vec.columns: df_vec = df_vec.drop(columns=['id_pessoa'])
         transformer = Normalizer().fit(df_vec)
-        classe = self.kmeans.predict(transformer.transform(df_vec))
+        return transformer.transform(df_vec)
+
+    def predict(self, dataset_dict):
+        if not self.headerDs: return 0
+        classe = self.kmeans.predict(self._transform(dataset_dict))
         return classe[0]
-    
+
+    def nearestClasses(self, dataset_dict):
+        """
+        Rótulos dos clusters em ordem de proximidade do texto (distância aos centros dos subclusters
+        do Birch); o primeiro é o mesmo de predict().
+        """
+        if not self.headerDs: return [0]
+        vector = np.asarray(self._transform(dataset_dict))
+        distances = ((self.kmeans.subcluster_centers_ - vector) ** 2).sum(axis=1)
+        ordered = self.kmeans.subcluster_labels_[np.argsort(distances, kind='stable')]
+        return list(dict.fromkeys(ordered.tolist()))
+
     def getAllPeopleIDFromCluster(self, classe):
         if self.finalDataFrame is None: return pd.Series()
         return self.finalDataFrame.loc[self.finalDataFrame['classe'] == classe]['id_pessoa']
 
+    def getPeopleIDFromNearestCluster(self, dataset_dict):
+        """
+        Candidatos do cluster mais próximo do texto que contenha algum deles. Com o modelo global,
+        o cluster previsto para o aluno pode não ter nenhum candidato da busca.
+        """
+        if self.finalDataFrame is None: return pd.Series()
+        present = set(self.finalDataFrame['classe'].tolist())
+        for classe in self.nearestClasses(dataset_dict):
+            if classe in present: return self.getAllPeopleIDFromCluster(classe)
+        return pd.Series()
+
 # =========================================================================== #
 #                       CLASSE ClusterPalavrasChaves                          #
 # =========================================================================== #
@@ -126,19 +291,66 @@ class ClusterPalavrasChaves(object):
     tfidf = None
     finalDataFrame = None
 
-    def generateCluster(self, whereClause): 
-        conn = get_db_connection()
-        sql = f"""
-         SELECT GROUP_CONCAT(UPPER(palavra), ', ') as palavras, id_pessoa 
-         FROM (SELECT palavra, id_pessoa FROM palavra_chave WHERE ano > 2010 AND id_pessoa IN ({whereClause}) ORDER BY id_pessoa) 
-         GROUP BY id_pessoa
+    def buildModel(self):
+        """
+        Vetoriza (TF-IDF) as palavras-chave de todos os professores uma única vez e salva
+        o vetorizador junto da matriz esparsa, indexada por id_pessoa. Retorna o caminho do arquivo.
+        """
+        with pooled_connection() as conn:
+            df = pd.read_sql_query(SQL_KEYWORDS_ALL, conn)
+        if df.empty:
+            raise RuntimeError("Tabela 'palavra_chave' sem registros após 2010.")
+
+        tfidf = TfidfVectorizer(min_df=1, max_df=0.95, max_features=8000)
+        matrix = tfidf.fit_transform(df['palavras'].fillna('')).tocsr()
+        payload = {'vectorizer': tfidf, 'matrix': matrix, 'ids': df['id_pessoa'].to_numpy(dtype=np.int64)}
+        return save_model(TFIDF_MODEL_NAME, payload, ('palavra_chave',))
+
+    def updateModel(self, ids):
         """
+        Regrava só as linhas dos professores em 'ids' na matriz TF-IDF salva, com o vetorizador
+        já ajustado (vocabulário e IDF da última reconstrução completa).
+        """
+        stored = load_saved_model(TFIDF_MODEL_NAME)
+        if stored is None: raise RuntimeError("Modelo TF-IDF não encontrado; execute 'python -m utils.model_store build'.")
+        ids = np.asarray([int(i) for i in ids], dtype=np.int64)
+        keep = np.flatnonzero(~np.isin(stored['ids'], ids))
+        matrix, row_ids = stored['matrix'][keep], stored['ids'][keep]
+
+        if len(ids):
+            with pooled_connection() as conn:
+                df = pd.read_sql_query(SQL_KEYWORDS.format(ids=', '.join(map(str, ids))), conn)
+            if not df.empty:
+                matrix = sparse.vstack([matrix, stored['vectorizer'].transform(df['palavras'].fillna(''))], format='csr')
+                row_ids = np.concatenate([row_ids, df['id_pessoa'].to_numpy(dtype=np.int64)])
+        stored['matrix'], stored['ids'] = matrix, row_ids
+        return save_model(TFIDF_MODEL_NAME, stored, ('palavra_chave',))
+
+    def generateCluster(self, whereClause): 
+        # Caminho rápido: matriz TF-IDF pré-calculada, só fatia as linhas dos candidatos.
+        # O KMeans (k=2) continua sendo ajustado sobre os candidatos da busca, como na Tese,
+        # mas sobre uma matriz pequena e já vetorizada.
+        stored = load_model(TFIDF_MODEL_NAME)
+        count('cache_hit_tfidf_model' if stored is not None else 'cache_miss_tfidf_model')
+        if stored is not None:
+            candidate_ids = np.array([int(i) for i in whereClause.split(', ')], dtype=np.int64)
+            positions = np.flatnonzero(np.isin(stored['ids'], candidate_ids))
+            if not len(positions):
+                self.finalDataFrame = None
+                return
+            self.tfidf = stored['vectorizer']
+            true_k = min(2, len(positions))
+            self.kmeans = KMeans(n_clusters=true_k).fit(stored['matrix'][positions])
+            self.finalDataFrame = pd.DataFrame({'id_pessoa': stored['ids'][positions], 'classe': self.kmeans.labels_})
+            return
+
+        sql = SQL_KEYWORDS.format(ids=whereClause)
         try:
-            df = pd.read_sql_query(sql, conn)
+            with pooled_connection() as conn:
+                df = pd.read_sql_query(sql, conn)
         except:
             df = pd.DataFrame()
-        finally:
-            conn.close()
+        count('sql_rows_keywords', len(df))
 
         if df.empty: return
 
@@ -152,9 +364,8 @@ class ClusterPalavrasChaves(object):
         self.finalDataFrame = df.copy()
         self.finalDataFrame['classe'] = self.kmeans.labels_
         
-        conn = get_db_connection()
-        names_df = pd.read_sql_query(f"SELECT id, nome FROM pessoa WHERE id IN ({whereClause})", conn)
-        conn.close()
+        with pooled_connection() as conn:
+            names_df = pd.read_sql_query(SQL_NAMES.format(ids=whereClause), conn)
         self.finalDataFrame = self.finalDataFrame.merge(names_df, left_on='id_pessoa', right_on='id', how='left')
 
     def predict(self, text):
@@ -238,17 +449,10 @@ class Ranking(object):
         intersection = u_tok.intersection(p_tok)
         return min(1.0, 0.2 + (0.8 * (len(intersection) / len(u_tok))))
 
-    def getRanking(self, whereClause, weights, lookback_years=4):
-        if not whereClause: return []
-        conn = get_db_connection()
-        
-        # Define janela de "Pesquisa Ativa" dinamicamente
-        current_year = datetime.datetime.now().year
-        # O padrão passa a ser dinâmico (4 ou 8 anos dependendo do input)
-        start_year_recent = current_year - lookback_years
-
+    def _rankingSql(self, whereClause, current_year, start_year_recent):
+        """ SQL original (subconsultas correlacionadas), usado quando não há tabela materializada. """
         # SQL Modificado para buscar a Hierarquia CNPq concatenada e remover dependência de status
-        sql = f"""
+        return f"""
         SELECT 
             pe.id, pe.nome, pe.ano_doutorado, pe.titulacao, pe.universidade,
             
@@ -290,17 +494,54 @@ class Ranking(object):
 
         FROM pessoa pe WHERE pe.id IN ({whereClause})
         """
+
+    def getRanking(self, whereClause, weights, lookback_years=4, vectorized=True, top_k=None):
+        df = self.fetchRows(whereClause, lookback_years)
+        if df is None or df.empty: return []
+        return self.scoreRows(df, weights, vectorized, top_k)
+
+    def fetchRows(self, whereClause, lookback_years=4):
+        """
+        Linhas brutas do ranking (métricas por professor), sem pesos: só dependem dos candidatos
+        e da janela de pesquisa ativa. Retorna None se a consulta falhar.
+        """
+        if not whereClause: return None
         
+        # Define janela de "Pesquisa Ativa" dinamicamente
+        current_year = datetime.datetime.now().year
+        # O padrão passa a ser dinâmico (4 ou 8 anos dependendo do input)
+        start_year_recent = current_year - lookback_years
+
+        sql = self._rankingSql(whereClause, current_year, start_year_recent)
+
         try:
-            df = pd.read_sql_query(sql, conn)
+            with pooled_connection() as conn:
+                # Preferência pela tabela materializada (python -m utils.professor_metrics rebuild);
+                # o SQL de _rankingSql (subconsultas correlacionadas) fica como fallback para bancos antigos.
+                if metrics_available(conn):
+                    # Professores alterados desde o último refresh saem das tabelas de origem (mesmas colunas)
+                    stale = pending_ids(conn, whereClause)
+                    count('candidates_metrics_pending', len(stale))
+                    sql = ranking_metrics_sql(whereClause, current_year, start_year_recent, exclude=stale)
+                    if stale:
+                        sql += " UNION ALL " + self._rankingSql(', '.join(map(str, stale)), current_year, start_year_recent)
+                df = pd.read_sql_query(sql, conn)
         except Exception as e:
             print(f"Erro Ranking SQL: {e}")
-            return []
-        finally:
-            conn.close()
-            
+            return None
+        count('sql_rows_ranking', len(df))
+        return df
+
+    def scoreRows(self, df, weights, vectorized=True, top_k=None):
+        """ Soma ponderada sobre as linhas de fetchRows ('df' não é alterado, pode vir de cache). """
         if df.empty: return []
+        if not vectorized:
+            results = self._scoreRowsLegacy(df, weights)
+            return results if top_k is None else results[:top_k]
+        return self._scoreVectorized(df, weights, top_k)
 
+    def _scoreRowsLegacy(self, df, weights):
+        """ Cálculo original linha a linha (referência para o A/B com o caminho vetorizado). """
         results = []
         current_year = datetime.datetime.now().year
         
@@ -395,51 +636,405 @@ class Ranking(object):
         results.sort(key=lambda x: x['hybrid_score'], reverse=True)
         return results
 
+    def _hierarchical_scores(self, hierarquias):
+        """
+        Versão vetorizada de _calculate_hierarchical_score: explode as cadeias GA#A#SA#E,
+        codifica cada nível em inteiros (pd.factorize) e compara o aluno só com os termos
+        distintos de cada nível, em vez de repetir a comparação por cadeia.
+        """
+        scores = np.zeros(len(hierarquias))
+        if not self.student_area_struct: return scores
+
+        student = [str(self.student_area_struct.get(k, '')).lower().strip()
+                   for k in ('grande_area', 'area', 'sub_area', 'especialidade')]
+
+        h = pd.Series(hierarquias, dtype=object)
+        valid = h.map(lambda x: isinstance(x, str) and len(x) > 5).to_numpy(dtype=bool)
+        if not valid.any(): return scores
+
+        chains = h[valid].str.split(' | ', regex=False).explode()
+        parts = chains.str.split('#', expand=True, regex=False).reindex(columns=range(4)).fillna('')
+
+        chain_score = None
+        # Pesos hierárquicos (Eq 5.2): cada nível só pontua se o anterior bateu
+        for level, weight in zip(range(3, -1, -1), (4.0, 3.0, 2.0, 1.0)):
+            codes, uniques = pd.factorize(parts[level].str.lower().str.strip())
+            s_term = student[level]
+            matches = np.array([bool(s_term) and (s_term in u or u in s_term) for u in uniques], dtype=bool)
+            level_match = matches[codes] if len(uniques) else np.zeros(len(codes), dtype=bool)
+            inner = weight if chain_score is None else weight + chain_score
+            chain_score = np.where(level_match, inner, 0.0)
+
+        best = pd.Series(chain_score, index=chains.index).groupby(level=0).max()
+        scores[best.index.to_numpy()] = np.minimum(1.0, best.to_numpy() / 10.0)
+        return scores
+
+    def _scoreVectorized(self, df, weights, top_k=None):
+        """
+        Calcula as 6 dimensões e a soma ponderada como operações sobre colunas.
+        Com 'top_k', só as melhores posições são ordenadas e materializadas.
+        """
+        df = df.reset_index(drop=True)
+
+        w_area = weights.get('area', 0.2)
+        w_exp = weights.get('exp', 0.2)
+        w_prod = weights.get('prod', 0.2)
+        w_efi = weights.get('efi', 0.1)
+        w_colab = weights.get('colab', 0.1)
+        w_pesq = weights.get('pesq', 0.1) 
+
+        raw_prod = df['raw_prod'].to_numpy(dtype=float)
+        total_orientacoes = df['total_orientacoes'].to_numpy(dtype=float)
+        concluidas = df['orientacoes_concluidas_est'].to_numpy(dtype=float)
+        raw_pesq = df['raw_pesq'].to_numpy(dtype=float)
+        total_pubs = df['total_pubs'].to_numpy(dtype=float)
+
+        # --- NORMALIZAÇÃO RELATIVA AO GRUPO (Tese) ---
+        max_prod = df['raw_prod'].max() or 1.0
+        max_orientacoes = df['total_orientacoes'].max() or 1.0
+        max_pesq_ativa = df['raw_pesq'].max() or 1.0
+        max_pubs_total = df['total_pubs'].max() or 1.0
+
+        # 1. P_AREA (Híbrido): hierarquia CNPq e, onde zerar, o fallback semântico
+        hierarquias = df['hierarquia_cnpq'].tolist()
+        s_area = self._hierarchical_scores(hierarquias)
+        fallback_rows = np.flatnonzero(s_area == 0.0)
+        if len(fallback_rows):
+            fallback_texts = df['fallback_text'].tolist()
+            s_area[fallback_rows] = [
+                self._calculate_semantic_fallback(self.originalText, str(fallback_texts[i])) for i in fallback_rows
+            ]
+
+        # 2-6. Demais dimensões (mesmas equações do cálculo linha a linha)
+        s_exp = total_orientacoes / max_orientacoes
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s_efi = np.where(total_orientacoes > 0, concluidas / total_orientacoes, 0.0)
+        s_prod = raw_prod / max_prod
+        s_colab = total_pubs / max_pubs_total
+        s_pesq = raw_pesq / max_pesq_ativa
+
+        final_score = (s_area * w_area) + \
+                      (s_exp * w_exp) + \
+                      (s_prod * w_prod) + \
+                      (s_efi * w_efi) + \
+                      (s_colab * w_colab) + \
+                      (s_pesq * w_pesq)
+
+        state = {
+            'df': df, 'hierarquias': hierarquias, 'final_score': final_score,
+            's_area': s_area, 's_exp': s_exp, 's_efi': s_efi, 's_prod': s_prod, 's_colab': s_colab, 's_pesq': s_pesq,
+            'raw_prod': raw_prod, 'total_orientacoes': total_orientacoes, 'raw_pesq': raw_pesq,
+        }
+        return self._page(state, 0, top_k)
+
+    def _page(self, state, offset, top_k):
+        """ Seleciona as posições [offset, offset + top_k) do ranking e monta só os seus dicionários. """
+        final_score = state['final_score']
+        n = len(final_score)
+        k = n if top_k is None else min(n, offset + top_k)
+
+        if k < n:
+            # Seleção parcial: tudo com score >= k-ésimo maior (empates inclusos, em ordem de linha)
+            kth = np.partition(-final_score, k - 1)[k - 1]
+            candidates = np.flatnonzero(-final_score <= kth)
+        else:
+            candidates = np.arange(n)
+        # Ordenação estável decrescente (mesmo desempate do list.sort(reverse=True))
+        order = candidates[np.argsort(-final_score[candidates], kind='stable')][offset:k]
+
+        df = state['df']
+        hierarquias = state['hierarquias']
+        s_area, s_exp, s_efi = state['s_area'], state['s_exp'], state['s_efi']
+        s_prod, s_colab, s_pesq = state['s_prod'], state['s_colab'], state['s_pesq']
+        raw_prod, total_orientacoes, raw_pesq = state['raw_prod'], state['total_orientacoes'], state['raw_pesq']
+
+        cols = {c: df[c].to_numpy() for c in ('id', 'nome', 'titulacao', 'universidade', 'sigla_inst', 'ano_doutorado', 'idiomas_publicacao')}
+
+        # Só monta os dicionários das linhas devolvidas
+        results = []
+        for i in order:
+            row = {c: values[i] for c, values in cols.items()}
+            hierarquia = hierarquias[i]
+            areas_display = hierarquia.replace('#', ' > ').split(' | ')[0] if hierarquia else "Inferido por Publicações"
+            results.append({
+                'nome': row['nome'],
+                'id': str(row['id']),
+                'hybrid_score': float(final_score[i]),
+                'info': {
+                    'titulacao': row['titulacao'],
+                    'universidade': row['universidade'],
+                    'sigla': row['sigla_inst'],
+                    'areas': areas_display[:100] + "...",
+                    'raw_hierarchy': hierarquia,
+                    'ano_doutorado': row['ano_doutorado'],
+                    'idiomas': row['idiomas_publicacao']
+                },
+                'details': {
+                    'raw_area': float(s_area[i]),
+                    'raw_prod': float(s_prod[i]),
+                    'raw_exp': float(s_exp[i]),
+                    'raw_pesq': float(s_pesq[i]),
+                    'raw_efi': float(s_efi[i]),
+                    'raw_colab': float(s_colab[i]),
+                    'abs_prod': float(raw_prod[i]),
+                    'abs_exp': float(total_orientacoes[i]),
+                    'abs_pesq': float(raw_pesq[i])
+                }
+            })
+        return RankedResults(results, self, state, offset, top_k)
+
+
+class RankedResults(list):
+    """
+    Página do ranking (uma lista comum de resultados) que guarda os scores já calculados,
+    permitindo buscar as próximas páginas sem refazer o pipeline.
+    """
+
+    def __init__(self, items, ranking, state, offset, top_k):
+        super().__init__(items)
+        self._ranking = ranking
+        self._state = state
+        self.offset = offset
+        self.top_k = top_k
+        self.total = len(state['final_score'])
+
+    @property
+    def has_more(self):
+        return self.offset + len(self) < self.total
+
+    def page(self, offset):
+        """ 'top_k' posições do mesmo ranking a partir de 'offset' (lista vazia se passar do fim). """
+        if offset >= self.total: return []
+        return self._ranking._page(self._state, offset, self.top_k)
+
+    def next_page(self):
+        """ Próximas 'top_k' posições do mesmo ranking (lista vazia se acabou). """
+        return self.page(self.offset + len(self))
+
 # Orchestrator
-clusterPalavras = ClusterPalavras()
-clusterPalavrasChaves = ClusterPalavrasChaves()
+def _clean_text(originalText):
+    return originalText.replace(',', '').replace('.', '')
 
-def thesis_recommendation_engine(originalText, only_doctors=False, weights=None, student_area_struct=None, lookback_years=4):
-    if weights is None: weights = {}
+def _lemmas_from_doc(doc):
+    """ Texto lematizado sem stopwords (mesmo formato usado pelo filtro de área e pelo Birch). """
+    dataset = ''
+    for token in doc:
+        if not token.is_stop: dataset += token.lemma_.strip() + ' '
+    return dataset
+
+def lemmatize_texts(texts, batch_size=64, n_process=1, nlp=None):
+    """ Lematiza vários textos de uma vez com nlp.pipe. Retorna [(lemas, texto_limpo), ...]. """
+    if nlp is None: nlp = get_nlp()
     if nlp is None: raise ImportError("Spacy não carregado.")
+    cleaned_texts = [_clean_text(t) for t in texts]
+    docs = nlp.pipe(cleaned_texts, batch_size=batch_size, n_process=n_process)
+    return [(_lemmas_from_doc(doc), cleaned) for doc, cleaned in zip(docs, cleaned_texts)]
 
-    try:
-        # 1. Pré-processamento
-        dataset = ''
-        cleaned = originalText.replace(',', '').replace('.', '')
-        for token in nlp(cleaned):
-            if not token.is_stop: dataset += token.lemma_.strip() + ' '
-        
+def lemma_signature(dataset):
+    """ Assinatura canônica do texto lematizado: o multiconjunto de lemas, sem depender da ordem. """
+    return ' '.join(sorted(dataset.split()))
+
+# Mesma tokenização padrão do TfidfVectorizer (minúsculas, palavras com 2+ caracteres)
+_TFIDF_TOKEN = re.compile(r'(?u)\b\w\w+\b')
+
+def keyword_signature(cleaned):
+    """
+    Assinatura do texto visto pelo KMeans das palavras-chave (ClusterPalavrasChaves.predict recebe
+    o texto limpo, não os lemas): o multiconjunto de tokens do TF-IDF, sem depender da ordem.
+    """
+    return ' '.join(sorted(_TFIDF_TOKEN.findall(cleaned.lower())))
+
+_MISSING = object()
+
+class CandidateCache(object):
+    """
+    LRU (em memória, por processo) das linhas brutas do ranking por assinatura da busca.
+    Esvaziado quando o arquivo do banco muda (mesmo critério do índice de áreas) ou quando
+    os modelos salvos (Birch, TF-IDF) são reconstruídos.
+    """
+
+    def __init__(self, max_entries=CANDIDATE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._db_key = None
+        self._lock = threading.Lock()
+
+    def _check_db(self):
+        path = get_db_path()
+        stat = os.stat(path)
+        # O ano corrente define as janelas do SQL do ranking
+        db_key = (path, stat.st_mtime_ns, stat.st_size, datetime.datetime.now().year, saved_models_key())
+        if db_key != self._db_key:
+            self._entries.clear()
+            self._db_key = db_key
+
+    def get(self, key):
+        with self._lock:
+            self._check_db()
+            value = self._entries.get(key, _MISSING)
+            if value is not _MISSING: self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0: return
+        with self._lock:
+            self._check_db()
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# =========================================================================== #
+#                       CLASSE RecommendationEngine                           #
+# =========================================================================== #
+class RecommendationEngine(object):
+    """
+    Motor reentrante: o estado pré-calculado (spaCy, índice de áreas, modelos salvos)
+    é compartilhado e só lido; cada busca cria os próprios objetos de clusterização.
+    Uma mesma instância pode atender várias threads ao mesmo tempo, sem lock no pipeline.
+    """
+
+    def __init__(self, nlp=None, candidate_cache_size=CANDIDATE_CACHE_SIZE):
+        self._nlp = nlp
+        self._candidates = CandidateCache(candidate_cache_size)
+
+    @property
+    def nlp(self):
+        return self._nlp if self._nlp is not None else get_nlp()
+
+    def _candidate_rows(self, dataset, cleaned, lookback_years, area_substring):
+        """
+        Etapas 2 e 3 e a consulta do ranking: linhas brutas dos candidatos (sem pesos), vazia
+        se algum filtro não deixar candidatos, ou None se a consulta do ranking falhar.
+        """
         # 2. Filtro de Área
-        ids = Areas(dataset).getPossibleAdvisors()
-        if not ids: return []
+        with span('areas'):
+            ids = Areas(dataset, area_substring).getPossibleAdvisors()
+        if not ids: return pd.DataFrame()
         
-        # 3. Clusterização
+        # 3. Clusterização (instâncias locais: nada é compartilhado entre buscas)
         id_list = ids.split(', ')
+        count('candidates_areas', len(id_list))
         # Birch
-        clusterPalavras.generateCluster(ids, max(2, round(len(id_list)/6)))
-        
-        if clusterPalavras.finalDataFrame is None or clusterPalavras.finalDataFrame.empty:
-             ids_df = pd.Series(id_list)
-        else:
-            header = clusterPalavras.createDatasetHeader(dataset)
-            counted = clusterPalavras.countWords(header)
-            result = clusterPalavras.predict(counted)
-            ids_df = clusterPalavras.getAllPeopleIDFromCluster(result)
+        with span('birch'):
+            clusterPalavras = ClusterPalavras()
+            clusterPalavras.generateCluster(ids, max(2, round(len(id_list)/6)))
+            
+            if clusterPalavras.finalDataFrame is None or clusterPalavras.finalDataFrame.empty:
+                 ids_df = pd.Series(id_list)
+            else:
+                header = clusterPalavras.createDatasetHeader(dataset)
+                counted = clusterPalavras.countWords(header)
+                if clusterPalavras.pretrained:
+                    # Modelo global: o cluster previsto pode não conter candidatos da busca;
+                    # nesse caso vale o cluster mais próximo que contenha algum
+                    ids_df = clusterPalavras.getPeopleIDFromNearestCluster(counted)
+                else:
+                    result = clusterPalavras.predict(counted)
+                    ids_df = clusterPalavras.getAllPeopleIDFromCluster(result)
+        count('candidates_birch', len(ids_df))
         
-        if ids_df.empty: return []
+        if ids_df.empty: return pd.DataFrame()
         whereClause = ', '.join(ids_df.values.astype(str))
         
         # KMeans Keywords
-        clusterPalavrasChaves.generateCluster(whereClause)
-        if clusterPalavrasChaves.finalDataFrame is not None and not clusterPalavrasChaves.finalDataFrame.empty:
-            result = clusterPalavrasChaves.predict(cleaned)
-            ids_df = clusterPalavrasChaves.getAllPeopleIDFromCluster(result)
-            if not ids_df.empty: whereClause = ', '.join(ids_df.values)
+        with span('kmeans'):
+            clusterPalavrasChaves = ClusterPalavrasChaves()
+            clusterPalavrasChaves.generateCluster(whereClause)
+            if clusterPalavrasChaves.finalDataFrame is not None and not clusterPalavrasChaves.finalDataFrame.empty:
+                result = clusterPalavrasChaves.predict(cleaned)
+                ids_df = clusterPalavrasChaves.getAllPeopleIDFromCluster(result)
+                if not ids_df.empty: whereClause = ', '.join(ids_df.values)
+        count('candidates_kmeans', whereClause.count(',') + 1)
+
+        # Métricas brutas dos candidatos (a janela temporal entra aqui; os pesos, só na pontuação)
+        with span('ranking'):
+            return Ranking(cleaned).fetchRows(whereClause, lookback_years)
+
+    def _recommend_from_lemmas(self, dataset, cleaned, weights, student_area_struct, lookback_years, area_substring, top_k):
+        """ Etapas 2 a 4 do pipeline, a partir do texto já lematizado (cada etapa é um span do trace atual). """
+        # Candidatos em cache pelas assinaturas dos lemas (áreas e Birch) e dos tokens do texto limpo
+        # (KMeans): mudar só os pesos (ou a área do aluno) ou a ordem das palavras refaz apenas a pontuação
+        key = (lemma_signature(dataset), keyword_signature(cleaned), lookback_years, area_substring)
+        df = self._candidates.get(key)
+        if df is _MISSING:
+            count('cache_miss_candidates')
+            df = self._candidate_rows(dataset, cleaned, lookback_years, area_substring)
+            if df is not None: self._candidates.put(key, df)
+        else:
+            count('cache_hit_candidates')
+        if df is None or df.empty: return []
 
         # 4. Ranking (Passando a estrutura de área do aluno e a janela temporal)
-        return Ranking(cleaned, student_area_struct).getRanking(whereClause, weights, lookback_years)
+        # Com top_k, só as primeiras posições são montadas; as demais via resultado.next_page()
+        with span('ranking'):
+            results = Ranking(cleaned, student_area_struct).scoreRows(df, weights, top_k=top_k)
+        count('results', len(results))
+        return results
+
+    def recommend(self, originalText, weights=None, student_area_struct=None, lookback_years=4, area_substring=False, top_k=None):
+        if weights is None: weights = {}
+        nlp = self.nlp
+        if nlp is None: raise ImportError("Spacy não carregado.")
+
+        # Com RECOMENDAPROF_PROFILE=1, buscas acima do limite de tempo/memória são gravadas (ver utils.profiling)
+        params = {'weights': weights, 'student_area_struct': student_area_struct, 'lookback_years': lookback_years,
+                  'area_substring': area_substring, 'top_k': top_k}
+        with trace('recommend') as current, profiled('recommend', originalText, params):
+            try:
+                # 1. Pré-processamento
+                with span('lemmatize'):
+                    cleaned = _clean_text(originalText)
+                    dataset = _lemmas_from_doc(nlp(cleaned))
+                return self._recommend_from_lemmas(dataset, cleaned, weights, student_area_struct, lookback_years, area_substring, top_k)
+
+            except Exception as e:
+                current.error = f"{type(e).__name__}: {e}"
+                print(f"Erro Engine: {e}")
+                return []
+
+    def recommend_batch(self, texts, weights=None, student_area_structs=None, lookback_years=4,
+                        area_substring=False, top_k=None, batch_size=64, n_process=1):
+        """
+        Versão em lote para avaliações offline (ex.: replay de propostas históricas).
+        A lematização de todos os textos é feita com nlp.pipe ('batch_size' / 'n_process');
+        o restante do pipeline roda texto a texto. 'student_area_structs' pode ser um dict
+        (mesmo para todos) ou uma lista alinhada a 'texts'. Retorna uma lista de resultados por texto.
+        """
+        if weights is None: weights = {}
+        texts = list(texts)
+        if student_area_structs is None or isinstance(student_area_structs, dict):
+            student_area_structs = [student_area_structs] * len(texts)
+
+        results = []
+        lemmas = lemmatize_texts(texts, batch_size, n_process, nlp=self.nlp)
+        for (dataset, cleaned), area_struct in zip(lemmas, student_area_structs):
+            # Um trace por texto (a lematização em lote fica fora: não é atribuível a um texto só)
+            with trace('recommend_batch') as current:
+                try:
+                    results.append(self._recommend_from_lemmas(dataset, cleaned, weights, area_struct, lookback_years, area_substring, top_k))
+                except Exception as e:
+                    current.error = f"{type(e).__name__}: {e}"
+                    print(f"Erro Engine: {e}")
+                    results.append([])
+        return results
+
+
+_engine = RecommendationEngine()
+
+def get_engine():
+    """ Instância compartilhada do motor (segura para uso concorrente). """
+    return _engine
+
+def thesis_recommendation_engine(originalText, only_doctors=False, weights=None, student_area_struct=None, lookback_years=4, area_substring=False, top_k=None):
+    return _engine.recommend(originalText, weights, student_area_struct, lookback_years, area_substring, top_k)
 
-    except Exception as e:
-        print(f"Erro Engine: {e}")
-        return []
\ No newline at end of file
+def thesis_recommendation_engine_batch(texts, weights=None, student_area_structs=None, lookback_years=4,
+                                       area_substring=False, top_k=None, batch_size=64, n_process=1):
+    """ Ver RecommendationEngine.recommend_batch. """
+    return _engine.recommend_batch(texts, weights, student_area_structs, lookback_years,
+                                   area_substring, top_k, batch_size, n_process)